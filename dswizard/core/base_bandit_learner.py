@@ -22,6 +22,9 @@ class BanditLearner(abc.ABC):
 
         self.iterations: List[BaseIteration] = []
         self.max_iterations = 0
+        # Maximum number of unfinished iterations. The next iteration is started as soon as all active iterations are
+        # waiting for running candidates
+        self.max_concurrent = 1
 
     @abc.abstractmethod
     def _get_next_iteration(self, iteration: int, iteration_kwargs: Dict) -> BaseIteration:
@@ -41,7 +44,8 @@ class BanditLearner(abc.ABC):
         :param iteration_kwargs:
         :return:
         """
-        n_iterations = self.max_iterations
+        # Iterations restored from a checkpoint count towards the maximum number of iterations
+        n_iterations = self.max_iterations - len(self.iterations)
         while True:
             next_candidate = None
             # find a new run to schedule
@@ -55,8 +59,8 @@ class BanditLearner(abc.ABC):
                 yield next_candidate
             else:
                 # Ensure that current stage is completely done
-                busy = any([not it.is_finished for it in self.iterations])
-                if busy:
+                active = sum([not it.is_finished for it in self.iterations])
+                if active > 0 and (active >= self.max_concurrent or n_iterations <= 0):
                     yield None
                     continue
                 elif n_iterations > 0:  # we might be able to start the next iteration
@@ -72,4 +76,14 @@ class BanditLearner(abc.ABC):
         self.iterations = []
 
     def register_result(self, cs: CandidateStructure, result: Result) -> CandidateStructure:
-        return self.iterations[-1].register_result(cs, result)
+        return self._get_iteration(cs).register_result(cs, result)
+
+    def replace_proxy(self, cs: CandidateStructure) -> None:
+        self._get_iteration(cs).replace_proxy(cs)
+
+    def _get_iteration(self, cs: CandidateStructure) -> BaseIteration:
+        # Multiple iterations may be active at the same time. Route by the iteration encoded in the candidate id
+        for iteration in reversed(self.iterations):
+            if iteration.iteration == cs.cid.iteration:
+                return iteration
+        raise ValueError(f'Unknown iteration {cs.cid.iteration} of candidate {cs.cid}')
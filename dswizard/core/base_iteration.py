@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import abc
 import logging
+from collections import defaultdict
 from typing import List, Optional, Dict
 
 import numpy as np
@@ -20,20 +21,26 @@ class BaseIteration(abc.ABC):
                  iteration: int,
                  num_candidates: List[int],
                  budgets: List[float],
-                 logger: logging.Logger = None):
+                 logger: logging.Logger = None,
+                 fidelities: List[float] = None):
         """
 
         :param iteration: The current Hyperband repetition index.
         :param num_candidates: the number of configurations in each stage of SH
         :param budgets: the budget associated with each stage
         :param logger: a logger
+        :param fidelities: fraction of the training data used for evaluations in each stage. Defaults to the complete
+            training data
         """
 
         self.data: Dict[CandidateId, CandidateStructure] = {}  # this holds all the candidates of this iteration
+        # Ids of all candidates per status. Dicts are used as ordered sets to process candidates in insertion order
+        self.by_status: Dict[str, Dict[CandidateId, None]] = defaultdict(dict)
         self.is_finished = False
         self.iteration = iteration
         self.stage = 0  # internal iteration, but different name for clarity
         self.budgets = budgets
+        self.fidelities = fidelities if fidelities is not None else [1.] * len(budgets)
         self.num_candidates = num_candidates
         self.actual_num_candidates = [0] * len(num_candidates)
         self.num_running = 0
@@ -55,13 +62,25 @@ class BaseIteration(abc.ABC):
             raise RuntimeError("This SuccessiveHalving iteration is finished, you can't register more results!")
         cs = self.data[cs.cid]
         cs.results.append(result)
-        cs.status = 'REVIEW'
+        self._set_status(cs, 'REVIEW')
         self.num_running -= 1
         return cs
 
     def replace_proxy(self, cs: CandidateStructure):
-        if self.data[cs.cid].is_proxy():
+        proxy = self.data[cs.cid]
+        if proxy.is_proxy():
             self.data[cs.cid] = cs
+            cs.status = proxy.status
+
+    def _set_status(self, cs: CandidateStructure, status: str) -> None:
+        """
+        Updates the status of a candidate and the according index. Status must only be changed via this method
+        :param cs:
+        :param status:
+        """
+        self.by_status[cs.status].pop(cs.cid, None)
+        self.by_status[status][cs.cid] = None
+        cs.status = status
 
     def get_next_candidate(self) -> Optional[CandidateStructure]:
         """
@@ -79,18 +98,18 @@ class BaseIteration(abc.ABC):
             return None
 
         # Check if candidates exists from previous stage
-        candidates = list(filter(lambda c: self.data[c].status == 'QUEUED', self.data.keys()))
-        for cid in candidates:
+        cid = next(iter(self.by_status['QUEUED']), None)
+        if cid is not None:
             candidate = self.data[cid]
             assert candidate.budget == self.budgets[self.stage], 'Config budget does not align with current stage!'
-            candidate.status = 'RUNNING'
+            self._set_status(candidate, 'RUNNING')
             self.num_running += int(candidate.budget)
             return candidate
 
         # check if there are still slots to fill in the current stage and return that
         if self.actual_num_candidates[self.stage] < self.num_candidates[self.stage]:
             candidate = self._add_candidate()
-            candidate.status = 'RUNNING'
+            self._set_status(candidate, 'RUNNING')
             self.num_running += int(candidate.budget)
             return candidate
         elif self.num_running == 0:
@@ -114,6 +133,7 @@ class BaseIteration(abc.ABC):
 
         candidate = CandidateStructure.proxy()
         candidate.budget = self.budgets[self.stage]
+        candidate.fidelity = self.fidelities[self.stage]
 
         candidate_id = CandidateId(self.iteration, self.actual_num_candidates[self.stage])
         candidate.cid = candidate_id
@@ -121,6 +141,7 @@ class BaseIteration(abc.ABC):
         # candidate.timeout = timeout
 
         self.data[candidate_id] = candidate
+        self._set_status(candidate, candidate.status)
         self.actual_num_candidates[self.stage] += 1
 
         return candidate
@@ -137,7 +158,7 @@ class BaseIteration(abc.ABC):
         self.stage += 1
 
         # collect all candidate_ids that need to be compared
-        candidate_ids = list(filter(lambda cid: self.data[cid].status == 'REVIEW', self.data.keys()))
+        candidate_ids = list(self.by_status['REVIEW'])
 
         if self.stage >= len(self.num_candidates):
             self._finish_up()
@@ -156,19 +177,20 @@ class BaseIteration(abc.ABC):
                                   f'with loss {losses[i]}')
 
                 candidate = self.data[cid]
-                candidate.status = 'QUEUED'
+                self._set_status(candidate, 'QUEUED')
                 candidate.budget = self.budgets[self.stage]
+                candidate.fidelity = self.fidelities[self.stage]
                 # candidate.timeout = math.ceil(candidate.budget * self.timeout) if self.timeout is not None else None
                 self.actual_num_candidates[self.stage] += 1
             else:
-                self.data[cid].status = 'TERMINATED'
+                self._set_status(self.data[cid], 'TERMINATED')
 
     def _finish_up(self) -> None:
         self.is_finished = True
 
         for k, v in self.data.items():
             assert v.status in ['TERMINATED', 'REVIEW', 'CRASHED'], 'Configuration has not finished yet!'
-            v.status = 'COMPLETED'
+            self._set_status(v, 'COMPLETED')
 
     @abc.abstractmethod
     def _advance_to_next_stage(self, losses: np.ndarray) -> np.ndarray:
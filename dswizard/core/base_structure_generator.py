@@ -2,13 +2,13 @@ from __future__ import annotations
 
 import abc
 import logging
-from typing import TYPE_CHECKING, Dict, Any
+from typing import TYPE_CHECKING, Dict, Any, Optional
 
 from dswizard.core.config_cache import ConfigCache
 from dswizard.core.model import Dataset
 
 if TYPE_CHECKING:
-    from dswizard.core.model import CandidateStructure, Result
+    from dswizard.core.model import CandidateStructure, Result, CandidateId
 
 
 class BaseStructureGenerator(abc.ABC):
@@ -56,6 +56,53 @@ class BaseStructureGenerator(abc.ABC):
         if result.status == 'CRASHED':
             self.logger.warning(f'candidate {candidate.cid} failed')
 
+    def rename_candidate(self, old_cid: CandidateId, new_cid: CandidateId) -> None:
+        """
+        Updates all internal references of a candidate structure created in advance with a provisional id
+
+        :param old_cid: provisional id used during fill_candidate
+        :param new_cid: id assigned by the bandit learner
+        :return:
+        """
+        pass
+
+    def discard(self, candidate: CandidateStructure) -> None:
+        """
+        Releases a candidate structure created by fill_candidate that will never be evaluated
+
+        :param candidate:
+        :return:
+        """
+        pass
+
+    def score(self, candidate: CandidateStructure) -> Optional[float]:
+        """
+        Estimated loss of a filled candidate structure based on all results registered so far
+
+        :param candidate:
+        :return: estimated loss or None if no estimate is available
+        """
+        return None
+
+    def get_state(self) -> Optional[bytes]:
+        """
+        Serialized snapshot of the internal model, e.g. to checkpoint the optimization. May be called concurrently to
+        fill_candidate and register_result
+
+        :return: serialized state or None if the generator is stateless
+        """
+        return None
+
+    def set_state(self, state: Optional[bytes], ds: Dataset) -> None:
+        """
+        Restores the internal model from a snapshot created by get_state
+
+        :param state:
+        :param ds: data set of the optimization
+        :return:
+        """
+        pass
+
     def explain(self) -> Dict[str, Any]:
         return {}
 
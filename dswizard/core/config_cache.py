@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+import copy
 import logging
-from typing import TYPE_CHECKING, Dict, List
+import pickle
+import timeit
+import uuid
+from typing import TYPE_CHECKING, Dict, List, Any, Optional
 from typing import Type, Tuple
 
 import joblib
@@ -18,6 +22,7 @@ if TYPE_CHECKING:
     from dswizard.core.base_config_generator import BaseConfigGenerator
     from dswizard.core.model import Job
     from dswizard.components.meta_features import MetaFeatures
+    from dswizard.pipeline.pipeline import FlexiblePipeline
 
 autoproxy.apply()
 
@@ -96,6 +101,30 @@ class ConfigCache:
         config = cg.sample_config(cid=cid, cfg_key=cfg_key, name=name, default=default)
         return config, cfg_key
 
+    def get_generator(self, cfg_key: ConfigKey) -> BaseConfigGenerator:
+        """
+        Returns the config generator for the given key without recorded explanations, e.g. to create a local replica
+        :param cfg_key:
+        :return:
+        """
+        cg = copy.copy(self.cache[cfg_key.hash].generators[cfg_key.idx])
+        cg.explanations = {}
+        return cg
+
+    def get_state(self) -> Optional[bytes]:
+        """
+        Serialized snapshot of all config generators, e.g. to checkpoint the optimization
+        :return: serialized state or None if the snapshot failed due to concurrent modifications
+        """
+        try:
+            return pickle.dumps(self.cache)
+        except RuntimeError as ex:
+            self.logger.warning(f'Failed to create snapshot of config cache: {ex}')
+            return None
+
+    def set_state(self, state: bytes) -> None:
+        self.cache = pickle.loads(state)
+
     def explain(self):
         res = {}
         for hash_, entry in self.cache.items():
@@ -123,3 +152,104 @@ class ConfigCache:
                 self.cache[cfg_key[0]].generators[cfg_key[1]].register_result(job.config, loss, status)
         except Exception:
             self.logger.exception("Failed to register results")
+
+    def register_results(self, jobs: List[Job]) -> None:
+        """
+        Registers a batch of results, e.g. collected from ConfigCacheReplicas. Explanations recorded by the replicas
+        are merged into the corresponding config generators.
+        :param jobs:
+        :return:
+        """
+        for job in jobs:
+            self.register_result(job)
+            if getattr(job, 'explanations', None) is None:
+                continue
+            for cfg_key, explanations in job.explanations.items():
+                try:
+                    self.cache[cfg_key.hash].generators[cfg_key.idx].explanations.update(explanations)
+                except (KeyError, IndexError):
+                    self.logger.warning(f'Unable to register explanations for unknown key {cfg_key}')
+
+
+# Local copies of config generators held by all ConfigCacheReplicas in this process. Entries are indexed by the id of
+# the replica as replicas are pickled with each job but the copies have to persist in the worker process.
+_replicated_generators: Dict[str, Dict[ConfigKey, Tuple[float, BaseConfigGenerator]]] = {}
+
+
+class ConfigCacheReplica:
+    """
+    Worker-local, read-mostly copy of an authoritative ConfigCache. Configurations are sampled from local copies of the
+    config generators instead of crossing the SyncManager for each step. A local copy is refreshed from the
+    authoritative cache when it is older than sync_interval seconds. Results are not registered at the replica, the
+    master sends them to the authoritative cache in batches at least every sync_interval seconds. Consequently,
+    sampling uses a model missing at most the results of the last 2 * sync_interval seconds.
+    """
+
+    def __init__(self, cache: ConfigCache, sync_interval: float = 5.):
+        self.cache = cache
+        self.sync_interval = sync_interval
+        self.id = str(uuid.uuid4())
+
+    @property
+    def generators(self) -> Dict[ConfigKey, Tuple[float, BaseConfigGenerator]]:
+        return _replicated_generators.setdefault(self.id, {})
+
+    def _get_generator(self, cfg_key: ConfigKey) -> BaseConfigGenerator:
+        cfg_key = ConfigKey(*cfg_key)
+        now = timeit.default_timer()
+        try:
+            timestamp, cg = self.generators[cfg_key]
+            if now - timestamp <= self.sync_interval:
+                return cg
+        except KeyError:
+            pass
+        cg = self.cache.get_generator(cfg_key)
+        self.generators[cfg_key] = now, cg
+        return cg
+
+    def sample_configuration(self,
+                             cid: CandidateId = None,
+                             cfg_key: ConfigKey = None,
+                             name: str = None,
+                             default: bool = False,
+                             **kwargs) -> Tuple[Configuration, ConfigKey]:
+        if cfg_key is None:
+            # Selecting a config generator may create a new one. Only possible in the authoritative cache
+            return self.cache.sample_configuration(cid=cid, name=name, default=default, **kwargs)
+        cg = self._get_generator(cfg_key)
+        config = cg.sample_config(cid=cid, cfg_key=cfg_key, name=name, default=default)
+        return config, cfg_key
+
+    def presample(self, cid: CandidateId, pipeline: FlexiblePipeline, cfg_keys: List[ConfigKey]) -> \
+            Tuple[SampledConfigurations, Dict[ConfigKey, Dict[str, Any]]]:
+        """
+        Samples the configurations of all steps of the given pipeline in this process. Evaluations running in a forked
+        process only replay the sampled configurations, so that the state of the local generators is preserved.
+        :param cid:
+        :param pipeline:
+        :param cfg_keys:
+        :return: sampled configurations and the explanations recorded while sampling
+        """
+        configs = {}
+        explanations = {}
+        for (name, _), cfg_key in zip(pipeline.steps, cfg_keys):
+            configs[name] = self.sample_configuration(cid=cid, cfg_key=cfg_key, name=name)
+            cg = self._get_generator(cfg_key)
+            if cid is not None and cid.external_name in cg.explanations:
+                explanations[ConfigKey(*cfg_key)] = {cid.external_name: cg.explanations.pop(cid.external_name)}
+        return SampledConfigurations(configs), explanations
+
+    def explain(self):
+        return self.cache.explain()
+
+
+class SampledConfigurations:
+    """
+    Replays configurations sampled in advance by a ConfigCacheReplica. Used in place of a ConfigCache.
+    """
+
+    def __init__(self, configs: Dict[str, Tuple[Configuration, ConfigKey]]):
+        self.configs = configs
+
+    def sample_configuration(self, name: str = None, **kwargs) -> Tuple[Configuration, ConfigKey]:
+        return self.configs[name]
@@ -1 +1,3 @@
 MODEL_DIR: str = 'models'
+DATASET_DIR: str = 'dataset'
+WARM_START_DIR: str = 'warm_start'
@@ -1,19 +1,50 @@
 from __future__ import annotations
 
+import copy
 import logging
 import multiprocessing
+import multiprocessing.pool
+import os
+import signal
 import threading
 import time
 import timeit
-from typing import Dict, List, TYPE_CHECKING, Union, Callable
+from collections import deque
+from functools import partial
+from typing import Dict, List, TYPE_CHECKING, Union, Callable, Deque, Tuple, Optional, Set
 
-from dswizard.core.model import EvaluationJob, StructureJob, CandidateId, CandidateStructure
+from dswizard.core.model import EvaluationJob, StructureJob, CandidateId, CandidateStructure, Result, StatusType
+from dswizard.util import util
 
 if TYPE_CHECKING:
     from dswizard.core.base_structure_generator import BaseStructureGenerator
-    from dswizard.core.model import Job
+    from dswizard.core.model import Job, Dataset
     from dswizard.core.worker import Worker
 
+# Dataset kept in memory by each pool process for the complete optimization. Only set in pool processes
+_resident_ds: Optional[Dataset] = None
+# Pool processes report the id of each started job together with their pid and report the id again without a pid once
+# the job is finished. Only set in pool processes
+_started_jobs: Optional[multiprocessing.SimpleQueue] = None
+
+
+def _init_worker_process(ds: Optional[Dataset], started_jobs: multiprocessing.SimpleQueue):
+    global _resident_ds, _started_jobs
+    _resident_ds = ds
+    _started_jobs = started_jobs
+
+
+def _transform_dataset(worker: Worker, job: EvaluationJob) -> Result:
+    # Transformations are reported as part of their structure job. This allows cancelling the structure job
+    cid = job.cid.without_config()
+    _started_jobs.put((cid, os.getpid()))
+    try:
+        if job.ds is None:
+            job.ds = _resident_ds
+        return worker.start_transform_dataset(job)
+    finally:
+        _started_jobs.put((cid, None))
+
 
 class NoDaemonProcess(multiprocessing.Process):
     # make 'daemon' attribute always return False
@@ -32,15 +63,47 @@ class MyPool(multiprocessing.pool.Pool):
         return NoDaemonProcess(*args, **kwargs)
 
 
+class PoolWorker:
+    """
+    Handle of a worker used by a structure search running in the master process. Transformations of the data set are
+    processed by the pool of the dispatcher. All other attributes are delegated to the actual worker.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, worker: Worker):
+        self.dispatcher = dispatcher
+        self.worker = worker
+
+    def start_transform_dataset(self, job: EvaluationJob) -> Result:
+        return self.dispatcher.pool.apply(_transform_dataset, (self.worker, self.dispatcher._detach_dataset(job)))
+
+    def __getattr__(self, item):
+        return getattr(self.worker, item)
+
+
 class Dispatcher:
+    # Workers are hosted on other machines. Jobs can not share state with the master via a SyncManager
+    remote = False
 
     def __init__(self,
                  workers: List[Worker],
                  structure_generator: BaseStructureGenerator,
                  logger: logging.Logger = None,
+                 ds: Dataset = None
                  ):
+        """
+        :param workers: workers used to process jobs. If more than one worker is given, jobs are processed in a pool
+            of persistent processes
+        :param structure_generator:
+        :param logger:
+        :param ds: if given, the data set is loaded once by each pool process and kept in memory. Jobs working on this
+            data set are sent without the data set
+        """
         self.structure_generator = structure_generator
+        self.ds = ds
         self.shutdown_all_threads = False
+        self.start_time: Optional[float] = None
+        # Called without holding any locks whenever a worker becomes idle
+        self.on_worker_released: Optional[Callable[[], None]] = None
 
         if logger is None:
             self.logger = logging.getLogger('Dispatcher')
@@ -48,36 +111,145 @@ class Dispatcher:
             self.logger = logger
 
         self.worker_pool: List[Worker] = workers
-        self.running_jobs: Dict[CandidateId, Callable] = {}
+        # Workers are handed out strictly from this queue. A worker is only returned after the callback of its
+        # current job has been processed.
+        self.idle_workers: Deque[Worker] = deque(workers)
+        self.running_jobs: Dict[CandidateId, Tuple[Job, Callable, Worker]] = {}
 
-        if len(self.worker_pool) > 1:
-            self.pool = MyPool(len(self.worker_pool))
-        else:
-            self.pool = None
+        # Pool processes are started with the first job. This allows preparing the data set, e.g. moving it to shared
+        # memory, before the processes are created
+        self.pool: Optional[MyPool] = None
         self.condition = threading.Condition()
 
-    def submit_job(self, job: Job, callback: Callable) -> None:
+        # Jobs whose result is currently processed or that were cancelled. Late results of these jobs are ignored
+        self.claimed_jobs: Set[CandidateId] = set()
+        self.job_pids: Dict[CandidateId, int] = {}
+        self.started_jobs: Optional[multiprocessing.SimpleQueue] = None
+        self.cancelled = False
+
+    def _start_pool(self):
+        self.started_jobs = multiprocessing.SimpleQueue()
+        self.pool = MyPool(len(self.worker_pool), initializer=_init_worker_process,
+                           initargs=(self.ds, self.started_jobs))
+        # Pool processes block once the pipe of the queue is full. The queue has to be drained continuously
+        threading.Thread(target=self._read_started_jobs, name='StartedJobs', daemon=True).start()
+
+    def _read_started_jobs(self):
+        while True:
+            try:
+                entry = self.started_jobs.get()
+            except (EOFError, OSError):
+                break
+            if entry is None:
+                break
+            cid, pid = entry
+            with self.condition:
+                if pid is None:
+                    self.job_pids.pop(cid, None)
+                elif cid in self.running_jobs:
+                    # Reports of already completed jobs are ignored
+                    self.job_pids[cid] = pid
+
+    @property
+    def synchronous(self) -> bool:
+        """
+        :return: True if jobs are processed in the thread submitting the job
+        """
+        return len(self.worker_pool) <= 1
+
+    def start(self, start_time: float) -> None:
+        """
+        Marks the start of the optimization. Runtime timestamps of all workers are relative to this time.
+        :param start_time:
+        """
+        self.start_time = start_time
+        for worker in self.worker_pool:
+            worker.start_time = start_time
+
+    def wait_for_worker(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until at least one worker is idle.
+        :param timeout: maximum waiting time in seconds. If None, waits until a worker is released
+        :return: True if an idle worker is available, False if the timeout expired
+        """
         with self.condition:
-            n_running = len(self.running_jobs)
+            if timeout is not None:
+                timeout = max(0., timeout)
+            return self.condition.wait_for(lambda: len(self.idle_workers) > 0, timeout)
+
+    def submit_job(self, job: Job, callback: Callable, timeout: Optional[float] = None) -> bool:
+        """
+        Starts the given job on the next idle worker. If all workers are busy, waits for the next worker to be
+        released.
+        :param job: job to process
+        :param callback: called with the processed job (EvaluationJob) or the filled structure (StructureJob)
+        :param timeout: maximum waiting time in seconds for an idle worker. If None, waits until a worker is released
+        :return: True if the job was submitted, False if no worker became available within the timeout
+        """
+        with self.condition:
+            if timeout is not None:
+                timeout = max(0., timeout)
+            if not self.condition.wait_for(lambda: len(self.idle_workers) > 0, timeout):
+                self.logger.debug(f'No worker available for job {job.cid} within {timeout} seconds')
+                return False
+
+            worker = self.idle_workers.popleft()
+            worker.busy = True
             job.time_submitted = time.time()
-            self.running_jobs[job.cid] = callback
+            self.running_jobs[job.cid] = job, callback, worker
 
-            if len(self.worker_pool) > 1:
-                self.pool.apply_async(self._process_job, args=(self.worker_pool[n_running], job),
-                                      callback=self._job_callback)
-                # Sleep 1 second to ensure process start. Maybe not necessary
-                time.sleep(1)
-            else:
-                res = self._process_job(self.worker_pool[0], job)
-                self._job_callback(res)
+        self._execute(worker, job)
+        return True
+
+    def _execute(self, worker: Worker, job: Job) -> None:
+        if self.pool is None and len(self.worker_pool) > 1:
+            self._start_pool()
+
+        if self.pool is not None and isinstance(job, StructureJob):
+            # Structure search runs in this process, only transformations of the data set are processed by the pool
+            threading.Thread(target=self._run_job, args=(PoolWorker(self, worker), job), name=f'Job-{job.cid}',
+                             daemon=True).start()
+        elif self.pool is not None:
+            self.pool.apply_async(self._process_job, args=(worker, self._detach_dataset(job)),
+                                  callback=partial(self._job_callback, job.cid),
+                                  error_callback=partial(self._job_error_callback, job.cid))
+        else:
+            res = self._process_job(worker, job)
+            self._job_callback(job.cid, res)
+
+    def _run_job(self, worker: Union[Worker, PoolWorker], job: Job):
+        try:
+            res = self._process_job(worker, job)
+        except Exception as ex:
+            self._job_error_callback(job.cid, ex)
+            return
+        self._job_callback(job.cid, res)
 
-            if len(self.running_jobs) == len(self.worker_pool):
-                self.logger.debug('waiting for next worker to be available')
-                # TODO infinite waiting is possible
-                self.condition.wait()
+    def _detach_dataset(self, job: Job) -> Job:
+        # Pool processes already hold the resident data set. Only send a light-weight copy of the job
+        if self.ds is None or job.ds is not self.ds:
+            return job
+        job = copy.copy(job)
+        job.ds = None
+        return job
 
     def _process_job(self, worker: Worker, job: Job) -> \
             Union[EvaluationJob, CandidateStructure]:
+        if _started_jobs is not None:
+            _started_jobs.put((job.cid, os.getpid()))
+        if job.ds is None:
+            job.ds = _resident_ds
+        try:
+            return self._process_attached_job(worker, job)
+        finally:
+            # Do not send resident data set back to master
+            if _resident_ds is not None and job.ds is _resident_ds:
+                job.ds = None
+            if _started_jobs is not None:
+                _started_jobs.put((job.cid, None))
+
+    def _process_attached_job(self, worker: Worker, job: Job) -> \
+            Union[EvaluationJob, CandidateStructure]:
         self.logger.debug(f'Processing job {job.cid}')
         job.time_started = time.time()
         worker.runs_job = job.cid
@@ -108,18 +280,108 @@ class Dispatcher:
         else:
             raise ValueError(f'Unknown Job type {job}')
 
-    def _job_callback(self, result: Union[EvaluationJob, CandidateStructure]):
+    def _claim(self, cid: CandidateId) -> Optional[Tuple[Job, Callable, Worker]]:
+        # Ensures that each job is completed exactly once, either by its result or by its cancellation
+        with self.condition:
+            if cid not in self.running_jobs or cid in self.claimed_jobs:
+                return None
+            self.claimed_jobs.add(cid)
+            return self.running_jobs[cid]
+
+    def _job_callback(self, cid: CandidateId, result: Union[EvaluationJob, CandidateStructure]):
+        if self._claim(cid) is None:
+            self.logger.debug(f'Ignoring result of cancelled job {cid}')
+            return
+        self._complete_job(cid, result)
+
+    def _complete_job(self, cid: CandidateId, result: Union[EvaluationJob, CandidateStructure]):
         try:
             with self.condition:
-                callback = self.running_jobs.pop(result.cid)
-                callback(result)
-                self.condition.notify()
+                _, callback, _ = self.running_jobs[cid]
+            callback(result)
         except Exception as ex:
             self.logger.exception(f'Unhandled exception in callback: {ex}')
+        finally:
+            self._release_worker(cid)
+
+    def _job_error_callback(self, cid: CandidateId, ex: BaseException):
+        self.logger.error(f'Failed to process job {cid}: {ex}')
+        with self.condition:
+            if cid not in self.running_jobs:
+                return
+            job, _, _ = self.running_jobs[cid]
+        if isinstance(job, EvaluationJob):
+            worst_score = util.worst_score(job.ds.metric)
+            job.result = Result(job.cid, StatusType.CRASHED, job.config, worst_score[0], worst_score[1], None)
+            self._job_callback(cid, job)
+        else:
+            self._job_callback(cid, job.cs)
 
-    def finish_work(self, timeout: float):
+    def _release_worker(self, cid: CandidateId):
+        with self.condition:
+            _, _, worker = self._pop_job(cid)
+            worker.busy = False
+            self.idle_workers.append(worker)
+            self.condition.notify_all()
+        if self.on_worker_released is not None:
+            self.on_worker_released()
+
+    def _pop_job(self, cid: CandidateId) -> Tuple[Job, Callable, Worker]:
+        self.claimed_jobs.discard(cid)
+        self.job_pids.pop(cid, None)
+        return self.running_jobs.pop(cid)
+
+    def cancel_job(self, cid: CandidateId) -> None:
+        """
+        Stops the given job. The process evaluating the job is killed and its worker is released. EvaluationJobs are
+        completed with status ABORT. Cancelled StructureJobs are released without calling their callback. The
+        structure search of a StructureJob runs in the master process, only the process computing its current
+        transformation of the data set is killed.
+        :param cid:
+        """
+        entry = self._claim(cid)
+        if entry is None:
+            return
+        job, _, worker = entry
+        self.cancelled = True
+        self.logger.info(f'Cancelling job {cid}')
+        self._kill(job, worker)
+
+        if isinstance(job, EvaluationJob):
+            worst_score = util.worst_score(job.ds.metric)
+            job.result = Result(job.cid, StatusType.ABORT, job.config, worst_score[0], worst_score[1], None)
+            self._complete_job(cid, job)
+        else:
+            self._release_worker(cid)
+
+    def _kill(self, job: Job, worker: Worker) -> None:
+        with self.condition:
+            pid = self.job_pids.get(job.cid)
+        if pid is not None:
+            try:
+                # Pool process terminates the evaluation sub-process before exiting. The pool replaces the process
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def finish_work(self, timeout: float, cancel: bool = False):
+        """
+        Waits for all running jobs to finish.
+        :param timeout: maximum waiting time in seconds
+        :param cancel: cancel all jobs still running after the timeout. Jobs that can not finish within the timeout
+            according to their cutoff are cancelled immediately
+        """
         total = len(self.worker_pool)
         deadline = timeit.default_timer() + timeout
+        if cancel:
+            now = time.time()
+            with self.condition:
+                # Evaluations may exceed their cutoff by the grace period of the evaluation sub-process
+                stragglers = [cid for cid, (job, _, _) in self.running_jobs.items()
+                              if job.cutoff is None or job.time_submitted + job.cutoff + 5 > now + timeout]
+            for cid in stragglers:
+                self.cancel_job(cid)
+
         while True:
             now = timeit.default_timer()
             with self.condition:
@@ -131,12 +393,23 @@ class Dispatcher:
                     self.condition.wait(deadline - now)
             if now > deadline:
                 self.logger.warning(f'Workers did not finish within deadline. {busy} / {total} busy...')
+                if cancel:
+                    with self.condition:
+                        running = list(self.running_jobs.keys())
+                    for cid in running:
+                        self.cancel_job(cid)
                 break
 
     def shutdown(self):
         if self.pool is not None:
-            self.pool.close()
+            if self.cancelled:
+                # Cancelled jobs may still occupy pool processes, e.g. transformations of structure jobs
+                self.pool.terminate()
+            else:
+                self.pool.close()
             self.pool.join()
+            # Stop reader thread
+            self.started_jobs.put(None)
 
     def __getstate__(self):
         # Copy the object's state from self.__dict__ which contains
@@ -145,6 +418,16 @@ class Dispatcher:
         state = self.__dict__.copy()
         # Remove the unpicklable entries.
         del state['running_jobs']
+        del state['idle_workers']
         del state['condition']
         del state['pool']
+        del state['started_jobs']
+        # Modified concurrently by the reader thread and result callbacks and only used in the master process
+        del state['job_pids']
+        del state['claimed_jobs']
+        # Structure search is never processed in pool processes
+        state['structure_generator'] = None
+        state['on_worker_released'] = None
+        # Data set is resident in pool processes
+        state['ds'] = None
         return state
@@ -2,7 +2,7 @@ import glob
 import logging
 import os
 import timeit
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, Union
 
 import joblib
 import numpy as np
@@ -49,13 +49,26 @@ class EnsembleBuilder:
         self._n_classes = 0
         self.start = None
 
-    def fit(self, ds: Dataset, fraction: float = 0.2):
+    def fit(self, ds: Union[Dataset, str], fraction: Optional[float] = None):
+        """
+        :param ds: data set or path of a data set stored via `Dataset.store`, e.g. the data set directory in the working
+            directory. Stored data sets are memory-mapped
+        :param fraction: size of a new stratified split used to select models. By default, models are selected on the
+            holdout split used to score all configurations
+        """
         self.start = timeit.default_timer()
+        if isinstance(ds, str):
+            ds = Dataset.load(ds)
         self._n_classes = len(np.unique(ds.y))
 
-        rs = StratifiedShuffleSplit(n_splits=1, test_size=fraction, random_state=0)
-        train_idx, test_idx = next(rs.split(ds.X, ds.y))
-        ds2 = Dataset(ds.X[test_idx], ds.y[test_idx], ds.metric)
+        if fraction is None:
+            # Meta-features are not required for ensemble construction
+            _, X_test, _, y_test = ds.holdout()
+        else:
+            rs = StratifiedShuffleSplit(n_splits=1, test_size=fraction, random_state=0)
+            _, test_idx = next(rs.split(ds.X, ds.y))
+            X_test, y_test = ds.X[test_idx], ds.y[test_idx]
+        ds2 = Dataset(X_test, y_test, ds.metric, mf_dict=ds.mf_dict, meta_features=ds.meta_features)
 
         self._load(ds2)
 
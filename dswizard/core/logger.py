@@ -5,7 +5,7 @@ import logging
 import os
 import pickle
 import shutil
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional
 
 import joblib
 import networkx as nx
@@ -22,12 +22,18 @@ from dswizard.util import util
 
 
 class ResultLogger:
-    def __init__(self, directory: str, tmp_dir: str):
-        # Remove old results
-        try:
-            shutil.rmtree(directory)
-        except FileNotFoundError:
-            pass
+    def __init__(self, directory: str, tmp_dir: str, resume: bool = False):
+        """
+        :param directory: output directory
+        :param tmp_dir: directory containing the models created by the workers
+        :param resume: keep existing results to continue a previous optimization from its last checkpoint
+        """
+        if not resume:
+            # Remove old results
+            try:
+                shutil.rmtree(directory)
+            except FileNotFoundError:
+                pass
 
         os.makedirs(directory, exist_ok=True)
         os.makedirs(os.path.join(directory, MODEL_DIR), exist_ok=True)
@@ -36,6 +42,7 @@ class ResultLogger:
         self.tmp_dir = tmp_dir
         self.structure_fn = os.path.join(directory, 'structures.json')
         self.results_fn = os.path.join(directory, 'results.json')
+        self.checkpoint_fn = os.path.join(directory, 'checkpoint.pkl')
         self.structure_ids = set()
 
     def new_structure(self, structure: CandidateStructure, draw_structure: bool = False) -> None:
@@ -101,6 +108,59 @@ class ResultLogger:
         with open(os.path.join(self.directory, f'ensemble_{suffix}.pkl'), 'wb') as fh:
             pickle.dump(ensemble, fh)
 
+    def offsets(self) -> Tuple[int, int]:
+        """
+        :return: size of the structure and result log. Used to refer to all structures and results logged so far
+        """
+        return self._size(self.structure_fn), self._size(self.results_fn)
+
+    def log_checkpoint(self, offsets: Tuple[int, int], **states: Optional[bytes]) -> None:
+        """
+        Atomically replaces the checkpoint
+        :param offsets: structures and results logged at the time of the checkpoint, see offsets
+        :param states: serialized state of each component of the optimizer
+        """
+        checkpoint = {
+            'offsets': offsets,
+            **states
+        }
+        tmp_file = f'{self.checkpoint_fn}.tmp'
+        with open(tmp_file, 'wb') as fh:
+            pickle.dump(checkpoint, fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_file, self.checkpoint_fn)
+
+    def load_checkpoint(self) -> Optional[Dict[str, Optional[bytes]]]:
+        """
+        Loads the last checkpoint. Structures and results logged after the checkpoint are removed as they will be
+        evaluated again. Without a checkpoint, all results are removed.
+        :return: serialized state of each component or None if no checkpoint exists
+        """
+        try:
+            with open(self.checkpoint_fn, 'rb') as fh:
+                checkpoint = pickle.load(fh)
+            offsets = checkpoint['offsets']
+        except FileNotFoundError:
+            checkpoint, offsets = None, (0, 0)
+
+        for file, offset in zip((self.structure_fn, self.results_fn), offsets):
+            with open(file, 'a') as fh:
+                fh.truncate(offset)
+
+        self.structure_ids = set()
+        with open(self.structure_fn, 'r') as fh:
+            for line in fh:
+                self.structure_ids.add(CandidateId.parse(json.loads(line)['cid']).without_config())
+        return checkpoint
+
+    @staticmethod
+    def _size(file: str) -> int:
+        try:
+            return os.path.getsize(file)
+        except FileNotFoundError:
+            return 0
+
     def load(self) -> Dict[CandidateId, CandidateStructure]:
         structures = {}
         with open(self.structure_fn, 'r') as structure_file:
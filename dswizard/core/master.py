@@ -1,34 +1,43 @@
 from __future__ import annotations
 
+import asyncio
+import copy
 import datetime
+import heapq
+import itertools
 import logging
+import math
 import multiprocessing
 import os
 import os.path
-import random
+import shutil
 import tempfile
-import threading
 import time
 import timeit
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from multiprocessing.managers import SyncManager
-from typing import Type, TYPE_CHECKING, Tuple, Dict, Optional, Union
+from typing import Type, TYPE_CHECKING, Tuple, Dict, Optional, Union, Callable, List, Deque, Set
 
 import joblib
-from ConfigSpace.configuration_space import ConfigurationSpace
+from ConfigSpace.configuration_space import ConfigurationSpace, Configuration
 
 from dswizard.core.base_structure_generator import BaseStructureGenerator
-from dswizard.core.config_cache import ConfigCache
-from dswizard.core.constants import MODEL_DIR
+from dswizard.core.config_cache import ConfigCache, ConfigCacheReplica
+from dswizard.core.constants import MODEL_DIR, DATASET_DIR, WARM_START_DIR
 from dswizard.core.dispatcher import Dispatcher
 from dswizard.core.ensemble import EnsembleBuilder
 from dswizard.core.logger import ResultLogger
-from dswizard.core.model import StructureJob, Dataset, EvaluationJob, CandidateStructure, CandidateId, MetaInformation
+from dswizard.core.model import StructureJob, Dataset, EvaluationJob, CandidateStructure, CandidateId, \
+    MetaInformation, ConfigKey, Result, StatusType, Job
 from dswizard.core.renderer import NotebookRenderer
 from dswizard.core.runhistory import RunHistory
 from dswizard.optimizers.bandit_learners import PseudoBandit
 from dswizard.optimizers.config_generators import Hyperopt
 from dswizard.optimizers.structure_generators.mcts import MCTS
 from dswizard.pipeline.voting_ensemble import PrefitVotingClassifier
+from dswizard.util import util
 from dswizard.workers import SklearnWorker
 
 if TYPE_CHECKING:
@@ -38,6 +47,187 @@ if TYPE_CHECKING:
     from dswizard.pipeline.pipeline import FlexiblePipeline
 
 
+class PrefetchQueue:
+    """
+    Configurations sampled in advance for a single structure. Each sampled configuration reserves the next config id
+    of the structure. Ids of discarded configurations are reused.
+    """
+
+    def __init__(self, cid: CandidateId, next_idx: int):
+        self.cid = cid
+        self.next_idx = next_idx
+        self.free_ids: List[CandidateId] = []
+
+        self.entries: Deque[Tuple[CandidateId, Configuration, ConfigKey]] = deque()
+        self.cfg_key: Optional[ConfigKey] = None
+        # Number of configurations currently sampled in the background
+        self.pending = 0
+        # Incremented whenever the queue is invalidated. Samples of older generations are discarded
+        self.generation = 0
+
+    def reserve(self) -> CandidateId:
+        if len(self.free_ids) > 0:
+            self.free_ids.sort(key=lambda cid: cid.config)
+            return self.free_ids.pop(0)
+        config_id = self.cid.with_config(self.next_idx)
+        self.next_idx += 1
+        return config_id
+
+    def release(self, config_id: CandidateId) -> None:
+        self.free_ids.append(config_id)
+
+    def invalidate(self) -> None:
+        for config_id, _, _ in self.entries:
+            self.release(config_id)
+        self.entries.clear()
+        self.pending = 0
+        self.generation += 1
+
+
+class StructureScheduler:
+    """
+    Priority queue of incomplete structures deciding which structure receives the next configuration. Structures with a
+    low incumbent loss, many remaining configurations, a short expected runtime and a long waiting time are preferred.
+    Updates are processed in O(log n) by pushing a new heap entry. Outdated entries are skipped lazily.
+    """
+
+    def __init__(self,
+                 cutoff: float = None,
+                 runtime_weight: float = 0.1,
+                 budget_weight: float = 0.05,
+                 age_weight: float = 0.01,
+                 ready_weight: float = 1.):
+        """
+        :param cutoff: used to normalize runtimes and waiting times
+        :param runtime_weight: penalty for the expected runtime of a configuration relative to the cutoff
+        :param budget_weight: bonus for the fraction of remaining configurations of a structure
+        :param age_weight: bonus per cutoff a structure is waiting for its next configuration. Prevents starvation of
+            structures with a worse incumbent
+        :param ready_weight: bonus for structures with pre-sampled configurations. These configurations are dispatched
+            without waiting for a sample
+        """
+        self.cutoff = cutoff if cutoff is not None and cutoff > 0 else 1.
+        self.runtime_weight = runtime_weight
+        self.budget_weight = budget_weight
+        self.age_weight = age_weight
+        self.ready_weight = ready_weight
+
+        self.start = timeit.default_timer()
+        # Best loss of all structures. Used as optimistic estimate for structures without results
+        self.best_loss: Optional[float] = None
+
+        self._heap: List[Tuple[float, int, CandidateId]] = []
+        self._versions: Dict[CandidateId, int] = {}
+        self._last_dispatch: Dict[CandidateId, float] = {}
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+    def __contains__(self, cid: CandidateId) -> bool:
+        return cid in self._versions
+
+    def observe(self, loss: Optional[float]) -> None:
+        if loss is not None and math.isfinite(loss) and (self.best_loss is None or loss < self.best_loss):
+            self.best_loss = loss
+
+    def update(self, cs: CandidateStructure, n_configs: int, dispatched: bool = False, ready: bool = False) -> None:
+        """
+        Inserts the structure or updates its priority
+        :param cs:
+        :param n_configs: number of configurations not dispatched yet
+        :param dispatched: a configuration of this structure was just dispatched
+        :param ready: a pre-sampled configuration of this structure is available
+        """
+        if dispatched or cs.cid not in self._last_dispatch:
+            self._last_dispatch[cs.cid] = timeit.default_timer() - self.start
+
+        losses = [r.loss for r in cs.results if r.loss is not None and math.isfinite(r.loss)]
+        if len(losses) > 0:
+            loss = min(losses)
+            self.observe(loss)
+        else:
+            loss = self.best_loss if self.best_loss is not None else 0.
+
+        runtimes = [r.runtime.training_time for r in cs.results if r.runtime is not None]
+        runtime = sum(runtimes) / len(runtimes) / self.cutoff if len(runtimes) > 0 else 0.
+        remaining = n_configs / max(1., cs.budget)
+
+        # All structures age at the same rate. Ranking by the time of the last dispatch is equivalent to ranking by
+        # the current waiting time and does not require updating waiting structures
+        priority = loss + self.runtime_weight * runtime - self.budget_weight * remaining + \
+            self.age_weight * self._last_dispatch[cs.cid] / self.cutoff - self.ready_weight * ready
+
+        version = next(self._counter)
+        self._versions[cs.cid] = version
+        heapq.heappush(self._heap, (priority, version, cs.cid))
+
+        if len(self._heap) > 4 * len(self._versions) + 16:
+            self._heap = [entry for entry in self._heap if self._versions.get(entry[2]) == entry[1]]
+            heapq.heapify(self._heap)
+
+    def remove(self, cid: CandidateId) -> None:
+        self._versions.pop(cid, None)
+        self._last_dispatch.pop(cid, None)
+
+    def peek(self) -> Optional[CandidateId]:
+        """
+        :return: structure with the highest priority or None if no structure is available
+        """
+        while len(self._heap) > 0:
+            _, version, cid = self._heap[0]
+            if self._versions.get(cid) == version:
+                return cid
+            heapq.heappop(self._heap)
+        return None
+
+
+class CutoffModel:
+    """
+    Predicts the cutoff of an evaluation from the training times of previous successful evaluations of the same
+    structure. Structures with fast successful runs receive a tight cutoff, structures known to need more time a
+    generous one. Structures without enough successful runs use the global cutoff.
+    """
+
+    def __init__(self,
+                 cutoff: float,
+                 factor: float = 3.,
+                 min_runs: int = 3,
+                 min_cutoff: float = 5.):
+        """
+        :param cutoff: global cutoff
+        :param factor: predicted cutoff as multiple of the slowest successful run of a structure
+        :param min_runs: minimum number of successful runs of a structure before its cutoff is predicted
+        :param min_cutoff: lower limit of predicted cutoffs in seconds. Predicted cutoffs never exceed the global cutoff
+        """
+        self.cutoff = cutoff
+        self.factor = factor
+        self.min_runs = min_runs
+        self.min_cutoff = min_cutoff
+
+        self.runtimes: Dict[CandidateId, List[float]] = {}
+
+    def observe(self, cid: CandidateId, result: Result) -> None:
+        if result.status == StatusType.SUCCESS and result.runtime is not None:
+            self.runtimes.setdefault(cid.without_config(), []).append(result.runtime.training_time)
+
+    def predict(self, cid: CandidateId, remaining: float) -> Tuple[float, bool]:
+        """
+        :param cid: structure or configuration id
+        :param remaining: remaining wallclock time in seconds
+        :return: cutoff in seconds and whether the predicted cutoff is the binding limit, i.e. it is below the global
+            cutoff and the remaining wallclock time
+        """
+        if self.cutoff is None or self.cutoff <= 0:
+            return self.cutoff, False
+
+        cutoff = self.cutoff
+        runtimes = self.runtimes.get(cid.without_config(), [])
+        if len(runtimes) >= self.min_runs:
+            cutoff = min(max(self.factor * max(runtimes), self.min_cutoff), self.cutoff)
+        return max(1, math.ceil(min(cutoff, remaining))), cutoff < min(self.cutoff, remaining)
+
+
 class Master:
     def __init__(self,
                  ds: Dataset,
@@ -49,19 +239,37 @@ class Master:
                  wallclock_limit: int = 60,
                  cutoff: int = None,
                  structure_cutoff_factor: float = 2.,
+                 adaptive_cutoff: bool = False,
+                 cutoff_kwargs: Dict = None,
+                 grace_period: float = 5.,
+                 resume: bool = False,
+                 checkpoint_interval: Optional[float] = None,
+                 warm_start: bool = False,
+                 speculative_structures: int = 0,
                  pre_sample: bool = False,
+                 prefetch_size: int = 2,
+                 resident_dataset: bool = True,
+                 shared_dataset: bool = True,
 
                  n_workers: int = 1,
                  worker_class: Type[Worker] = SklearnWorker,
+                 worker_kwargs: Dict = None,
+
+                 dispatcher_class: Type[Dispatcher] = Dispatcher,
+                 dispatcher_kwargs: Dict = None,
 
                  config_generator_class: Type[BaseConfigGenerator] = Hyperopt,
                  config_generator_kwargs: Dict = None,
+                 config_cache_replicas: bool = False,
+                 config_sync_interval: float = 5.,
 
                  structure_generator_class: Type[BaseStructureGenerator] = MCTS,
                  structure_generator_kwargs: Dict = None,
 
                  bandit_learner_class: Type[BanditLearner] = PseudoBandit,
-                 bandit_learner_kwargs: Dict = None
+                 bandit_learner_kwargs: Dict = None,
+
+                 scheduler_kwargs: Dict = None
                  ):
         """
         The Master class is responsible for the book keeping and to decide what to run next. Optimizers are
@@ -70,6 +278,46 @@ class Master:
         :param working_directory: The top level working directory accessible to all compute nodes(shared filesystem).
         :param logger: the logger to output some (more or less meaningful) information
         :param result_logger: a result logger that writes live results to disk
+        :param adaptive_cutoff: predict the cutoff of each evaluation from the runtimes of previous evaluations of the
+            same structure instead of using the global cutoff. Evaluations killed by a predicted cutoff below the global
+            cutoff and the remaining wallclock time are reported as CAPPED. All cutoffs are limited by the remaining
+            wallclock time
+        :param cutoff_kwargs: additional arguments passed to the CutoffModel
+        :param grace_period: time in seconds granted to running jobs after the wallclock limit is reached. Jobs that
+            can not finish within this period are cancelled and reported as ABORT
+        :param resume: continue a previous optimization from the last checkpoint in the working directory. Finished
+            evaluations are not repeated. Jobs running at the time of the checkpoint are evaluated again. Requires
+            checkpoints of the previous optimization, see checkpoint_interval
+        :param checkpoint_interval: minimum time in seconds between two checkpoints, e.g. 60. Checkpoints are disabled
+            by default
+        :param warm_start: when a structure is promoted to a higher fidelity, its best configuration of the lower
+            fidelity is evaluated again first. The worker continues training the model of the lower fidelity instead of
+            fitting it from scratch. Requires a worker supporting warm_start, e.g. SklearnWorker. Stored models of local
+            workers are removed once the structure is promoted or finished
+        :param speculative_structures: maximum number of structures created in advance by otherwise idle workers.
+            Speculative structures are kept in a ready pool, ranked by the structure generator and handed out
+            immediately when the bandit learner requests a new structure. Disabled by default as speculative structures
+            change the order of structure generator calls
+        :param prefetch_size: number of configurations sampled in advance for each active structure if pre_sample is
+            set. Prefetched configurations are discarded when a new result changes the underlying model
+        :param resident_dataset: load the data set once in each worker process and keep it in memory for the complete
+            optimization. Jobs are sent to the workers without the data set
+        :param shared_dataset: store X and y of the data set in shared memory during the optimization. All worker
+            processes, the structure generator and the evaluation sub-processes attach to the same memory instead of
+            using private copies. Unless configurations are scored via cross-validation or racing, the holdout split is
+            shared as well
+        :param worker_kwargs: additional arguments passed to each worker, e.g. racing for SklearnWorker. Remote workers
+            receive these arguments on registration
+        :param dispatcher_class: dispatcher used to process jobs. Use RemoteDispatcher to process jobs on worker
+            daemons running on other machines. In this case, n_workers and worker_class are ignored and configurations
+            are always pre-sampled
+        :param dispatcher_kwargs: additional arguments passed to the dispatcher
+        :param config_cache_replicas: workers sample configurations from local replicas of the config generators instead
+            of using the shared config cache. Only used with more than one local worker
+        :param config_sync_interval: maximum age in seconds of the local replicas. Results are registered at the
+            shared config cache in batches at least this often
+        :param scheduler_kwargs: additional arguments passed to the StructureScheduler selecting the structure for the
+            next configuration
         """
 
         if bandit_learner_kwargs is None:
@@ -78,6 +326,16 @@ class Master:
             config_generator_kwargs = {}
         if structure_generator_kwargs is None:
             structure_generator_kwargs = {}
+        if dispatcher_kwargs is None:
+            dispatcher_kwargs = {}
+        if scheduler_kwargs is None:
+            scheduler_kwargs = {}
+        if worker_kwargs is None:
+            worker_kwargs = {}
+        if cutoff_kwargs is None:
+            cutoff_kwargs = {}
+        if warm_start:
+            worker_kwargs.setdefault('warm_start', True)
 
         self.working_directory = working_directory
         self.temp_dir = tempfile.TemporaryDirectory()
@@ -90,7 +348,7 @@ class Master:
             self.logger = logger
 
         if result_logger is None:
-            result_logger = ResultLogger(self.working_directory, self.temp_dir.name)
+            result_logger = ResultLogger(self.working_directory, self.temp_dir.name, resume=resume)
         self.result_logger = result_logger
         self.jobs = []
 
@@ -99,35 +357,68 @@ class Master:
 
         self.ds = ds
         self.ds.cutoff = cutoff
+        if worker_kwargs.get('transform_cache_size', 0) > 0:
+            # Hash the data set once. The fingerprint is sent to all workers with the data set
+            self.ds.fingerprint()
+            if cutoff > 0 and worker_kwargs.get('transform_cache_dir') is None:
+                self.logger.warning('Evaluations with a cutoff are forked and do not share their transform cache. '
+                                    'Use transform_cache_dir to exchange cached entries between evaluations')
         self.wallclock_limit = wallclock_limit
         self.cutoff = cutoff
         self.structure_cutoff_factor = structure_cutoff_factor
+        self.grace_period = grace_period
+        self.resume = resume
+        self.checkpoint_interval = checkpoint_interval
+        self.warm_start = warm_start
+        self.cutoff_model: Optional[CutoffModel] = CutoffModel(cutoff, **cutoff_kwargs) if adaptive_cutoff else None
+        self.speculative_structures = speculative_structures
         self.pre_sample = pre_sample
+        self.prefetch_size = prefetch_size
+        if dispatcher_class.remote and not pre_sample:
+            self.logger.info('Remote workers can not access the config cache. Enabling pre_sample')
+            self.pre_sample = True
+        self.shared_dataset = shared_dataset
+        # Workers scoring via cross-validation never use the holdout split
+        self._share_holdout = not (worker_kwargs.get('use_cv', False) or worker_kwargs.get('racing', False))
         self.abort = False
 
         self.n_structures = 0
 
-        # condition to synchronize the job_callback and the queue
-        self.thread_cond = threading.Condition()
+        # Event loop processing all callbacks. Only set during the optimization
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
         self.incomplete_structures: Dict[CandidateId, Tuple[CandidateStructure, int, int]] = dict()
+        self.scheduler = StructureScheduler(cutoff, **scheduler_kwargs)
+        # Pre-sampled configurations of incomplete structures. Only used with pre_sample
+        self._prefetched: Dict[CandidateId, PrefetchQueue] = dict()
+        # Structures created in advance with a provisional id, ordered by their estimated loss
+        self._speculative: List[CandidateStructure] = []
+        self._speculating = 0
+        self._speculative_idx = 0
+        # Jobs submitted to the dispatcher whose callback is not processed yet. Speculative jobs are not included
+        self._in_flight: Dict[CandidateId, Job] = dict()
+        # Proxies of structure jobs running at the time of the restored checkpoint
+        self._resumed_proxies: List[CandidateStructure] = []
+        # Structures and fidelities whose best configuration of a lower fidelity was already evaluated again
+        self._replayed: Set[Tuple[CandidateId, float]] = set()
+        # Structures evaluated on a lower fidelity whose models may be stored for warm-starting
+        self._warm_started: Dict[CandidateId, CandidateStructure] = {}
+        # Best loss of all successful evaluations per fidelity. Used as incumbent for racing
+        self._incumbents: Dict[float, float] = {}
+        self._start: Optional[float] = None
+        self._last_checkpoint = 0.
 
         if n_workers < 1:
             raise ValueError(f'Expected at least 1 worker, given {n_workers}')
-        elif n_workers == 1 and cutoff <= 0:
+        elif dispatcher_class.remote or (n_workers == 1 and cutoff <= 0):
+            # Remote workers can not access a SyncManager. Keep config cache in this process
             self.mgr: Optional[multiprocessing.Manager] = None
             self.cfg_cache: ConfigCache = ConfigCache(
                 clazz=config_generator_class,
                 init_kwargs=config_generator_kwargs,
                 model=model)
-            self.structure_generator: BaseStructureGenerator = structure_generator_class(
-                cfg_cache=self.cfg_cache,
-                cutoff=self.cutoff,
-                workdir=self.working_directory,
-                model=model,
-                wallclock_limit=wallclock_limit,
-                **structure_generator_kwargs)
         else:
-            SyncManager.register('StructureGenerator', structure_generator_class)
             SyncManager.register('ConfigCache', ConfigCache)
             self.mgr: Optional[multiprocessing.Manager] = multiprocessing.Manager()
             # noinspection PyUnresolvedReferences
@@ -135,21 +426,39 @@ class Master:
                 clazz=config_generator_class,
                 init_kwargs=config_generator_kwargs,
                 model=model)
-            # noinspection PyUnresolvedReferences
-            self.structure_generator: BaseStructureGenerator = self.mgr.StructureGenerator(
-                cfg_cache=self.cfg_cache,
-                cutoff=self.cutoff,
-                workdir=self.working_directory,
-                model=model,
-                wallclock_limit=wallclock_limit,
-                **structure_generator_kwargs)
+
+        # Structure generator always lives in the master process. Only the evaluation of transformations during the
+        # structure search is processed by the workers
+        self.structure_generator: BaseStructureGenerator = structure_generator_class(
+            cfg_cache=self.cfg_cache,
+            cutoff=self.cutoff,
+            workdir=self.working_directory,
+            model=model,
+            wallclock_limit=wallclock_limit,
+            **structure_generator_kwargs)
+
+        # Results not yet registered at the config cache. Only used with config cache replicas
+        self.config_sync_interval: Optional[float] = None
+        self._pending_results: List[EvaluationJob] = []
 
         self.workers = []
-        for i in range(n_workers):
-            worker = worker_class(wid=str(i), cfg_cache=self.cfg_cache, workdir=self.temp_dir.name)
-            self.workers.append(worker)
+        if dispatcher_class.remote:
+            # Remote workers register themselves at the dispatcher
+            if 'workdir' not in dispatcher_kwargs:
+                dispatcher_kwargs['workdir'] = self.temp_dir.name
+            dispatcher_kwargs.setdefault('worker_kwargs', worker_kwargs)
+        else:
+            if config_cache_replicas and self.mgr is not None:
+                self.config_sync_interval = config_sync_interval
+            for i in range(n_workers):
+                cfg_cache = self.cfg_cache
+                if self.config_sync_interval is not None:
+                    cfg_cache = ConfigCacheReplica(self.cfg_cache, sync_interval=self.config_sync_interval)
+                worker = worker_class(wid=str(i), cfg_cache=cfg_cache, workdir=self.temp_dir.name, **worker_kwargs)
+                self.workers.append(worker)
 
-        self.dispatcher = Dispatcher(self.workers, self.structure_generator)
+        self.dispatcher = dispatcher_class(self.workers, self.structure_generator,
+                                           ds=self.ds if resident_dataset else None, **dispatcher_kwargs)
         self.bandit_learner: BanditLearner = bandit_learner_class(**bandit_learner_kwargs)
 
     def shutdown(self) -> None:
@@ -160,6 +469,8 @@ class Master:
         self.dispatcher.shutdown()
         if self.mgr is not None:
             self.mgr.shutdown()
+        # All processes attached to the data set are terminated
+        self.ds.unshare()
 
     def cleanup(self):
         self.temp_dir.cleanup()
@@ -177,8 +488,10 @@ class Master:
         start = timeit.default_timer()
         start_time = datetime.datetime.now()
 
-        data_file = os.path.join(self.working_directory, 'dataset.pkl')
-        self.ds.store(data_file)
+        if self.shared_dataset and not self.dispatcher.remote and (self.mgr is not None or len(self.workers) > 1):
+            self.ds.share(holdout=self._share_holdout)
+
+        data_file = self.ds.store(os.path.join(self.working_directory, DATASET_DIR))
 
         self.meta_information = MetaInformation(start_time=time.time(), metric=self.ds.metric,
                                                 openml_task=self.ds.task, openml_fold=self.ds.fold,
@@ -191,11 +504,14 @@ class Master:
                          f'\twallclock_limit: {self.wallclock_limit}\n'
                          f'\tcutoff: {self.cutoff}\n'
                          f'\tpre_sample: {self.pre_sample}')
-        for worker in self.workers:
-            worker.start_time = start
-        deadline = start + self.wallclock_limit
+        self._start = start
+        resumed = self.resume and self._restore()
+        # Runtimes of a resumed optimization are relative to the virtual start of the original optimization
+        self.dispatcher.start(self._start)
+        deadline = self._start + self.wallclock_limit
+        self._last_checkpoint = timeit.default_timer()
 
-        def _optimize() -> bool:
+        async def _optimize() -> bool:
             # Basic optimization logic without parallelism
             #   for candidate in self.bandit_learner.next_candidate():
             #       if candidate.is_proxy():
@@ -211,68 +527,125 @@ class Master:
 
             it = self.bandit_learner.next_candidate()
             while True:
+                # All events occurring after this point wake up the loop
+                self._wakeup.clear()
+
                 if timeit.default_timer() > deadline:
                     self.logger.info("Timeout reached. Stopping optimization")
-                    self.dispatcher.finish_work(self.cutoff)
+                    await self._finish_work(self.grace_period, cancel=True)
                     return True
                 if self.abort:
                     self.logger.info('Aborting optimization')
-                    self.dispatcher.finish_work(self.cutoff)
+                    await self._finish_work(self.grace_period, cancel=True)
                     return True
                 if self.n_structures > 200:
                     return True
 
+                # Only create a new job if it can be dispatched immediately
+                if not self.dispatcher.wait_for_worker(0):
+                    await self._wait(deadline)
+                    continue
+
                 job = None
-                with self.thread_cond:
-                    # Create EvaluationJob if possible
-                    if len(self.incomplete_structures) > 0:
-                        # TODO random selection mostly does not work as len(self.incomplete_structures) == 1
-                        cid = random.choice(list(self.incomplete_structures.keys()))
-                        candidate, n_configs, running = self.incomplete_structures[cid]
+                # Create EvaluationJob if possible
+                if len(self.incomplete_structures) > 0:
+                    cid = self.scheduler.peek()
+                    candidate, n_configs, running = self.incomplete_structures[cid]
 
-                        config_id = candidate.cid.with_config(len(candidate.results) + running)
-                        if self.pre_sample:
-                            config, cfg_key = self.cfg_cache.sample_configuration(
-                                cid=config_id,
-                                configspace=candidate.pipeline.configuration_space,
-                                mf=self.ds.meta_features)
-                            cfg_keys = [cfg_key]
-                        else:
-                            config = None
-                            cfg_keys = candidate.cfg_keys
+                    if self.pre_sample:
+                        queue = self._prefetch_queue(candidate, running)
+                    else:
+                        queue = None
+
+                    if n_configs > 1:
+                        self.incomplete_structures[cid] = candidate, n_configs - 1, running + 1
+                        self._reschedule(cid, dispatched=True)
+                    else:
+                        del self.incomplete_structures[cid]
+                        self.scheduler.remove(cid)
+                        self._prefetched.pop(cid, None)
 
-                        job = EvaluationJob(self.ds, config_id, candidate, self.cutoff, config, cfg_keys)
-                        callback = self._evaluation_callback
+                    replay = self._replay_config(candidate)
+                    if replay is not None:
+                        config_id = queue.reserve() if queue is not None else \
+                            candidate.cid.with_config(len(candidate.results) + running)
+                        config = replay
+                        cfg_keys = candidate.cfg_keys
+                    elif queue is not None and len(queue.entries) > 0:
+                        config_id, config, cfg_key = queue.entries.popleft()
+                        cfg_keys = [cfg_key]
+                        self._reschedule(cid)
+                        self._refill(cid)
+                    elif queue is not None:
+                        config_id = queue.reserve()
+                        self._refill(cid)
+                        # Sampling is serialized with the registration of results
+                        config, cfg_key = await self._loop.run_in_executor(
+                            self._executor, partial(self.cfg_cache.sample_configuration,
+                                                    cid=config_id,
+                                                    configspace=candidate.pipeline.configuration_space,
+                                                    mf=self.ds.meta_features))
+                        cfg_keys = [cfg_key]
+                    else:
+                        config_id = candidate.cid.with_config(len(candidate.results) + running)
+                        config = None
+                        cfg_keys = candidate.cfg_keys
 
-                        if n_configs > 1:
-                            self.incomplete_structures[cid] = candidate, n_configs - 1, running + 1
-                        else:
-                            del self.incomplete_structures[cid]
-                    # Select new CandidateStructure if possible
+                    if self.cutoff_model is not None:
+                        cutoff, capped = self.cutoff_model.predict(config_id, deadline - timeit.default_timer())
                     else:
-                        try:
+                        cutoff, capped = self.cutoff, False
+                    job = EvaluationJob(self.ds, config_id, candidate, cutoff, config, cfg_keys,
+                                        fidelity=candidate.fidelity)
+                    job.capped = capped
+                    # Only losses on the same fidelity are comparable
+                    job.incumbent = self._incumbents.get(candidate.fidelity)
+                    job.replay = replay is not None
+                    callback = self._evaluation_callback
+                # Select new CandidateStructure if possible
+                else:
+                    try:
+                        if len(self._resumed_proxies) > 0:
+                            candidate = self._resumed_proxies.pop()
+                        else:
                             candidate = next(it)
-                            if candidate is None:
-                                self.logger.debug(f'Waiting for next job to finish. '
-                                                  f'Currently {len(self.dispatcher.running_jobs)} running, '
-                                                  f'{self.bandit_learner.iterations[-1].num_running} outstanding')
-                                # Safety-net to prevent infinite waiting
-                                # noinspection PyTypeChecker
-                                self.thread_cond.wait(max(self.cutoff, deadline - timeit.default_timer()))
-                                continue
-
-                            if candidate.is_proxy():
-                                job = StructureJob(self.ds, candidate, self.structure_cutoff_factor * self.cutoff)
-                                callback = self._structure_callback
-                            else:
-                                n_configs = int(candidate.budget)
-                                self.incomplete_structures[candidate.cid] = candidate, n_configs, 0
-                        except StopIteration:
-                            # Current optimization is exhausted
-                            return False
+                        if candidate is None and \
+                                len(self._speculative) + self._speculating < self.speculative_structures:
+                            # Use idle worker to create the next structure in advance
+                            job = self._speculative_job()
+                            callback = self._speculative_callback
+                        elif candidate is None:
+                            self.logger.debug(f'Waiting for next job to finish. '
+                                              f'Currently {len(self.dispatcher.running_jobs)} running, '
+                                              f'{self.bandit_learner.iterations[-1].num_running} outstanding')
+                            # Woken up by the next finished job. Waiting is bounded by the deadline
+                            await self._wait(deadline)
+                            continue
+                        elif candidate.is_proxy() and len(self._speculative) > 0:
+                            self._structure_callback(self._adopt_speculative(candidate))
+                        elif candidate.is_proxy():
+                            job = StructureJob(self.ds, candidate, self.structure_cutoff_factor * self.cutoff)
+                            callback = self._structure_callback
+                        else:
+                            n_configs = int(candidate.budget)
+                            self.incomplete_structures[candidate.cid] = candidate, n_configs, 0
+                            self._reschedule(candidate.cid)
+                            self._refill(candidate.cid)
+                    except StopIteration:
+                        # Current optimization is exhausted
+                        return False
 
                 if job is not None:
-                    self.dispatcher.submit_job(job, callback)
+                    if callback != self._speculative_callback:
+                        self._in_flight[job.cid] = job
+                    if self.dispatcher.synchronous:
+                        # Job is processed in the calling thread. Keep the event loop responsive. The master executor
+                        # is reserved for bookkeeping, which must not wait for the evaluation
+                        await self._loop.run_in_executor(
+                            None, partial(self.dispatcher.submit_job, job, self._post_callback(callback)))
+                    else:
+                        self.dispatcher.submit_job(job, self._post_callback(callback),
+                                                   timeout=deadline - timeit.default_timer())
 
         # while time_limit is not exhausted:
         #   structure, budget = structure_generator.get_next_structure()
@@ -281,22 +654,41 @@ class Master:
         #   incumbent, loss = bandit_learners.optimize(configspace, structure)
         #   Update score of selected structure with loss
 
-        # Main hyperparameter optimization logic
-        timeout = False
-        repetition = 0
-        offset = 0
-        try:
+        async def _run():
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self.dispatcher.on_worker_released = self._notify
+
+            timeout = False
+            repetition = 0
+            offset = self.bandit_learner.offset
             while not timeout:
                 # noinspection PyTypeChecker
-                self.dispatcher.finish_work(max(self.cutoff, deadline - timeit.default_timer()))
+                await self._finish_work(max(0., deadline - timeit.default_timer()) + self.grace_period,
+                                        cancel=True)
                 self.logger.info(f'Starting repetition {repetition}')
-                self.bandit_learner.reset(offset)
-                timeout = _optimize()
+                if repetition > 0 or not resumed:
+                    self.bandit_learner.reset(offset)
+                timeout = await _optimize()
                 repetition += 1
                 offset += len(self.bandit_learner.iterations)
+
+        # Main hyperparameter optimization logic
+        # Logging and registration of results are processed in the background in order of submission
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='Master')
+        try:
+            asyncio.run(_run())
         except KeyboardInterrupt:
             self.logger.info('Aborting optimization due to user interrupt')
         finally:
+            self.dispatcher.on_worker_released = None
+            self._loop = None
+            self._flush_results()
+            for cs in self._speculative:
+                self._in_background(self.structure_generator.discard, cs)
+            self._speculative.clear()
+            # Wait for all pending logging and registrations
+            self._executor.shutdown(wait=True)
             structure_explanations = self.structure_generator.explain()
             config_explanations = self.cfg_cache.explain()
             self.shutdown()
@@ -345,64 +737,429 @@ class Master:
         :return:
         """
         self.logger.debug(f'Evaluation callback {job.cid}')
-        with self.thread_cond:
-            try:
-                if job.config is None:
-                    self.logger.error(
-                        f'Encountered job without a configuration: {job.cid}. Using empty config as fallback')
-                    config = ConfigurationSpace().get_default_configuration()
-                    config.origin = 'Default'
-                    job.config = config
-
-                self.result_logger.log_evaluated_config(job.cs, job.result)
-                cs = self.bandit_learner.register_result(job.cs, job.result)
-                self.structure_generator.register_result(job.cs, job.result)
-                self.cfg_cache.register_result(job)
-
-                # Decrease number of running jobs
-                if job.cs.cid in self.incomplete_structures:
-                    _, n_configs, running = self.incomplete_structures[job.cs.cid]
-                    self.incomplete_structures[job.cs.cid] = cs, n_configs, running - 1
-            except KeyboardInterrupt:
-                raise
-            except (BrokenPipeError, EOFError) as ex:
-                self.logger.fatal(f'Lost connection to SyncManager probably due to OOM. Aborting...: {ex}',
-                                  exc_info=True)
-                self.abort = True
-            except Exception as ex:
-                self.logger.fatal(f'Encountered unhandled exception {ex}. This should never happen!', exc_info=True)
-            finally:
-                self.thread_cond.notify_all()
+        self._in_flight.pop(job.cid, None)
+        try:
+            if job.config is None and job.result.status != StatusType.ABORT:
+                self.logger.error(
+                    f'Encountered job without a configuration: {job.cid}. Using empty config as fallback')
+                config = ConfigurationSpace().get_default_configuration()
+                config.origin = 'Default'
+                job.config = config
+
+            if job.result.status == StatusType.TIMEOUT and job.capped:
+                # Killed by a predicted cutoff below the global cutoff and the remaining wallclock time
+                job.result.status = StatusType.CAPPED
+            if self.cutoff_model is not None:
+                self.cutoff_model.observe(job.cid, job.result)
+
+            self._in_background(self.result_logger.log_evaluated_config, job.cs, job.result)
+            cs = self.bandit_learner.register_result(job.cs, job.result)
+            self._in_background(self.structure_generator.register_result, job.cs, job.result)
+            if not job.replay and job.config is not None:
+                # Replayed configurations were not sampled by the config generator. Cancelled jobs sampling their
+                # configuration on the fly never report their configuration
+                self._register_config_result(job)
+            if self.warm_start:
+                self._evict_warm_start(job, cs)
+
+            # Decrease number of running jobs
+            self.scheduler.observe(job.result.loss)
+            if job.result.status == StatusType.SUCCESS and job.result.loss is not None and \
+                    math.isfinite(job.result.loss) and job.result.loss < self._incumbents.get(job.fidelity, math.inf):
+                self._incumbents[job.fidelity] = job.result.loss
+            if job.cs.cid in self.incomplete_structures:
+                _, n_configs, running = self.incomplete_structures[job.cs.cid]
+                self.incomplete_structures[job.cs.cid] = cs, n_configs, running - 1
+                self._reschedule(job.cs.cid)
+
+            # Result changes the model of the config generator. Prefetched configurations are outdated
+            for cid, queue in self._prefetched.items():
+                if queue.cfg_key is not None and queue.cfg_key in job.cfg_keys:
+                    queue.invalidate()
+                    self._reschedule(cid)
+                    self._refill(cid)
+            self._rescore_speculative()
+            self._checkpoint()
+        except KeyboardInterrupt:
+            raise
+        except (BrokenPipeError, EOFError) as ex:
+            self.logger.fatal(f'Lost connection to SyncManager probably due to OOM. Aborting...: {ex}',
+                              exc_info=True)
+            self.abort = True
+        except Exception as ex:
+            self.logger.fatal(f'Encountered unhandled exception {ex}. This should never happen!', exc_info=True)
+        finally:
+            self._notify()
 
     def _structure_callback(self, cs: CandidateStructure):
         self.logger.debug(f'Structure callback {cs.cid}')
-        with self.thread_cond:
+        self._in_flight.pop(cs.cid, None)
+        try:
+            if cs.is_proxy():
+                from dswizard.components.data_preprocessing.imputation import ImputationComponent
+                from dswizard.components.feature_preprocessing.one_hot_encoding import OneHotEncoderComponent
+                from dswizard.components.classification.decision_tree import DecisionTree
+                from dswizard.optimizers.structure_generators.fixed import FixedStructure
+
+                self.logger.warning('Encountered job without a structure. Using simple best-practice pipeline.')
+                cs = FixedStructure(steps=[('ohe', OneHotEncoderComponent()),
+                                           ('imputation', ImputationComponent()),
+                                           ('dt', DecisionTree())], cfg_cache=self.cfg_cache) \
+                    .fill_candidate(cs, self.ds)
+
+            self._in_background(self.result_logger.new_structure, cs)
+            self.bandit_learner.replace_proxy(cs)
+
+            self.incomplete_structures[cs.cid] = cs, int(cs.budget), 0
+            self._reschedule(cs.cid)
+            self._refill(cs.cid)
+
+            self.n_structures = self.n_structures + 1
+        except KeyboardInterrupt:
+            raise
+        except (BrokenPipeError, EOFError) as ex:
+            self.logger.fatal(f'Lost connection to SyncManager probably due to OOM. Aborting...: {ex}',
+                              exc_info=True)
+            self.abort = True
+        except Exception as ex:
+            self.logger.fatal(f'Encountered unhandled exception {ex}. This should never happen!', exc_info=True)
+        finally:
+            self._notify()
+
+    def _speculative_job(self) -> StructureJob:
+        cs = CandidateStructure.proxy()
+        # Provisional id. Replaced by the id of the proxy the structure is assigned to
+        cs.cid = CandidateId(-1, self._speculative_idx)
+        self._speculative_idx += 1
+        self._speculating += 1
+        return StructureJob(self.ds, cs, self.structure_cutoff_factor * self.cutoff)
+
+    def _speculative_callback(self, cs: CandidateStructure) -> None:
+        self.logger.debug(f'Speculative structure callback {cs.cid}')
+        try:
+            self._speculating -= 1
+            if cs.is_proxy():
+                self.logger.debug(f'Failed to create speculative structure {cs.cid}')
+            elif self._loop is None:
+                # Optimization is already finished
+                self.structure_generator.discard(cs)
+            else:
+                self._speculative.append(cs)
+                self._rescore_speculative()
+        except Exception as ex:
+            self.logger.fatal(f'Encountered unhandled exception {ex}. This should never happen!', exc_info=True)
+        finally:
+            self._notify()
+
+    def _rescore_speculative(self) -> None:
+        """
+        Ranks all speculative structures by the current estimate of the structure generator. Structures estimated
+        to perform not better than the worst possible score are discarded
+        """
+        if len(self._speculative) == 0:
+            return
+
+        worst_score = util.worst_score(self.ds.metric)[-1]
+        scored = []
+        for cs in self._speculative:
+            score = self.structure_generator.score(cs)
+            if score is not None and score >= worst_score:
+                self.logger.debug(f'Discarding speculative structure {cs.cid} with estimated loss {score}')
+                self._in_background(self.structure_generator.discard, cs)
+            else:
+                # Structures without estimate are ranked behind all estimated structures in order of creation
+                scored.append((math.inf if score is None else score, cs))
+        scored.sort(key=lambda t: t[0])
+        self._speculative = [cs for _, cs in scored]
+
+    def _adopt_speculative(self, proxy: CandidateStructure) -> CandidateStructure:
+        cs = self._speculative.pop(0)
+        self.logger.debug(f'Using speculative structure {cs.cid} for {proxy.cid}')
+        self.structure_generator.rename_candidate(cs.cid, proxy.cid)
+        cs.cid = proxy.cid
+        cs.budget = proxy.budget
+        # Speculative structures are created with the complete training data
+        cs.fidelity = proxy.fidelity
+        cs.status = proxy.status
+        # Results may already be created during structure creation
+        for result in cs.results:
+            result.cid = proxy.cid.with_config(result.cid.config)
+        return cs
+
+    def _checkpoint(self) -> None:
+        """
+        Stores the state of the optimization in the working directory if the checkpoint interval has passed. Jobs
+        without a processed result are stored as pending configurations or proxies and are evaluated again on resume
+        """
+        if self.checkpoint_interval is None or self._loop is None or \
+                timeit.default_timer() - self._last_checkpoint < self.checkpoint_interval:
+            return
+        self._last_checkpoint = timeit.default_timer()
+
+        incomplete = {cid: (cs, n_configs + running)
+                      for cid, (cs, n_configs, running) in self.incomplete_structures.items()}
+        proxies = []
+        for job in self._in_flight.values():
+            if isinstance(job, StructureJob):
+                proxies.append(job.cs)
+            elif job.cs.cid not in self.incomplete_structures:
+                # All configurations of this structure are already dispatched
+                _, n_configs = incomplete.get(job.cs.cid, (job.cs, 0))
+                incomplete[job.cs.cid] = job.cs, n_configs + 1
+
+        # Wait until all previously submitted results are logged and registered. All components are serialized in the
+        # loop thread afterwards. As the loop is blocked, no further results are submitted in the meantime
+        self._flush_results()
+        try:
+            self._executor.submit(lambda: None).result()
+        except RuntimeError:
+            # Optimization is already finished
+            return
+
+        try:
+            state = util.dumps({
+                'bandit_learner': self.bandit_learner,
+                'incomplete_structures': incomplete,
+                'proxies': proxies,
+                'scheduler': self.scheduler,
+                'cutoff_model': self.cutoff_model,
+                'n_structures': self.n_structures,
+                'replayed': self._replayed,
+                'incumbents': self._incumbents,
+                'elapsed': timeit.default_timer() - self._start
+            }, {'ds': self.ds})
+            states = {
+                'master': state,
+                'structure_generator': self.structure_generator.get_state(),
+                'config_cache': self.cfg_cache.get_state()
+            }
+        except Exception as ex:
+            self.logger.warning(f'Failed to create checkpoint: {ex}')
+            return
+        # Only writing the checkpoint is processed in the background. Results logged in the meantime are not included
+        self._in_background(self._store_checkpoint, self.result_logger.offsets(), states)
+
+    def _store_checkpoint(self, offsets: Tuple[int, int], states: Dict[str, Optional[bytes]]) -> None:
+        self.result_logger.log_checkpoint(offsets, **states)
+        self.logger.debug('Stored checkpoint')
+
+    def _restore(self) -> bool:
+        """
+        Restores the state of the optimization from the last checkpoint in the working directory
+        :return: True if a checkpoint was restored
+        """
+        checkpoint = self.result_logger.load_checkpoint()
+        if checkpoint is None:
+            self.logger.info('No checkpoint found. Starting new optimization')
+            return False
+
+        state = util.loads(checkpoint['master'], {'ds': self.ds})
+        # All times are stored relative to the start of the optimization. Clocks of different processes are not
+        # comparable
+        self._start -= state['elapsed']
+        self.bandit_learner = state['bandit_learner']
+        self.scheduler = state['scheduler']
+        self.scheduler.start = self._start
+        self.cutoff_model = state['cutoff_model']
+        self.n_structures = state['n_structures']
+        self._replayed = state['replayed']
+        self._incumbents = state['incumbents']
+        for cid, (cs, n_configs) in state['incomplete_structures'].items():
+            self.incomplete_structures[cid] = cs, n_configs, 0
+            self._reschedule(cid)
+        self._resumed_proxies = state['proxies']
+
+        self.structure_generator.set_state(checkpoint['structure_generator'], self.ds)
+        if checkpoint['config_cache'] is not None:
+            self.cfg_cache.set_state(checkpoint['config_cache'])
+
+        self.logger.info(f'Resuming optimization after {state["elapsed"]:.0f} seconds with '
+                         f'{len(self.incomplete_structures)} incomplete structures')
+        return True
+
+    def _replay_config(self, candidate: CandidateStructure) -> Optional[Configuration]:
+        """
+        Selects the best configuration of the given structure evaluated on a lower fidelity. Each configuration is
+        replayed at most once per fidelity
+        :param candidate:
+        :return: configuration to evaluate again or None if no configuration should be replayed
+        """
+        if not self.warm_start or (candidate.cid, candidate.fidelity) in self._replayed:
+            return None
+        results = [res for res in candidate.results if res.fidelity < candidate.fidelity and
+                   res.config is not None and res.loss is not None and math.isfinite(res.loss)]
+        if len(results) == 0:
+            return None
+        self._replayed.add((candidate.cid, candidate.fidelity))
+        return min(results, key=lambda res: res.loss).config
+
+    def _evict_warm_start(self, job: EvaluationJob, cs: CandidateStructure) -> None:
+        """
+        Removes models stored by local workers for warm-starting that will not be continued anymore. Once the best
+        configuration was replayed on a higher fidelity, models of the lower fidelity are obsolete. All models of
+        finished structures are obsolete
+        :param job: finished job
+        :param cs: structure of the job
+        """
+        directory = os.path.join(self.temp_dir.name, WARM_START_DIR)
+        if job.fidelity < 1:
+            self._warm_started[cs.cid] = cs
+        if job.replay and job.time_started is not None:
+            # Models of the higher fidelity are only stored after the replay started
+            self._in_background(self._remove_files, os.path.join(directory, util.warm_start_dir(cs.cid)),
+                                job.time_started)
+
+        for cid, candidate in list(self._warm_started.items()):
+            if candidate.status in ('TERMINATED', 'COMPLETED', 'CRASHED'):
+                del self._warm_started[cid]
+                self._in_background(shutil.rmtree, os.path.join(directory, util.warm_start_dir(cid)), True)
+
+    @staticmethod
+    def _remove_files(directory: str, modified_before: float) -> None:
+        try:
+            files = os.listdir(directory)
+        except FileNotFoundError:
+            return
+        for name in files:
+            file = os.path.join(directory, name)
+            try:
+                if os.path.getmtime(file) < modified_before:
+                    os.remove(file)
+            except FileNotFoundError:
+                pass
+
+    def _post_callback(self, callback: Callable) -> Callable:
+        """
+        Wraps a callback invoked by threads of the dispatcher. The actual callback is processed by the event loop
+        :param callback:
+        :return:
+        """
+        loop = self._loop
+
+        def _callback(result):
             try:
-                if cs.is_proxy():
-                    from dswizard.components.data_preprocessing.imputation import ImputationComponent
-                    from dswizard.components.feature_preprocessing.one_hot_encoding import OneHotEncoderComponent
-                    from dswizard.components.classification.decision_tree import DecisionTree
-                    from dswizard.optimizers.structure_generators.fixed import FixedStructure
-
-                    self.logger.warning('Encountered job without a structure. Using simple best-practice pipeline.')
-                    cs = FixedStructure(steps=[('ohe', OneHotEncoderComponent()),
-                                               ('imputation', ImputationComponent()),
-                                               ('dt', DecisionTree())], cfg_cache=self.cfg_cache) \
-                        .fill_candidate(cs, self.ds)
-
-                self.result_logger.new_structure(cs)
-                self.bandit_learner.iterations[-1].replace_proxy(cs)
-
-                self.incomplete_structures[cs.cid] = cs, int(cs.budget), 0
-
-                self.n_structures = self.n_structures + 1
-            except KeyboardInterrupt:
-                raise
-            except (BrokenPipeError, EOFError) as ex:
-                self.logger.fatal(f'Lost connection to SyncManager probably due to OOM. Aborting...: {ex}',
-                                  exc_info=True)
-                self.abort = True
-            except Exception as ex:
-                self.logger.fatal(f'Encountered unhandled exception {ex}. This should never happen!', exc_info=True)
-            finally:
-                self.thread_cond.notify_all()
+                loop.call_soon_threadsafe(callback, result)
+            except RuntimeError:
+                # Event loop is already closed. Process result in calling thread
+                callback(result)
+
+        return _callback
+
+    def _notify(self) -> None:
+        # Wake up event loop. Can be called from any thread
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            pass
+
+    async def _wait(self, deadline: float) -> None:
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), max(0., deadline - timeit.default_timer()))
+        except asyncio.TimeoutError:
+            pass
+
+    async def _finish_work(self, timeout: float, cancel: bool = False) -> None:
+        # Callbacks of finishing jobs are processed by the event loop while waiting
+        await self._loop.run_in_executor(None, self.dispatcher.finish_work, timeout, cancel)
+
+    def _reschedule(self, cid: CandidateId, dispatched: bool = False) -> None:
+        """
+        Updates the priority of an incomplete structure. Structures with pre-sampled configurations are preferred to
+        dispatch without delay
+        """
+        if cid not in self.incomplete_structures:
+            return
+        cs, n_configs, _ = self.incomplete_structures[cid]
+        queue = self._prefetched.get(cid)
+        self.scheduler.update(cs, n_configs, dispatched=dispatched, ready=queue is not None and len(queue.entries) > 0)
+
+    def _prefetch_queue(self, candidate: CandidateStructure, running: int) -> PrefetchQueue:
+        if candidate.cid not in self._prefetched:
+            self._prefetched[candidate.cid] = PrefetchQueue(candidate.cid, len(candidate.results) + running)
+        return self._prefetched[candidate.cid]
+
+    def _refill(self, cid: CandidateId) -> None:
+        """
+        Samples configurations for the given structure in the background until its prefetch queue is full
+        :param cid:
+        :return:
+        """
+        if not self.pre_sample or self.prefetch_size <= 0 or self._loop is None or \
+                cid not in self.incomplete_structures:
+            return
+
+        candidate, n_configs, running = self.incomplete_structures[cid]
+        queue = self._prefetch_queue(candidate, running)
+        for _ in range(min(self.prefetch_size, n_configs) - len(queue.entries) - queue.pending):
+            config_id = queue.reserve()
+            queue.pending += 1
+            future = self._loop.run_in_executor(self._executor, partial(
+                self.cfg_cache.sample_configuration,
+                cid=config_id,
+                configspace=candidate.pipeline.configuration_space,
+                mf=self.ds.meta_features))
+            future.add_done_callback(partial(self._prefetch_done, queue, queue.generation, config_id))
+
+    def _prefetch_done(self, queue: PrefetchQueue, generation: int, config_id: CandidateId,
+                       future: asyncio.Future) -> None:
+        if generation != queue.generation:
+            # Queue was invalidated in the meantime
+            queue.release(config_id)
+            return
+        queue.pending -= 1
+
+        try:
+            config, cfg_key = future.result()
+        except Exception as ex:
+            self.logger.warning(f'Failed to prefetch configuration {config_id}: {ex}')
+            queue.release(config_id)
+            return
+        queue.entries.append((config_id, config, cfg_key))
+        queue.cfg_key = cfg_key
+        if len(queue.entries) == 1:
+            self._reschedule(queue.cid)
+
+    def _register_config_result(self, job: EvaluationJob) -> None:
+        if self.config_sync_interval is None:
+            self._in_background(self.cfg_cache.register_result, job)
+            return
+
+        # Data set and structure are not required for registration
+        job = copy.copy(job)
+        job.ds = None
+        job.cs = None
+        self._pending_results.append(job)
+        if self._loop is None:
+            self._flush_results()
+        elif len(self._pending_results) == 1:
+            self._loop.call_later(self.config_sync_interval, self._flush_results)
+
+    def _flush_results(self) -> None:
+        if len(self._pending_results) == 0:
+            return
+        batch, self._pending_results = self._pending_results, []
+        self._in_background(self.cfg_cache.register_results, batch)
+
+    def _in_background(self, fn: Callable, *args) -> None:
+        """
+        Processes the given function in the background. All functions are processed sequentially in order of
+        submission.
+        """
+        try:
+            self._executor.submit(self._guarded, fn, *args)
+        except RuntimeError:
+            # Optimization is already finished. Process in calling thread
+            self._guarded(fn, *args)
+
+    def _guarded(self, fn: Callable, *args) -> None:
+        try:
+            fn(*args)
+        except (BrokenPipeError, EOFError) as ex:
+            self.logger.fatal(f'Lost connection to SyncManager probably due to OOM. Aborting...: {ex}', exc_info=True)
+            self.abort = True
+            self._notify()
+        except Exception as ex:
+            self.logger.fatal(f'Encountered unhandled exception {ex}. This should never happen!', exc_info=True)
@@ -1,6 +1,11 @@
 from __future__ import annotations
 
+import copy
+import json
+import logging
+import os
 import re
+import threading
 from collections import namedtuple
 from enum import Enum
 from typing import Optional, List, TYPE_CHECKING, Tuple, Union, Any, Dict
@@ -11,6 +16,7 @@ from ConfigSpace import ConfigurationSpace
 from ConfigSpace.configuration_space import Configuration
 from ConfigSpace.read_and_write import json as config_json
 from sklearn.base import BaseEstimator
+from sklearn.model_selection import train_test_split, StratifiedKFold
 
 import dswizard.components.util as comp_util
 from dswizard.components.base import EstimatorComponent
@@ -34,6 +40,14 @@ class StatusType(Enum):
     DUPLICATE = 8
 
 
+# Layout of data sets stored via Dataset.store
+DATASET_FORMAT_VERSION = 1
+DATASET_MANIFEST = 'dataset.json'
+# Fraction of the data set used to score configurations
+HOLDOUT_SIZE = 0.2
+# Names of the materialized holdout arrays if they are stored in shared memory
+HOLDOUT_ARRAYS = ('X_train', 'X_test', 'y_train', 'y_test')
+
 # Namedtuple instead of class to allow sharing between processes
 ConfigKey = namedtuple('ConfigKey', 'hash idx')
 
@@ -178,7 +192,9 @@ class Result:
                  structure_loss: Optional[float] = None,
                  runtime: Runtime = None,
                  partial_configs: Optional[List[PartialConfig]] = None,
-                 transformed_X: np.ndarray = None):
+                 transformed_X: np.ndarray = None,
+                 transformed_ds: Optional[Dataset] = None,
+                 fidelity: float = 1.):
         self.cid = cid
         self.status = status
         self.config = config
@@ -190,7 +206,11 @@ class Result:
         self.structure_loss = structure_loss
 
         self.runtime = runtime
+        # Fraction of the training data used for the evaluation
+        self.fidelity = fidelity
         self.transformed_X = transformed_X
+        # Data set derived from transformed_X including meta-features. Created by the worker
+        self.transformed_ds = transformed_ds
 
         if partial_configs is None:
             partial_configs = []
@@ -206,7 +226,8 @@ class Result:
             'loss': self.loss * loss_sign,
             'structure_loss': self.structure_loss,  # by definition always a min. problem, no need to adjust sign
             'runtime': self.runtime.as_dict() if self.runtime is not None else None,
-            'config': self.config.get_dictionary(),
+            'fidelity': self.fidelity,
+            'config': self.config.get_dictionary() if self.config is not None else None,
             'origin': self.config.origin if self.config is not None else None,
         }
         if budget is not None:
@@ -215,10 +236,13 @@ class Result:
 
     @staticmethod
     def from_dict(raw: Dict, cs: ConfigurationSpace) -> 'Result':
-        config = Configuration(cs, raw['config'])
-        config.origin = raw['origin']
+        config = None
+        if raw['config'] is not None:
+            config = Configuration(cs, raw['config'])
+            config.origin = raw['origin']
         return Result(CandidateId.parse(raw['id']), StatusType[raw['status']], config,
-                      raw['loss'], raw['structure_loss'], Runtime.from_dict(raw['runtime']))
+                      raw['loss'], raw['structure_loss'], Runtime.from_dict(raw['runtime']),
+                      fidelity=raw.get('fidelity', 1.))
 
 
 class CandidateStructure:
@@ -232,6 +256,8 @@ class CandidateStructure:
         self.pipeline = pipeline
         self.cfg_keys = cfg_keys
         self.budget = budget
+        # Fraction of the training data used to evaluate configurations of this structure
+        self.fidelity: float = 1.
 
         # noinspection PyTypeChecker
         self.cid: CandidateId = None
@@ -305,12 +331,22 @@ class EvaluationJob(Job):
                  cs: Union[CandidateStructure, EstimatorComponent],
                  cutoff: float = None,
                  config: Optional[Configuration] = None,
-                 cfg_keys: Optional[List[ConfigKey]] = None):
+                 cfg_keys: Optional[List[ConfigKey]] = None,
+                 fidelity: float = 1.):
         super().__init__(candidate_id, cutoff)
         self.ds: Dataset = ds
         self.cs: Union[CandidateStructure, EstimatorComponent] = cs
         self.config = config
         self.cfg_keys = cfg_keys
+        self.fidelity = fidelity
+        # Loss of the current incumbent. Allows workers to abort evaluations that can not improve the incumbent
+        self.incumbent: Optional[float] = None
+        # Explanations of config generators recorded by a ConfigCacheReplica while sampling config
+        self.explanations: Optional[Dict[ConfigKey, Dict[str, Any]]] = None
+        # Configuration was already evaluated on a lower fidelity and is evaluated again
+        self.replay = False
+        # Cutoff was predicted below the global cutoff and the remaining wallclock time
+        self.capped = False
 
     # Decorator pattern only used for better readability
     @property
@@ -329,6 +365,71 @@ class StructureJob(Job):
         self.cs = cs
 
 
+class SharedArray:
+    """
+    Picklable reference to a numpy array stored in a shared memory block. Processes unpickling a Dataset use this
+    reference to attach to the block read-only instead of receiving a copy of the data.
+    """
+
+    def __init__(self, name: str, shape: Tuple[int, ...], dtype: np.dtype):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+
+    @staticmethod
+    def create(array: np.ndarray) -> Tuple[SharedArray, np.ndarray]:
+        from multiprocessing import shared_memory
+
+        shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        with _shared_lock:
+            _shared_blocks[shm.name] = shm
+
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+        view[...] = array
+        view.flags.writeable = False
+        return SharedArray(shm.name, array.shape, array.dtype), view
+
+    def attach(self) -> np.ndarray:
+        from multiprocessing import shared_memory, resource_tracker
+
+        # Blocks may be attached concurrently by several threads. Patching the resource tracker is only safe if all
+        # attaching threads are serialized
+        with _shared_lock:
+            if self.name not in _shared_blocks:
+                # Only the creating process is responsible for removing the block. Prevent the resource tracker of
+                # attaching processes from removing it on exit, see https://bugs.python.org/issue39959
+                register = resource_tracker.register
+                resource_tracker.register = lambda *args, **kwargs: None
+                try:
+                    _shared_blocks[self.name] = shared_memory.SharedMemory(name=self.name)
+                finally:
+                    resource_tracker.register = register
+            shm = _shared_blocks[self.name]
+
+        view = np.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf)
+        view.flags.writeable = False
+        return view
+
+    def release(self, owner: bool = False):
+        with _shared_lock:
+            shm = _shared_blocks.pop(self.name, None)
+        if shm is None:
+            return
+        try:
+            shm.close()
+        except BufferError:
+            # Views on the block are still referenced. Memory is released when the process exits
+            pass
+        if owner:
+            shm.unlink()
+
+
+# Shared memory blocks attached to (or created by) the current process. Blocks stay mapped as long as the process is
+# running as numpy views on them may be referenced anywhere.
+_shared_blocks = {}
+_shared_lock = threading.Lock()
+
+
 class Dataset:
 
     def __init__(self,
@@ -338,7 +439,16 @@ class Dataset:
                  cutoff: int = 120,
                  task: int = None,
                  fold: int = None,
-                 feature_names: List[str] = None):
+                 feature_names: List[str] = None,
+                 mf_dict: Optional[Dict[str, float]] = None,
+                 meta_features: Optional[MetaFeatures] = None,
+                 holdout_indices: Optional[Tuple[np.ndarray, np.ndarray]] = None):
+        """
+        :param mf_dict: precomputed meta-features, e.g. restored from a stored data set. If neither mf_dict nor
+            meta_features are given, the meta-features are calculated
+        :param meta_features: precomputed meta-features as array
+        :param holdout_indices: precomputed train and test indices of the holdout split
+        """
         self.X = X
         self.y = y
 
@@ -347,15 +457,234 @@ class Dataset:
         self.metric = metric
         self.cutoff = cutoff
 
-        self.mf_dict, self.meta_features = MetaFeatureFactory.calculate(X, y, timeout=self.cutoff)
+        if mf_dict is None and meta_features is None:
+            mf_dict, meta_features = MetaFeatureFactory.calculate(X, y, timeout=self.cutoff)
+        self.mf_dict, self.meta_features = mf_dict, meta_features
 
         self.task = task
         self.fold = fold
 
         self.feature_names = feature_names
 
-    def store(self, file_name: str):
-        joblib.dump((self.X, self.y, self.feature_names), file_name)
+        # Splits are computed once and reused by all evaluations. Materialized holdout arrays are only pickled as
+        # references to shared memory blocks
+        self._holdout_indices = holdout_indices
+        self._holdout: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = None
+        self._cv_splits: Dict[int, List[Tuple[np.ndarray, np.ndarray]]] = {}
+        # Content hash of X and y. Computed at most once and pickled with the data set
+        self._fingerprint: Optional[str] = None
+
+        # References to shared memory blocks if X and y are shared between processes
+        self._shared: Optional[Dict[str, SharedArray]] = None
+        self._owner = False
+
+    def holdout_indices(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Train and test indices of the holdout split used to score configurations
+        :return:
+        """
+        if self._holdout_indices is None:
+            self._holdout_indices = tuple(train_test_split(np.arange(len(self.y)), test_size=HOLDOUT_SIZE,
+                                                           random_state=42))
+        return self._holdout_indices
+
+    def holdout(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Holdout split materialized as contiguous arrays. If the split is shared, all processes use the same arrays in
+        shared memory. Otherwise, the arrays are created once per process. The arrays must not be modified
+        :return: X_train, X_test, y_train, y_test
+        """
+        if self._holdout is None:
+            train, test = self.holdout_indices()
+            self._holdout = self.X[train], self.X[test], self.y[train], self.y[test]
+        return self._holdout
+
+    def fingerprint(self) -> str:
+        """
+        Content hash of X and y identifying the data set, e.g. in the transform cache. Hashing large data sets is
+        expensive, therefore the hash is computed only once
+        :return:
+        """
+        if self._fingerprint is None:
+            self._fingerprint = joblib.hash((self.X, self.y))
+        return self._fingerprint
+
+    def cv_splits(self, n_splits: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Train and test indices of a stratified k-fold cross-validation
+        :param n_splits: number of folds
+        :return:
+        """
+        if n_splits not in self._cv_splits:
+            self._cv_splits[n_splits] = list(StratifiedKFold(n_splits).split(np.zeros((len(self.y), 1)), self.y))
+        return self._cv_splits[n_splits]
+
+    @property
+    def is_shared(self) -> bool:
+        return self._shared is not None
+
+    def share(self, holdout: bool = True) -> bool:
+        """
+        Moves X and y into shared memory blocks. Afterwards, pickling this data set only transfers references to the
+        blocks. Unpickling processes attach to the blocks read-only instead of receiving a copy. Arrays containing
+        Python objects can not be shared and are still pickled.
+        :param holdout: additionally materialize the holdout split once in shared memory instead of in each process
+        :return: True if at least one array is stored in shared memory
+        """
+        if self._shared is not None:
+            return True
+
+        shared = {}
+        try:
+            for name in ('X', 'y'):
+                array = getattr(self, name)
+                if not isinstance(array, np.ndarray) or array.dtype.hasobject:
+                    logging.getLogger('Dataset').warning(f'Unable to share {name} with dtype '
+                                                         f'{getattr(array, "dtype", type(array))} between processes')
+                    continue
+                shared[name], view = SharedArray.create(array)
+                setattr(self, name, view)
+            if holdout and 'X' in shared and 'y' in shared:
+                train, test = self.holdout_indices()
+                views = []
+                for name, array, indices in zip(HOLDOUT_ARRAYS, (self.X, self.X, self.y, self.y),
+                                                (train, test, train, test)):
+                    shared[name], view = SharedArray.create(array[indices])
+                    views.append(view)
+                self._holdout = tuple(views)
+        except ImportError as ex:
+            logging.getLogger('Dataset').warning(f'Shared memory is not available: {ex}')
+
+        if len(shared) == 0:
+            return False
+        self._shared = shared
+        self._owner = True
+        return True
+
+    def unshare(self) -> None:
+        """
+        Copies X and y back into private memory and releases the shared memory blocks. If this process created the
+        blocks, they are removed.
+        """
+        if self._shared is None:
+            return
+        self._holdout = None
+        for name, ref in self._shared.items():
+            if name not in HOLDOUT_ARRAYS:
+                setattr(self, name, np.array(getattr(self, name)))
+            ref.release(owner=self._owner)
+        self._shared = None
+        self._owner = False
+
+    def unshared_copy(self) -> Dataset:
+        """
+        Creates a shallow copy of this data set that is pickled including X and y, e.g. for sending it to another host
+        that can not attach to the local shared memory blocks.
+        :return:
+        """
+        ds = copy.copy(self)
+        ds._shared = None
+        ds._owner = False
+        return ds
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_holdout'] = None
+        if self._shared is not None:
+            for name in self._shared.keys():
+                state.pop(name, None)
+        state['_owner'] = False
+        return state
+
+    def __setstate__(self, state):
+        self._shared = None
+        self._owner = False
+        self._holdout_indices = None
+        self._holdout = None
+        self._cv_splits = {}
+        self._fingerprint = None
+        self.__dict__.update(state)
+        if self._shared is not None:
+            for name, ref in self._shared.items():
+                if name not in HOLDOUT_ARRAYS:
+                    setattr(self, name, ref.attach())
+            if all(name in self._shared for name in HOLDOUT_ARRAYS):
+                self._holdout = tuple(self._shared[name].attach() for name in HOLDOUT_ARRAYS)
+
+    def store(self, directory: str) -> str:
+        """
+        Stores the data set as raw .npy arrays accompanied by a JSON manifest. Stored data sets can be loaded via
+        memory-mapping, see `Dataset.load`.
+        :param directory: output directory. Created if it does not exist
+        :return: path of the manifest
+        """
+        os.makedirs(directory, exist_ok=True)
+
+        arrays = {}
+        train, test = self.holdout_indices()
+        for name, array in (('X', self.X), ('y', self.y), ('meta_features', self.meta_features),
+                            ('holdout_train', train), ('holdout_test', test)):
+            if array is None:
+                continue
+            array = np.asarray(array)
+            file_name = f'{name}.npy'
+            # Arrays containing Python objects are pickled by numpy and can not be memory-mapped
+            np.save(os.path.join(directory, file_name), array, allow_pickle=array.dtype.hasobject)
+            arrays[name] = {'file': file_name, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+
+        manifest = {
+            'version': DATASET_FORMAT_VERSION,
+            'arrays': arrays,
+            'metric': self.metric,
+            'cutoff': self.cutoff,
+            'task': self.task,
+            'fold': self.fold,
+            'feature_names': self.feature_names,
+            'mf_dict': {key: float(value) for key, value in self.mf_dict.items()} if self.mf_dict is not None
+            else None
+        }
+        manifest_file = os.path.join(directory, DATASET_MANIFEST)
+        with open(manifest_file, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        return manifest_file
+
+    @staticmethod
+    def load(path: str, mmap_mode: Optional[str] = 'r') -> Dataset:
+        """
+        Loads a data set stored via `Dataset.store`. Arrays are memory-mapped, so loading only costs page faults on
+        access instead of reading the complete data set.
+        :param path: directory containing the data set or path of the manifest. Legacy pickled data sets (.pkl) are
+            loaded completely
+        :param mmap_mode: memory-map mode passed to `numpy.load`. Use None to read the arrays into memory
+        :return:
+        """
+        if path.endswith('.pkl'):
+            X, y, feature_names = joblib.load(path)
+            return Dataset(X, y, feature_names=feature_names)
+
+        if os.path.isdir(path):
+            path = os.path.join(path, DATASET_MANIFEST)
+        directory = os.path.dirname(path)
+        with open(path) as f:
+            manifest = json.load(f)
+
+        arrays = {}
+        for name, info in manifest['arrays'].items():
+            if np.dtype(info['dtype']).hasobject:
+                arrays[name] = np.load(os.path.join(directory, info['file']), allow_pickle=True)
+            else:
+                arrays[name] = np.load(os.path.join(directory, info['file']), mmap_mode=mmap_mode)
+
+        return Dataset(arrays['X'], arrays['y'],
+                       metric=manifest['metric'],
+                       cutoff=manifest['cutoff'],
+                       task=manifest['task'],
+                       fold=manifest['fold'],
+                       feature_names=manifest['feature_names'],
+                       mf_dict=manifest['mf_dict'],
+                       meta_features=arrays.get('meta_features'),
+                       holdout_indices=(arrays['holdout_train'], arrays['holdout_test'])
+                       if 'holdout_train' in arrays else None)
 
     @staticmethod
     def from_openml(task: int, fold: int, metric: str):
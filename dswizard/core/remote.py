@@ -0,0 +1,435 @@
+from __future__ import annotations
+
+import argparse
+import copy
+import logging
+import multiprocessing
+import os
+import pickle
+import signal
+import socket
+import threading
+import timeit
+from multiprocessing.connection import Listener, Client, Connection, AuthenticationError
+from multiprocessing.reduction import ForkingPickler
+from typing import Dict, List, Optional, Tuple, Type, TYPE_CHECKING
+
+from dswizard.core.dispatcher import Dispatcher
+from dswizard.core.model import EvaluationJob, Result, StatusType
+from dswizard.core.worker import Worker
+from dswizard.util import util
+
+if TYPE_CHECKING:
+    from dswizard.core.base_structure_generator import BaseStructureGenerator
+    from dswizard.core.model import Job, Dataset
+
+COMPUTE = 'compute'
+TRANSFORM = 'transform'
+SHUTDOWN = 'shutdown'
+
+
+class RemoteWorker(Worker):
+    """
+    Handle of a worker process hosted by a WorkerDaemon, potentially on another machine. All jobs are forwarded via
+    the connection and processed remotely. Models created by the remote worker are sent back and stored in the local
+    working directory.
+    """
+
+    def __init__(self,
+                 conn: Connection,
+                 resident_ds: Optional[Dataset],
+                 logger: logging.Logger = None,
+                 wid: str = None,
+                 workdir: str = '/tmp/dswizard/'):
+        super().__init__(logger=logger, wid=wid, workdir=workdir)
+        self.conn = conn
+        self.resident_ds = resident_ds
+        self.lost = False
+
+    def start_computation(self, job: EvaluationJob) -> Result:
+        result = self._call(COMPUTE, job)
+        if result is None:
+            worst_score = util.worst_score(job.ds.metric)
+            result = Result(job.cid, StatusType.CRASHED, job.config, worst_score[0], worst_score[1], None)
+        return result
+
+    def start_transform_dataset(self, job: EvaluationJob) -> Result:
+        result = self._call(TRANSFORM, job)
+        if result is None:
+            worst_score = util.worst_score(job.ds.metric)
+            result = Result(job.cid, status=StatusType.CRASHED, loss=worst_score[0], structure_loss=worst_score[1])
+        return result
+
+    def _call(self, command: str, job: EvaluationJob) -> Optional[Result]:
+        remote_job = copy.copy(job)
+        if job.ds is self.resident_ds:
+            # Remote worker already holds the data set
+            remote_job.ds = None
+        elif job.ds is not None and job.ds.is_shared:
+            remote_job.ds = job.ds.unshared_copy()
+
+        try:
+            self.conn.send((command, remote_job))
+            result, model = self.conn.recv()
+        except (EOFError, OSError) as ex:
+            if self.lost:
+                self.logger.debug(f'Dropped connection to {self.worker_id} to cancel {job.cid}')
+            else:
+                self.logger.error(f'Lost connection to {self.worker_id} while processing {job.cid}: {ex}')
+                self.lost = True
+            self.conn.close()
+            return None
+
+        if model is not None:
+            name, content = model
+            os.makedirs(self.workdir, exist_ok=True)
+            with open(os.path.join(self.workdir, name), 'wb') as f:
+                f.write(content)
+        # Clocks of different machines are not comparable
+        if result.runtime is not None and self.start_time is not None:
+            result.runtime.timestamp = timeit.default_timer() - self.start_time
+        return result
+
+    def compute(self, *args, **kwargs):
+        raise NotImplementedError('Jobs are computed by the remote worker')
+
+    def transform_dataset(self, *args, **kwargs):
+        raise NotImplementedError('Jobs are computed by the remote worker')
+
+    def cancel(self) -> None:
+        """
+        Drops the connection to the remote worker process. A request blocked by the current job returns immediately
+        and the remote worker process terminates the evaluation.
+        """
+        self.lost = True
+        try:
+            # Closing the connection does not wake up a thread blocked in recv. Shut down the socket instead
+            with socket.fromfd(self.conn.fileno(), socket.AF_INET, socket.SOCK_STREAM) as sock:
+                sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        try:
+            if not self.lost:
+                self.conn.send((SHUTDOWN, None))
+        except (EOFError, OSError):
+            pass
+        self.conn.close()
+
+
+class RemoteDispatcher(Dispatcher):
+    """
+    Dispatcher processing jobs on worker daemons hosted on other machines. Daemons connect to the listener of this
+    dispatcher, register their worker processes and receive the resident data set once. Afterwards, each registered
+    worker process is handed out like a local worker. New daemons can register at any time during the optimization.
+    """
+    remote = True
+
+    def __init__(self,
+                 workers: List[Worker],
+                 structure_generator: BaseStructureGenerator,
+                 logger: logging.Logger = None,
+                 ds: Dataset = None,
+                 address: Tuple[str, int] = ('127.0.0.1', 6000),
+                 authkey: bytes = None,
+                 workdir: str = '/tmp/dswizard/',
+                 local_workers: int = 0,
+                 local_worker_class: Type[Worker] = None,
+                 worker_kwargs: Dict = None):
+        """
+        :param workers: additional workers, usually empty. Remote workers are added on registration
+        :param structure_generator: has to be located in the master process
+        :param logger:
+        :param ds: data set sent once to each remote worker. Jobs working on this data set are sent without the data
+        :param address: address of the listener remote daemons connect to. Only local daemons can connect by default.
+            Use e.g. ('0.0.0.0', 6000) to accept daemons on other machines
+        :param authkey: key used to authenticate remote daemons. If None, the authkey of the current process is used.
+            This key is only known to local daemons, remote daemons require an explicit authkey
+        :param workdir: directory models of remote workers are stored in
+        :param local_workers: number of worker processes started on this machine, e.g. for testing
+        :param local_worker_class: worker class used for local worker processes
+        :param worker_kwargs: additional arguments passed to each remote worker on registration
+        """
+        super().__init__(workers, structure_generator, logger=logger, ds=ds)
+        self.workdir = workdir
+        self.worker_kwargs = worker_kwargs if worker_kwargs is not None else {}
+        self.authkey = authkey if authkey is not None else bytes(multiprocessing.current_process().authkey)
+        self._ds_payload: Optional[bytes] = None
+
+        self.listener = Listener(address, authkey=self.authkey)
+        self.logger.info(f'Waiting for remote workers on {self.listener.address}')
+        self.accept_thread = threading.Thread(target=self._accept, name='RemoteDispatcher', daemon=True)
+        self.accept_thread.start()
+
+        self.local_daemon: Optional[WorkerDaemon] = None
+        if local_workers > 0:
+            if local_worker_class is None:
+                from dswizard.workers import SklearnWorker
+                local_worker_class = SklearnWorker
+            self.local_daemon = WorkerDaemon(('127.0.0.1', self.listener.address[1]), self.authkey,
+                                             n_workers=local_workers, worker_class=local_worker_class)
+            self.local_daemon.start()
+
+    def _accept(self):
+        while not self.shutdown_all_threads:
+            try:
+                conn = self.listener.accept()
+            except (OSError, EOFError, AuthenticationError) as ex:
+                if self.shutdown_all_threads:
+                    break
+                self.logger.warning(f'Rejected connection of remote worker: {ex}')
+                continue
+
+            try:
+                _, hostname, pid = conn.recv()
+                conn.send_bytes(self._resident_dataset())
+                conn.send(self.worker_kwargs)
+            except (OSError, EOFError, ValueError) as ex:
+                self.logger.warning(f'Failed to register remote worker: {ex}')
+                conn.close()
+                continue
+
+            worker = RemoteWorker(conn, self.ds, logger=self.logger, wid=f'{hostname}.{pid}', workdir=self.workdir)
+            worker.start_time = self.start_time
+            with self.condition:
+                self.worker_pool.append(worker)
+                self.idle_workers.append(worker)
+                self.condition.notify_all()
+            if self.on_worker_released is not None:
+                self.on_worker_released()
+            self.logger.info(f'Registered remote worker {worker.worker_id}. '
+                             f'{len(self.worker_pool)} workers available')
+
+    def _resident_dataset(self) -> bytes:
+        # Pickle data set only once for all remote workers
+        if self._ds_payload is None:
+            ds = self.ds
+            if ds is not None and ds.is_shared:
+                ds = ds.unshared_copy()
+            self._ds_payload = bytes(ForkingPickler.dumps(ds))
+        return self._ds_payload
+
+    @property
+    def synchronous(self) -> bool:
+        return False
+
+    def _execute(self, worker: Worker, job: Job) -> None:
+        # Remote workers block only a local thread while the job is processed remotely
+        threading.Thread(target=self._run_job, args=(worker, job), name=f'Job-{job.cid}', daemon=True).start()
+
+    def _detach_dataset(self, job: Job) -> Job:
+        # Remote workers strip the resident data set themselves
+        return job
+
+    def _kill(self, job: Job, worker: Worker) -> None:
+        # Remote process terminates the evaluation once the connection is dropped. The worker is removed on release and
+        # the daemon registers a replacement
+        if isinstance(worker, RemoteWorker):
+            worker.cancel()
+
+    def _release_worker(self, cid):
+        with self.condition:
+            _, _, worker = self._pop_job(cid)
+            worker.busy = False
+            if isinstance(worker, RemoteWorker) and worker.lost:
+                self.worker_pool.remove(worker)
+                self.logger.warning(f'Removed remote worker {worker.worker_id}. '
+                                    f'{len(self.worker_pool)} workers available')
+            else:
+                self.idle_workers.append(worker)
+            self.condition.notify_all()
+        if self.on_worker_released is not None:
+            self.on_worker_released()
+
+    def shutdown(self):
+        self.shutdown_all_threads = True
+        with self.condition:
+            workers = list(self.worker_pool)
+        for worker in workers:
+            if isinstance(worker, RemoteWorker):
+                worker.close()
+        self.listener.close()
+        if self.local_daemon is not None:
+            self.local_daemon.join(timeout=10)
+        super().shutdown()
+
+
+class WorkerDaemon:
+    """
+    Hosts worker processes on a compute node. Each worker process connects to a RemoteDispatcher, registers itself,
+    receives the data set and the worker arguments once and afterwards pulls jobs from the connection and sends the
+    results back until the dispatcher shuts down. Worker processes terminated to cancel their current job are replaced
+    by new worker processes registering at the dispatcher.
+    """
+
+    def __init__(self,
+                 address: Tuple[str, int],
+                 authkey: bytes,
+                 n_workers: int = 1,
+                 worker_class: Type[Worker] = None,
+                 workdir: str = '/tmp/dswizard/',
+                 logger: logging.Logger = None):
+        """
+        :param address: address of the RemoteDispatcher
+        :param authkey: key used to authenticate at the RemoteDispatcher
+        :param n_workers: number of worker processes
+        :param worker_class:
+        :param workdir: local directory used by the workers. Created models are sent to the dispatcher
+        :param logger:
+        """
+        if worker_class is None:
+            from dswizard.workers import SklearnWorker
+            worker_class = SklearnWorker
+
+        self.address = address
+        self.authkey = authkey
+        self.n_workers = n_workers
+        self.worker_class = worker_class
+        self.workdir = workdir
+        if logger is None:
+            self.logger = logging.getLogger('WorkerDaemon')
+        else:
+            self.logger = logger
+        self.processes: List[multiprocessing.Process] = []
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def start(self) -> None:
+        with self.lock:
+            for i in range(self.n_workers):
+                self.processes.append(self._spawn(i))
+        self.logger.info(f'Started {self.n_workers} workers connecting to {self.address}')
+        threading.Thread(target=self._supervise, name='WorkerDaemon', daemon=True).start()
+
+    def _spawn(self, i: int) -> multiprocessing.Process:
+        process = multiprocessing.Process(target=_serve,
+                                          args=(self.address, self.authkey, self.worker_class, str(i),
+                                                os.path.join(self.workdir, f'{os.getpid()}-{i}')))
+        process.start()
+        return process
+
+    def _replace_cancelled(self) -> None:
+        for i, process in enumerate(self.processes):
+            if process.exitcode == -signal.SIGTERM:
+                self.logger.info(f'Worker {i} was terminated to cancel its job. Starting replacement')
+                self.processes[i] = self._spawn(i)
+
+    def _supervise(self) -> None:
+        while not self.stopped.wait(1):
+            with self.lock:
+                if not self.stopped.is_set():
+                    self._replace_cancelled()
+
+    def join(self, timeout: float = None) -> None:
+        """
+        Waits until all worker processes exited, i.e. the dispatcher shut down. Worker processes still running after
+        the timeout are terminated.
+        :param timeout: maximum waiting time in seconds. If None, waits until all worker processes exited
+        """
+        deadline = None if timeout is None else timeit.default_timer() + timeout
+        while True:
+            with self.lock:
+                self._replace_cancelled()
+                processes = list(self.processes)
+            for process in processes:
+                process.join(None if deadline is None else max(0., deadline - timeit.default_timer()))
+
+            with self.lock:
+                expired = deadline is not None and timeit.default_timer() >= deadline
+                if expired or all(p.exitcode is not None and p.exitcode != -signal.SIGTERM for p in self.processes):
+                    self.stopped.set()
+                    break
+
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+
+
+def _serve(address: Tuple[str, int], authkey: bytes, worker_class: Type[Worker], wid: str, workdir: str):
+    logger = logging.getLogger(f'WorkerDaemon.{wid}')
+    try:
+        conn = Client(address, authkey=authkey)
+    except OSError as ex:
+        logger.warning(f'Failed to connect to dispatcher: {ex}')
+        return
+    conn.send(('register', socket.gethostname(), os.getpid()))
+    ds = pickle.loads(conn.recv_bytes())
+    worker_kwargs = conn.recv()
+
+    worker = worker_class(wid=wid, workdir=workdir, **worker_kwargs)
+    worker.start_time = timeit.default_timer()
+    while True:
+        try:
+            command, job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if command == SHUTDOWN:
+            break
+
+        if job.ds is None:
+            job.ds = ds
+        done = threading.Event()
+        threading.Thread(target=_watch, args=(conn, done), name='Watch', daemon=True).start()
+        try:
+            if command == COMPUTE:
+                result = worker.start_computation(job)
+            elif command == TRANSFORM:
+                result = worker.start_transform_dataset(job)
+            else:
+                logger.error(f'Unknown command {command}')
+                result = None
+        finally:
+            done.set()
+
+        try:
+            conn.send((result, _collect_model(workdir, job)))
+        except (EOFError, OSError):
+            break
+    conn.close()
+
+
+def _watch(conn: Connection, done: threading.Event) -> None:
+    # The dispatcher does not send anything while a job is processed. Any activity on the connection means that the
+    # dispatcher dropped the connection to cancel the job
+    try:
+        while not conn.poll(0.5):
+            if done.is_set():
+                return
+    except (EOFError, OSError):
+        pass
+    if not done.is_set():
+        # The evaluation sub-process is terminated by the signal handler of pynisher before this process exits
+        os.kill(os.getpid(), signal.SIGTERM)
+
+
+def _collect_model(workdir: str, job: Job) -> Optional[Tuple[str, bytes]]:
+    name = util.model_file(job.cid)
+    file = os.path.join(workdir, name)
+    try:
+        with open(file, 'rb') as f:
+            content = f.read()
+        os.remove(file)
+        return name, content
+    except FileNotFoundError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Worker daemon processing jobs of a remote dswizard optimization.')
+    parser.add_argument('--host', type=str, help='Host of the master', default='127.0.0.1')
+    parser.add_argument('--port', type=int, help='Port of the master', default=6000)
+    parser.add_argument('--authkey', type=str, help='Key used to authenticate at the master', required=True)
+    parser.add_argument('--workers', type=int, help='Number of worker processes', default=os.cpu_count())
+    parser.add_argument('--workdir', type=str, help='Local working directory', default='/tmp/dswizard/')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    daemon = WorkerDaemon((args.host, args.port), args.authkey.encode(), n_workers=args.workers,
+                          workdir=args.workdir)
+    daemon.start()
+    daemon.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,7 @@ from nbformat import NotebookNode
 from sklearn.base import BaseEstimator
 from typing import List
 
+from dswizard.core.constants import DATASET_DIR
 from dswizard.core.model import Dataset
 from dswizard.pipeline.pipeline import FlexiblePipeline
 
@@ -151,7 +152,7 @@ class NotebookRenderer:
 def main():
     workdir = '../../scripts/run/59/'
     pipeline = joblib.load(os.path.join(workdir, 'incumbent.pkl'))
-    ds = joblib.load(os.path.join(workdir, 'dataset.pkl'))
+    ds = Dataset.load(os.path.join(workdir, DATASET_DIR))
 
     renderer = NotebookRenderer()
     renderer.render(pipeline, ds, os.path.join(workdir, 'test.ipynb'))
@@ -42,7 +42,8 @@ class RunHistory:
             # Extract and merge all (partial-) configurations
             explanations_for_steps = [config_xai[key] for key in s.cfg_keys]
 
-            for cid in [r.cid.external_name for r in s.results]:
+            # Cancelled jobs sampling their configuration on the fly have no configuration to explain
+            for cid in [r.cid.external_name for r in s.results if r.config is not None]:
                 try:
                     partial_configs = []
                     loss = []
@@ -123,10 +124,13 @@ class RunHistory:
         The incumbent here is the configuration with the smallest loss among all runs on the maximum budget! If no run
         finishes on the maximum budget, None is returned!
         """
+        # Results on subsamples of the training data are not comparable to results on the complete training data
+        fidelity = max([res.fidelity for v in self.data.values() for res in v.results], default=1.)
+
         tmp_list = []
         for k, v in self.data.items():
             try:
-                inc = v.get_incumbent()
+                inc = self._get_incumbent(v, fidelity)
                 if inc is not None:
                     tmp_list.append((inc.loss, k))
             except KeyError:
@@ -136,13 +140,20 @@ class RunHistory:
             structure = self.data[min(tmp_list)[1]]
             # TODO pipeline is not fitted. Maybe store fitted pipeline?
             pipeline: FlexiblePipeline = clone(structure.pipeline)
-            result = structure.get_incumbent()
+            result = self._get_incumbent(structure, fidelity)
             if result is None:
                 raise ValueError('Incumbent structure has no config evaluations')
             pipeline.set_hyperparameters(result.config.get_dictionary())
             return pipeline, structure
         return None, None
 
+    @staticmethod
+    def _get_incumbent(structure: CandidateStructure, fidelity: float) -> Optional[Result]:
+        results = [res for res in structure.results if res.fidelity >= fidelity and res.config is not None]
+        if len(results) == 0:
+            return None
+        return min(results, key=lambda res: res.loss)
+
     def get_all_runs(self, ) -> List[Tuple[CandidateId, Result]]:
         """
         returns all runs performed
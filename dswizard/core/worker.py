@@ -5,13 +5,14 @@ import logging
 import os
 import socket
 import timeit
-from typing import Optional, TYPE_CHECKING, Tuple, List
+from typing import Optional, TYPE_CHECKING, Tuple, List, Union
 
 import numpy as np
 from ConfigSpace import Configuration
 
 from dswizard import pynisher2 as pynisher
 from dswizard.components.base import EstimatorComponent
+from dswizard.core.config_cache import ConfigCacheReplica
 from dswizard.core.logger import ProcessLogger
 from dswizard.core.model import Result, StatusType, Runtime, Dataset, EvaluationJob
 from dswizard.pipeline.pipeline import FlexiblePipeline
@@ -60,9 +61,16 @@ class Worker(abc.ABC):
         result = None
         try:
             process_logger = ProcessLogger(self.workdir, job.cid)
+            cfg_cache = self.cfg_cache
+            if job.config is None and isinstance(cfg_cache, ConfigCacheReplica):
+                # Sample in this process to keep the state of the local generators. The forked evaluation only replays
+                # the sampled configurations
+                cfg_cache, job.explanations = cfg_cache.presample(job.cid, job.component, job.cfg_keys)
+
             wrapper = pynisher.enforce_limits(wall_time_in_s=job.cutoff, grace_period_in_s=5, logger=self.logger)(
                 self.compute)
-            c = wrapper(job.ds, job.cid, job.config, self.cfg_cache, job.cfg_keys, job.component, process_logger)
+            c = wrapper(job.ds, job.cid, job.config, cfg_cache, job.cfg_keys, job.component, process_logger,
+                        job.fidelity, job.incumbent)
 
             if wrapper.exit_status is pynisher.TimeoutException:
                 status = StatusType.TIMEOUT
@@ -70,6 +78,9 @@ class Worker(abc.ABC):
             elif wrapper.exit_status is pynisher.MemorylimitException:
                 status = StatusType.MEMOUT
                 cost = util.worst_score(job.ds.metric)
+            elif wrapper.exit_status == 0 and isinstance(c, Tuple):
+                # Evaluation was stopped early by the worker
+                cost, status = c
             elif wrapper.exit_status == 0 and c is not None:
                 status = StatusType.SUCCESS
                 cost = c
@@ -87,7 +98,8 @@ class Worker(abc.ABC):
 
             # job.component has to be always a FlexiblePipeline
             steps = [(name, comp.name()) for name, comp in job.component.steps]
-            result = Result(job.cid, status, config, cost[0], cost[1], runtime, partial_configs)
+            result = Result(job.cid, status, config, cost[0], cost[1], runtime, partial_configs,
+                            fidelity=job.fidelity)
         except KeyboardInterrupt:
             raise
         except Exception as ex:
@@ -96,7 +108,7 @@ class Worker(abc.ABC):
             # noinspection PyUnboundLocalVariable
             result = Result(job.cid, StatusType.CRASHED, config if 'config' in locals() else job.config,
                             util.worst_score(job.ds.metric)[0], util.worst_score(job.ds.metric)[0], None,
-                            partial_configs if 'partial_configs' in locals() else None)
+                            partial_configs if 'partial_configs' in locals() else None, fidelity=job.fidelity)
         return result
 
     @abc.abstractmethod
@@ -107,8 +119,10 @@ class Worker(abc.ABC):
                 cfg_cache: Optional[ConfigCache],
                 cfg_keys: Optional[List[ConfigKey]],
                 pipeline: FlexiblePipeline,
-                process_logger: ProcessLogger
-                ) -> List[float]:
+                process_logger: ProcessLogger,
+                fidelity: float = 1.,
+                incumbent: Optional[float] = None
+                ) -> Union[List[float], Tuple[List[float], StatusType]]:
         """
         The function you have to overload implementing your computation.
         :param ds:
@@ -118,6 +132,10 @@ class Worker(abc.ABC):
         :param cfg_keys:
         :param pipeline: Additional information about the sampled configuration like pipeline structure.
         :param process_logger:
+        :param fidelity: fraction of the training data used for the evaluation
+        :param incumbent: loss of the current incumbent, if available
+        :return: loss and structure loss. If the evaluation was stopped early, additionally the according status, e.g.
+            CAPPED
         """
         pass
 
@@ -125,6 +143,7 @@ class Worker(abc.ABC):
         self.logger.info(f'start transforming job {job.cid}')
 
         X = None
+        ds = None
         try:
             wrapper = pynisher.enforce_limits(wall_time_in_s=job.cutoff, grace_period_in_s=5, logger=self.logger)(
                 self.transform_dataset)
@@ -139,11 +158,13 @@ class Worker(abc.ABC):
             elif wrapper.exit_status == 0 and c is not None:
                 status = StatusType.SUCCESS
                 X, score = c
+                ds = self.derive_dataset(job.ds, X)
             else:
                 status = StatusType.CRASHED
                 self.logger.debug(f'Worker failed with {c[0] if isinstance(c, Tuple) else c}')
                 score = util.worst_score(job.ds.metric)
             result = Result(job.cid, status=status, loss=score[0], structure_loss=score[1], transformed_X=X,
+                            transformed_ds=ds,
                             runtime=Runtime(wrapper.wall_clock_time, timeit.default_timer() - self.start_time))
         except KeyboardInterrupt:
             raise
@@ -154,6 +175,17 @@ class Worker(abc.ABC):
                             structure_loss=util.worst_score(job.ds.metric)[1])
         return result
 
+    # noinspection PyMethodMayBeStatic
+    def derive_dataset(self, ds: Dataset, X: np.ndarray) -> Dataset:
+        """
+        Creates the data set for the transformed features. Meta-features are calculated by the worker instead of the
+        structure generator.
+        :param ds: original data set
+        :param X: transformed features
+        :return:
+        """
+        return Dataset(X, ds.y, ds.metric, ds.cutoff)
+
     @abc.abstractmethod
     def transform_dataset(self,
                           ds: Dataset,
@@ -1,2 +1,3 @@
+from dswizard.optimizers.bandit_learners.asha import ASHALearner
 from dswizard.optimizers.bandit_learners.hyperband import HyperbandLearner
 from dswizard.optimizers.bandit_learners.pseudo import PseudoBandit
@@ -0,0 +1,57 @@
+import math
+from typing import Dict
+
+import numpy as np
+
+from dswizard.core.base_bandit_learner import BanditLearner
+from dswizard.optimizers.iterations import AsynchronousSuccessiveHalving
+
+
+class ASHALearner(BanditLearner):
+    def __init__(self,
+                 eta: float = 3,
+                 min_budget: float = 1,
+                 max_budget: float = 1,
+                 max_iterations: float = math.inf,
+                 **kwargs):
+        """
+        Implements asynchronous successive halving. Candidates are promoted as soon as they rank in the top 1/eta of
+        their rung. If no iteration is able to provide a new candidate, the next iteration is started immediately
+        instead of waiting for running candidates. Therefore, all workers are always busy.
+        :param eta: only a fraction of 1/eta of the candidates of a rung is promoted to the next rung. Must be greater
+            or equal to 2.
+        :param min_budget: budget of the lowest rung
+        :param max_budget: budget of the highest rung
+        :param max_iterations: maximum number of iterations
+        """
+        super().__init__(**kwargs)
+
+        self.eta = eta
+        self.min_budget = min_budget
+        self.max_budget = max_budget
+        self.max_iterations = max_iterations
+        # Never wait for running candidates
+        self.max_concurrent = math.inf
+
+        n_rungs = -int(np.log(min_budget / max_budget) / np.log(eta)) + 1
+        self.budgets = max_budget * np.power(eta, -np.linspace(n_rungs - 1, 0, n_rungs))
+        # Enough candidates on the lowest rung to promote one candidate to the highest rung
+        n0 = eta ** (n_rungs - 1)
+        self.num_candidates = [max(int(n0 * (eta ** (-i))), 1) for i in range(n_rungs)]
+        self.logger.info(f'Using budgets {self.budgets}')
+
+        self.meta_data.update({
+            'eta': eta,
+            'min_budget': min_budget,
+            'max_budget': max_budget,
+            'budgets': self.budgets,
+            'max_iterations': self.max_iterations
+        })
+
+    def _get_next_iteration(self,
+                            iteration: int,
+                            iteration_kwargs: Dict = None) -> AsynchronousSuccessiveHalving:
+        if iteration_kwargs is None:
+            iteration_kwargs = {}
+        return AsynchronousSuccessiveHalving(iteration=iteration + self.offset, num_candidates=self.num_candidates,
+                                             budgets=self.budgets, eta=self.eta, **iteration_kwargs)
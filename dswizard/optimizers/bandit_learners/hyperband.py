@@ -11,6 +11,9 @@ class HyperbandLearner(BanditLearner):
                  eta: float = 3,
                  min_budget: float = 1,
                  max_budget: float = 1,
+                 max_concurrent: int = 1,
+                 subsample: bool = False,
+                 n_configs: int = 1,
                  **kwargs):
         """
         Implements a random search across the search space for comparison. Candidates are sampled at random and run on
@@ -20,12 +23,24 @@ class HyperbandLearner(BanditLearner):
             be greater or equal to 2.
         :param min_budget: budget for the evaluation
         :param max_budget: budget for the evaluation
+        :param max_concurrent: maximum number of brackets processed at the same time. Idle workers are filled with
+            candidates of the next bracket while the current bracket waits for its last candidates. By default, brackets
+            are processed one after another
+        :param subsample: interpret budgets as fraction of the training data instead of the number of configurations.
+            Budgets have to be in (0, 1]. Stratified subsamples are nested, i.e. a subsample of a lower budget is
+            contained in the subsamples of all higher budgets
+        :param n_configs: number of configurations per candidate and stage if subsample is set
         """
+        if subsample and not 0 < min_budget <= max_budget <= 1:
+            raise ValueError(f'Budgets have to be in (0, 1] if subsample is set, given [{min_budget}, {max_budget}]')
         super().__init__(**kwargs)
 
         self.eta = eta
         self.min_budget = min_budget
         self.max_budget = max_budget
+        self.max_concurrent = max_concurrent
+        self.subsample = subsample
+        self.n_configs = n_configs
 
         self.max_iterations = -int(np.log(min_budget / max_budget) / np.log(eta)) + 1
         self.budgets = max_budget * np.power(eta, -np.linspace(self.max_iterations - 1, 0, self.max_iterations))
@@ -36,7 +51,9 @@ class HyperbandLearner(BanditLearner):
             'min_budget': min_budget,
             'max_budget': max_budget,
             'budgets': self.budgets,
-            'max_iterations': self.max_iterations
+            'max_iterations': self.max_iterations,
+            'max_concurrent': max_concurrent,
+            'subsample': subsample
         })
 
     def _get_next_iteration(self,
@@ -58,5 +75,9 @@ class HyperbandLearner(BanditLearner):
         ns = [max(int(n0 * (self.eta ** (-i))), 1) for i in range(s + 1)]
         self.logger.debug(f'Starting next iteration with {ns} candidates')
 
+        if self.subsample:
+            return SuccessiveHalving(iteration=iteration + self.offset, num_candidates=ns,
+                                     budgets=[self.n_configs] * (s + 1), fidelities=self.budgets[(-s - 1):],
+                                     **iteration_kwargs)
         return SuccessiveHalving(iteration=iteration + self.offset, num_candidates=ns,
                                  budgets=self.budgets[(-s - 1):], **iteration_kwargs)
@@ -8,11 +8,15 @@ from dswizard.optimizers.iterations.pseudo import PseudoIteration
 
 class PseudoBandit(BanditLearner):
 
-    def __init__(self, **kwargs):
+    def __init__(self, iteration_kwargs: Dict = None, **kwargs):
+        """
+        :param iteration_kwargs: additional arguments passed to each PseudoIteration, e.g. adaptive
+        """
         super().__init__(**kwargs)
         self.max_iterations = math.inf
+        self.iteration_kwargs = iteration_kwargs if iteration_kwargs is not None else {}
 
     def _get_next_iteration(self, iteration: int, iteration_kwargs: Dict) -> BaseIteration:
         if iteration_kwargs is None:
             iteration_kwargs = {}
-        return PseudoIteration(iteration, **iteration_kwargs)
+        return PseudoIteration(iteration, **{**self.iteration_kwargs, **iteration_kwargs})
@@ -1,3 +1,4 @@
+from dswizard.optimizers.iterations.asynchronoussuccessivehalving import AsynchronousSuccessiveHalving
 from dswizard.optimizers.iterations.pseudo import PseudoIteration
 from dswizard.optimizers.iterations.successivehalving import SuccessiveHalving
 from dswizard.optimizers.iterations.successiveresampling import SuccessiveResampling
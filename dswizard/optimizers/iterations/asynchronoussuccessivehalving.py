@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import bisect
+import itertools
+import logging
+from typing import List, Optional, Dict, Tuple
+
+import numpy as np
+
+from dswizard.core.base_iteration import BaseIteration
+from dswizard.core.model import CandidateStructure, CandidateId, Result
+
+
+class AsynchronousSuccessiveHalving(BaseIteration):
+
+    def __init__(self,
+                 iteration: int,
+                 num_candidates: List[int],
+                 budgets: List[float],
+                 logger: logging.Logger = None,
+                 eta: float = 3,
+                 fidelities: List[float] = None):
+        """
+        Asynchronous variant of SuccessiveHalving. Instead of waiting for all candidates of a stage, a candidate is
+        promoted to the next rung as soon as it ranks in the top 1/eta of all completed candidates of its rung. New
+        candidates are only added to the lowest rung if no promotion is possible.
+        :param iteration:
+        :param num_candidates: the number of candidates in each rung. Only the lowest rung is limited
+        :param budgets: the budget associated with each rung
+        :param logger:
+        :param eta: only the best 1/eta of the completed candidates of a rung are promoted
+        :param fidelities:
+        """
+        super().__init__(iteration, num_candidates, budgets, logger, fidelities)
+        self.eta = eta
+
+        self.rungs: Dict[CandidateId, int] = {}
+        # Number of results still missing to complete the current rung of each candidate
+        self.outstanding: Dict[CandidateId, int] = {}
+        # Best loss of each candidate on its current rung
+        self.losses: Dict[CandidateId, float] = {}
+        # Losses of all candidates that completed a rung, sorted in ascending order. Ties are broken by completion order
+        self.rung_losses: List[List[Tuple[float, int, CandidateId]]] = [[] for _ in budgets]
+        self._counter = itertools.count()
+
+    def register_result(self, cs: CandidateStructure, result: Result) -> CandidateStructure:
+        if self.is_finished:
+            raise RuntimeError("This AsynchronousSuccessiveHalving iteration is finished, "
+                               "you can't register more results!")
+        cs = self.data[cs.cid]
+        cs.results.append(result)
+        self.num_running -= 1
+
+        if result.loss is not None and np.isfinite(result.loss):
+            self.losses[cs.cid] = min(self.losses.get(cs.cid, np.inf), result.loss)
+        self.outstanding[cs.cid] -= 1
+        if self.outstanding[cs.cid] <= 0:
+            # Candidate completed its current rung and is eligible for promotion. Only results of this rung are ranked
+            rung = self.rungs[cs.cid]
+            bisect.insort(self.rung_losses[rung], (self.losses.pop(cs.cid, np.inf), next(self._counter), cs.cid))
+            self._set_status(cs, 'REVIEW')
+        return cs
+
+    def get_next_candidate(self) -> Optional[CandidateStructure]:
+        if self.is_finished:
+            return None
+
+        candidate = self._promote()
+        if candidate is None and self.actual_num_candidates[0] < self.num_candidates[0]:
+            candidate = self._add_candidate()
+            self.rungs[candidate.cid] = 0
+
+        if candidate is not None:
+            self._set_status(candidate, 'RUNNING')
+            self.outstanding[candidate.cid] = int(candidate.budget)
+            self.num_running += int(candidate.budget)
+            return candidate
+
+        if self.num_running == 0:
+            self.logger.info(f'Iteration {self.iteration} completed')
+            self._finish_up()
+        return None
+
+    def _promote(self) -> Optional[CandidateStructure]:
+        # Prefer promotions to higher rungs
+        for rung in reversed(range(len(self.budgets) - 1)):
+            # Only the best 1/eta of all candidates that completed this rung advance
+            ranked = self.rung_losses[rung]
+            for loss, _, cid in itertools.islice(ranked, int(len(ranked) / self.eta)):
+                if self.rungs[cid] != rung:
+                    # Already promoted
+                    continue
+                self.logger.debug(f'Promoting candidate structure {cid} to rung {rung + 1} with budget '
+                                  f'{self.budgets[rung + 1]} and loss {loss}')
+                candidate = self.data[cid]
+                candidate.budget = self.budgets[rung + 1]
+                candidate.fidelity = self.fidelities[rung + 1]
+                self.rungs[cid] = rung + 1
+                self.actual_num_candidates[rung + 1] += 1
+                return candidate
+        return None
+
+    def _advance_to_next_stage(self, losses: np.ndarray) -> np.ndarray:
+        """
+        Only the best 1/eta of all candidates that completed a rung advance.
+        """
+        ranks = np.argsort(np.argsort(losses))
+        return ranks < int(len(losses) / self.eta)
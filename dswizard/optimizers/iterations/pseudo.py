@@ -1,20 +1,157 @@
-from typing import Optional
+from typing import Optional, Dict, List
 
 import math
 import numpy as np
 
 from dswizard.core.base_iteration import BaseIteration
-from dswizard.core.model import CandidateStructure
+from dswizard.core.model import CandidateStructure, CandidateId, Result
 
 
 class PseudoIteration(BaseIteration):
 
-    def __init__(self, iteration: int, budget: int = 5):
+    def __init__(self,
+                 iteration: int,
+                 budget: int = 5,
+                 adaptive: bool = False,
+                 max_budget: int = 20,
+                 exploration: float = 1.):
+        """
+        Iteration sampling an infinite number of structures with a fixed number of configurations each.
+        :param iteration:
+        :param budget: number of configurations per structure. In adaptive mode, the initial number of configurations
+        :param adaptive: grow the number of configurations of structures online. Once all configurations of a structure
+            are evaluated, the structure with the highest expected improvement per second over the incumbent, based on
+            a lower confidence bound of its loss, receives another configuration. Sampling a new structure is treated
+            like another structure whose losses are the best losses of all structures on the initial budget. If no
+            structure is expected to improve the incumbent more than a new structure, a new structure is sampled. All
+            structures expected to improve the incumbent less than a new structure are terminated
+        :param max_budget: maximum number of configurations per structure in adaptive mode
+        :param exploration: weight of the confidence interval in adaptive mode
+        """
         # noinspection PyTypeChecker
         super().__init__(iteration, [math.inf], [budget])
+        self.adaptive = adaptive
+        self.max_budget = max_budget
+        self.exploration = exploration
+
+        # Number of allocated and finished configurations per structure. Only used in adaptive mode
+        self.allocated: Dict[CandidateId, int] = {}
+        self.finished: Dict[CandidateId, int] = {}
+        # Statistics of all results, updated incrementally to avoid rescanning all structures
+        self.losses: Dict[CandidateId, List[float]] = {}
+        self.runtimes: Dict[CandidateId, List[float]] = {}
+        self.n_losses = 0
+        self.sum_losses = 0.
+        self.sum_squared_losses = 0.
+        self.n_runtimes = 0
+        self.sum_runtimes = 0.
+        # Statistics of the best loss of each structure on the initial budget
+        self.n_initial = 0
+        self.sum_initial = 0.
+        self.sum_squared_initial = 0.
+        self.incumbent = math.inf
+
+    def register_result(self, cs: CandidateStructure, result: Result) -> CandidateStructure:
+        cs = super().register_result(cs, result)
+        self.finished[cs.cid] = self.finished.get(cs.cid, 0) + 1
+
+        if self.adaptive:
+            # Results created during structure creation are not registered explicitly
+            if cs.cid not in self.losses:
+                for res in cs.results[:-1]:
+                    self._update_statistics(cs.cid, res)
+            self._update_statistics(cs.cid, result)
+            if self.finished[cs.cid] == self.budgets[0] and len(self.losses[cs.cid]) > 0:
+                loss = min(self.losses[cs.cid])
+                self.n_initial += 1
+                self.sum_initial += loss
+                self.sum_squared_initial += loss ** 2
+
+            if self.finished[cs.cid] >= self.max_budget:
+                # Structure can not be extended anymore
+                self._set_status(cs, 'TERMINATED')
+        return cs
+
+    def _update_statistics(self, cid: CandidateId, result: Result) -> None:
+        losses = self.losses.setdefault(cid, [])
+        runtimes = self.runtimes.setdefault(cid, [])
+        if result.loss is not None and np.isfinite(result.loss):
+            losses.append(result.loss)
+            self.n_losses += 1
+            self.sum_losses += result.loss
+            self.sum_squared_losses += result.loss ** 2
+            self.incumbent = min(self.incumbent, result.loss)
+        if result.runtime is not None:
+            runtimes.append(result.runtime.training_time)
+            self.n_runtimes += 1
+            self.sum_runtimes += result.runtime.training_time
 
     def get_next_candidate(self) -> Optional[CandidateStructure]:
-        return self._add_candidate()
+        if self.adaptive:
+            candidate = self._extend()
+            if candidate is not None:
+                self._set_status(candidate, 'RUNNING')
+                candidate.budget = 1
+                self.allocated[candidate.cid] += 1
+                self.num_running += 1
+                return candidate
+
+        candidate = self._add_candidate()
+        self._set_status(candidate, 'RUNNING')
+        self.allocated[candidate.cid] = int(candidate.budget)
+        self.num_running += int(candidate.budget)
+        return candidate
+
+    def _extend(self) -> Optional[CandidateStructure]:
+        if self.n_losses == 0:
+            return None
+        mean = self.sum_losses / self.n_losses
+        spread = np.sqrt(max(0., self.sum_squared_losses / self.n_losses - mean ** 2))
+
+        # An existing structure is only extended if its expected improvement is larger than the expected improvement of
+        # a new structure. Otherwise, the structure holding the incumbent would always be extended as the confidence
+        # bound of its loss is always below the incumbent
+        new_gain = 0.
+        if self.n_initial > 0:
+            mean_initial = self.sum_initial / self.n_initial
+            sigma = np.sqrt(max(0., self.sum_squared_initial / self.n_initial - mean_initial ** 2)) \
+                if self.n_initial > 1 else spread
+            bound = mean_initial - self.exploration * sigma * np.sqrt(
+                2 * np.log(self.n_losses) / (self.n_initial * self.budgets[0]))
+            # A new structure requires the initial budget to reach its expected loss
+            runtime = max(self.sum_runtimes / self.n_runtimes, 1e-3) if self.n_runtimes > 0 else 1.
+            new_gain = max(0., (self.incumbent - bound) / (runtime * self.budgets[0]))
+
+        # Only structures with all configurations evaluated are candidates for an extension. Structures not expected to
+        # improve the incumbent more than a new structure are terminated. Therefore, only promising structures are
+        # scanned and the cost of a call does not grow with the number of sampled structures
+        best, best_gain = None, new_gain
+        hopeless = []
+        for cid in self.by_status['REVIEW']:
+            if self.finished[cid] < self.allocated[cid]:
+                continue
+            loss = self.losses.get(cid, [])
+            if len(loss) == 0:
+                hopeless.append(cid)
+                continue
+
+            sigma = np.std(loss) if len(loss) > 1 else spread
+            bound = min(loss) - self.exploration * sigma * np.sqrt(2 * np.log(self.n_losses) / len(loss))
+            runtime = max(np.mean(self.runtimes[cid]), 1e-3) if len(self.runtimes[cid]) > 0 else 1.
+            # Expected improvement of the incumbent per second
+            gain = (self.incumbent - bound) / runtime
+            if gain <= new_gain:
+                hopeless.append(cid)
+            elif gain > best_gain:
+                best, best_gain = cid, gain
+
+        for cid in hopeless:
+            self._set_status(self.data[cid], 'TERMINATED')
+
+        if best is None:
+            return None
+        self.logger.debug(f'Extending candidate structure {best} to {self.allocated[best] + 1} configurations')
+        return self.data[best]
 
     def _advance_to_next_stage(self, losses: np.ndarray) -> np.ndarray:
         pass
@@ -16,7 +16,8 @@ class SuccessiveResampling(BaseIteration):
                  budgets: List[float],
                  logger: logging.Logger = None,
                  resampling_rate=0.5,
-                 min_samples_advance=1.):
+                 min_samples_advance=1.,
+                 fidelities: List[float] = None):
         """
         Iteration class to resample new configurations along side keeping the good ones in SuccessiveHalving.
         :param iteration:
@@ -25,9 +26,10 @@ class SuccessiveResampling(BaseIteration):
         :param resampling_rate: fraction of configurations that are resampled at each stage
         :param min_samples_advance: number of samples that are guaranteed to proceed to the next stage regardless of
             the fraction.
+        :param fidelities:
         """
 
-        super().__init__(iteration, num_candidates, budgets, logger)
+        super().__init__(iteration, num_candidates, budgets, logger, fidelities)
         self.resampling_rate = resampling_rate
         self.min_samples_advance = min_samples_advance
 
@@ -604,7 +604,15 @@ class MCTS(BaseStructureGenerator):
             result = worker.start_transform_dataset(job)
 
             if result.status.value == StatusType.SUCCESS.value:
-                ds = Dataset(result.transformed_X, ds.y, ds.metric, ds.cutoff)
+                if result.transformed_ds is not None:
+                    # Share labels with parent data set instead of keeping a copy received from the worker
+                    result.transformed_ds.y = ds.y
+                    ds = result.transformed_ds
+                else:
+                    ds = Dataset(result.transformed_X, ds.y, ds.metric, ds.cutoff)
+                # Results are attached to the candidate structure. Do not send the transformed data to the workers
+                result.transformed_X = None
+                result.transformed_ds = None
                 new_node.partial_config = PartialConfig(key, config, str(new_node.id), ds.meta_features)
                 new_node.ds = ds
 
@@ -697,6 +705,50 @@ class MCTS(BaseStructureGenerator):
         except (IndexError, ValueError, AttributeError, KeyError) as ex:
             self.logger.warning(f'Unable to backpropagate results: {ex}')
 
+    def rename_candidate(self, old_cid: CandidateId, new_cid: CandidateId) -> None:
+        with self.lock:
+            if old_cid in self.cid_to_node:
+                self.cid_to_node[new_cid] = self.cid_to_node.pop(old_cid)
+
+            old_name = old_cid.external_name
+            for node_id in self.tree.G.nodes:
+                explanations = self.tree.get_node(node_id).explanations
+                if old_name in explanations:
+                    explanations[new_cid.external_name] = explanations.pop(old_name)
+
+    def discard(self, candidate: CandidateStructure) -> None:
+        with self.lock:
+            node = self.cid_to_node.pop(candidate.cid, None)
+            if node is None:
+                return
+            # Remove virtual loss of all nodes entered during selection
+            for node_id in nx.shortest_path(self.tree.G, source=self.tree.ROOT, target=node.id):
+                self.tree.get_node(node_id).exit(candidate.cid)
+
+    def score(self, candidate: CandidateStructure) -> Optional[float]:
+        with self.lock:
+            node = self.cid_to_node.get(candidate.cid)
+            if node is None or node.visits == 0:
+                return None
+            return node.reward / node.visits
+
+    def get_state(self) -> Optional[bytes]:
+        with self.lock:
+            if self.tree is None:
+                return None
+            root = self.tree.get_node(self.tree.ROOT)
+            # Data set of the root node is provided by the master on restore
+            return util.dumps((self.tree, self.cid_to_node, self.store, timeit.default_timer() - self.start),
+                              {'ds': root.ds})
+
+    def set_state(self, state: Optional[bytes], ds: Dataset) -> None:
+        if state is None:
+            return
+        with self.lock:
+            self.tree, self.cid_to_node, self.store, elapsed = util.loads(state, {'ds': ds})
+            # Exploration depends on the elapsed time of the original optimization
+            self.start = self.policy.start = timeit.default_timer() - elapsed
+
     # noinspection PyMethodMayBeStatic
     def _backpropagate(self, node: Node, reward: float, exit_: bool = False) -> None:
         """Send the reward back up to the ancestors of the leaf"""
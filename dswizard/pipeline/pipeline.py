@@ -14,6 +14,7 @@ from dswizard.components.base import EstimatorComponent
 from dswizard.components.pipeline import ConfigurablePipeline
 from dswizard.components.util import prefixed_name
 from dswizard.core.model import PartialConfig, CandidateId
+from dswizard.pipeline import transform_cache
 
 if TYPE_CHECKING:
     from dswizard.core.logger import ProcessLogger
@@ -54,11 +55,17 @@ class FlexiblePipeline(ConfigurablePipeline):
              y: np.ndarray = None,
              logger: ProcessLogger = None,
              prefix: str = None,
+             fingerprint: str = None,
              **fit_params_steps: Dict):
         # shallow copy of steps - this should really be steps_
         self.steps = list(self.steps)
         self._validate_steps()
 
+        cache = transform_cache.get_cache()
+        # Key of the output of the last transformer. Only used if the transform cache is enabled and the training data
+        # is identified by a fingerprint
+        key = fingerprint if cache is not None else None
+
         Xt = X
         for (step_idx,
              name,
@@ -78,11 +85,23 @@ class FlexiblePipeline(ConfigurablePipeline):
 
             start = timeit.default_timer()
 
-            Xt, fitted_transformer = _fit_transform_one(
-                cloned_transformer, Xt, y, None,
-                message_clsname='Pipeline',
-                message=self._log_message(step_idx),
-                **fit_params_steps[name])
+            entry = None
+            if key is not None and len(fit_params_steps[name]) == 0:
+                key = cache.key(key, cloned_transformer)
+                entry = cache.get(key)
+            else:
+                key = None
+
+            if entry is not None:
+                fitted_transformer, Xt = entry
+            else:
+                Xt, fitted_transformer = _fit_transform_one(
+                    cloned_transformer, Xt, y, None,
+                    message_clsname='Pipeline',
+                    message=self._log_message(step_idx),
+                    **fit_params_steps[name])
+                if key is not None:
+                    cache.put(key, fitted_transformer, Xt)
 
             self.fit_time += timeit.default_timer() - start
 
@@ -97,13 +116,18 @@ class FlexiblePipeline(ConfigurablePipeline):
             y: np.ndarray = None,
             logger: ProcessLogger = None,
             prefix: str = None,
+            fingerprint: str = None,
             **fit_params: Dict):
+        """
+        :param fingerprint: identifies the training data X and y. Fitted transformers are only taken from the transform
+            cache if a fingerprint is given
+        """
         if self.configuration is None and self.cfg_cache is None:
             raise ValueError(
                 'Pipeline is not configured yet. Either call set_hyperparameters or provide a ConfigGenerator')
 
         fit_params_steps = self._check_fit_params(**fit_params)
-        Xt = self._fit(X, y, logger=logger, prefix=prefix, **fit_params_steps)
+        Xt = self._fit(X, y, logger=logger, prefix=prefix, fingerprint=fingerprint, **fit_params_steps)
         with _print_elapsed_time("Pipeline", self._log_message(len(self.steps) - 1)):
             if self._final_estimator != "passthrough":
                 # Configure estimator on the fly if necessary
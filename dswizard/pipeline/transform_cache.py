@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import logging
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple, Any
+
+import joblib
+import numpy as np
+
+# Cache used by all pipelines fitted in this process. Only set if enabled by the worker
+_cache: Optional[TransformCache] = None
+
+
+def get_cache() -> Optional[TransformCache]:
+    return _cache
+
+
+def set_cache(cache: Optional[TransformCache]) -> None:
+    global _cache
+    _cache = cache
+
+
+class TransformCache:
+    """
+    Content-addressed cache of fitted transformers and their transformed outputs. Each entry is identified by the
+    fingerprint of the training data and the chain of all transformers, including their hyperparameters, applied so
+    far. Therefore, pipelines sharing a configured prefix reuse the fitted prefix instead of fitting it again.
+
+    Entries are held in memory with LRU eviction. If a directory is given, all entries fitting into the disk budget are
+    additionally stored on disk and read on demand if they are not held in memory. This allows sharing entries between
+    processes, e.g. evaluations forked by the same worker.
+    """
+
+    def __init__(self, max_size: int = 256, directory: Optional[str] = None, max_disk_size: int = 2048,
+                 logger: logging.Logger = None):
+        """
+        :param max_size: maximum size of the transformed outputs held in memory in MB
+        :param directory: optional directory to spill entries to
+        :param max_disk_size: maximum size of the directory in MB
+        :param logger:
+        """
+        self.max_size = max_size * 1024 ** 2
+        self.directory = directory
+        self.max_disk_size = max_disk_size * 1024 ** 2
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+        if logger is None:
+            self.logger = logging.getLogger('TransformCache')
+        else:
+            self.logger = logger
+
+        self.entries: OrderedDict[str, Tuple[Any, np.ndarray]] = OrderedDict()
+        self.size = 0
+        # Folds of a cross-validation may be fitted concurrently
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(parent: str, transformer: Any) -> str:
+        """
+        Key of the given configured transformer applied to the output identified by parent
+        :param parent: fingerprint of the training data, e.g. Dataset.fingerprint, or key of the previous transformer
+        :param transformer: configured, not yet fitted transformer
+        :return:
+        """
+        cls = type(transformer)
+        return joblib.hash((parent, f'{cls.__module__}.{cls.__qualname__}', transformer.get_params(deep=False)))
+
+    def get(self, key: str) -> Optional[Tuple[Any, np.ndarray]]:
+        """
+        :param key:
+        :return: fitted transformer and a copy of the transformed output or None if not cached
+        """
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        if entry is None and self.directory is not None:
+            try:
+                entry = joblib.load(self._file(key))
+                self._add(key, entry)
+            except (FileNotFoundError, EOFError):
+                pass
+            except Exception as ex:
+                self.logger.warning(f'Failed to load cache entry {key}: {ex}')
+
+        if entry is None:
+            return None
+        transformer, Xt = entry
+        # Subsequent steps may modify the output in place
+        return transformer, Xt.copy()
+
+    def put(self, key: str, transformer: Any, Xt: np.ndarray) -> None:
+        entry = (transformer, Xt.copy())
+        self._add(key, entry)
+        if self.directory is not None and self._nbytes(Xt) <= self.max_disk_size:
+            # Entries exceeding the disk budget would be removed by the next prune anyway
+            file = self._file(key)
+            tmp_file = f'{file}.{os.getpid()}.tmp'
+            try:
+                joblib.dump(entry, tmp_file)
+                os.replace(tmp_file, file)
+            except Exception as ex:
+                self.logger.warning(f'Failed to spill cache entry {key}: {ex}')
+
+    def prune(self) -> None:
+        """
+        Removes the oldest entries on disk until the directory is smaller than the maximum disk size. Entries stored by
+        other processes are not loaded into memory. They are only read on demand by get
+        """
+        if self.directory is None:
+            return
+
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.pkl'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, name))
+        files.sort(reverse=True)
+
+        disk_size = 0
+        removed = 0
+        for _, size, name in files:
+            disk_size += size
+            if disk_size > self.max_disk_size:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        if removed > 0:
+            self.logger.debug(f'Removed {removed} cache entries from disk')
+
+    def _add(self, key: str, entry: Tuple[Any, np.ndarray]) -> None:
+        nbytes = self._nbytes(entry[1])
+        if nbytes > self.max_size:
+            return
+        with self._lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return
+            self.entries[key] = entry
+            self.size += nbytes
+            while self.size > self.max_size:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= self._nbytes(evicted)
+
+    @staticmethod
+    def _nbytes(Xt: Any) -> int:
+        if hasattr(Xt, 'nbytes'):
+            return Xt.nbytes
+        elif hasattr(Xt, 'data') and hasattr(Xt.data, 'nbytes'):
+            # Sparse matrix
+            return Xt.data.nbytes
+        return sys.getsizeof(Xt)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.pkl')
@@ -1,7 +1,9 @@
+import io
 import logging
 import os
+import pickle
 from collections import Counter
-from typing import Tuple, List
+from typing import Tuple, List, Dict, Any
 
 import multiprocessing_logging
 from ConfigSpace import Configuration, ConfigurationSpace
@@ -107,6 +109,11 @@ def model_file(cid) -> str:
         return 'models_{}-{}-{}.pkl'.format(*cid.as_tuple())
 
 
+# No typehint due to circular import with model.py
+def warm_start_dir(cid) -> str:
+    return 'structure_{}-{}'.format(cid.iteration, cid.structure)
+
+
 def merge_configurations(partial_configs,  # type: List[PartialConfig]
                          cs: ConfigurationSpace) -> Configuration:
     complete = {}
@@ -118,3 +125,37 @@ def merge_configurations(partial_configs,  # type: List[PartialConfig]
     config = Configuration(cs, complete)
     config.origin = Counter([p.config.origin for p in partial_configs if not p.is_empty()]).most_common(1)[0][0]
     return config
+
+
+def dumps(obj: Any, persistent: Dict[str, Any]) -> bytes:
+    """
+    Pickles the given object. Objects in persistent are stored only by their key, e.g. large data sets that are
+    restored independently. Objects are matched by identity.
+    :param obj:
+    :param persistent: mapping of keys to objects that are not pickled
+    :return:
+    """
+    ids = {id(value): key for key, value in persistent.items()}
+
+    class _Pickler(pickle.Pickler):
+        def persistent_id(self, o):
+            return ids.get(id(o))
+
+    buffer = io.BytesIO()
+    _Pickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(obj)
+    return buffer.getvalue()
+
+
+def loads(data: bytes, persistent: Dict[str, Any]) -> Any:
+    """
+    Inverse of dumps. All keys stored by dumps have to be available in persistent.
+    :param data:
+    :param persistent: mapping of keys to the objects replacing them
+    :return:
+    """
+
+    class _Unpickler(pickle.Unpickler):
+        def persistent_load(self, pid):
+            return persistent[pid]
+
+    return _Unpickler(io.BytesIO(data)).load()
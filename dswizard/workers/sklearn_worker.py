@@ -1,31 +1,106 @@
+import json
 import os
 import warnings
-from typing import Optional, Tuple, Union, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple, Union, List, Dict
 
 import joblib
 import numpy as np
+import scipy.stats as sps
 from ConfigSpace import Configuration
 from sklearn import clone
 from sklearn.base import is_classifier
-from sklearn.model_selection import check_cv, train_test_split
-from sklearn.model_selection._validation import _fit_and_predict, _check_is_permutation
-from sklearn.utils import indexable
+from sklearn.model_selection._validation import _check_is_permutation
 from sklearn.utils.validation import _num_samples
 
 from dswizard.components.base import EstimatorComponent
 from dswizard.core.config_cache import ConfigCache
+from dswizard.core.constants import WARM_START_DIR
 from dswizard.core.logger import ProcessLogger
-from dswizard.core.model import CandidateId, ConfigKey, Dataset
+from dswizard.core.model import CandidateId, ConfigKey, Dataset, StatusType, EvaluationJob, Result
 from dswizard.core.worker import Worker
+from dswizard.pipeline import transform_cache
 from dswizard.pipeline.pipeline import FlexiblePipeline
+from dswizard.pipeline.transform_cache import TransformCache
 from dswizard.util import util
-from dswizard.util.util import model_file
+from dswizard.util.util import model_file, warm_start_dir
 
 warnings.filterwarnings("ignore", category=UserWarning)
 
 
 class SklearnWorker(Worker):
 
+    def __init__(self, racing: bool = False, cv: int = 4, racing_alpha: float = 0.05, transform_cache_size: int = 0,
+                 transform_cache_dir: str = None, use_cv: bool = False, n_jobs: int = 1, warm_start: bool = False,
+                 **kwargs):
+        """
+        :param racing: evaluate configurations via cross-validation fold by fold. The evaluation is aborted with status
+            CAPPED as soon as a one-sided t-test shows that the configuration can not beat the incumbent. All
+            configurations are scored via cross-validation, even without incumbent, to keep losses comparable
+        :param cv: number of folds used for racing and cross-validation
+        :param racing_alpha: significance level of the rejection test
+        :param transform_cache_size: memory in MB used to cache fitted pipeline prefixes and their outputs. Pipelines
+            sharing configured preprocessing steps reuse the fitted steps. Use 0 to disable the cache
+        :param transform_cache_dir: optional local directory to exchange cached entries between evaluations. Evaluations
+            with a cutoff are forked from the worker process. Without directory, their entries are lost once the
+            evaluation finishes
+        :param use_cv: score configurations via cross-validation instead of a holdout split
+        :param n_jobs: number of cores available to this worker. Folds of a cross-validation are fitted in parallel
+        :param warm_start: store the fitted model of each configuration evaluated on a fraction of the training data.
+            If the same configuration of the same structure is evaluated again on a larger fraction, the stored model
+            continues training on the additional data instead of being fitted from scratch
+        """
+        super().__init__(**kwargs)
+        self.racing = racing
+        self.cv = cv
+        self.racing_alpha = racing_alpha
+        self.use_cv = use_cv
+        self.n_jobs = n_jobs
+        self.warm_start = warm_start
+        self.warm_start_dir = os.path.join(self.workdir, WARM_START_DIR)
+        self.transform_cache_size = transform_cache_size
+        self.transform_cache_dir = transform_cache_dir
+
+    def start_computation(self, job: EvaluationJob) -> Result:
+        self._setup_transform_cache(job.ds)
+        # Splits are materialized before forking the evaluation. Resident data sets keep them for all evaluations
+        if self.use_cv or self.racing:
+            job.ds.cv_splits(self.cv)
+        else:
+            job.ds.holdout()
+        try:
+            return super().start_computation(job)
+        finally:
+            self._prune_transform_cache()
+
+    def start_transform_dataset(self, job: EvaluationJob) -> Result:
+        self._setup_transform_cache(job.ds)
+        try:
+            return super().start_transform_dataset(job)
+        finally:
+            self._prune_transform_cache()
+
+    def _setup_transform_cache(self, ds: Dataset) -> None:
+        # Evaluations are forked from this process and inherit the cache. Entries created by an evaluation are only
+        # exchanged if a cache directory is given
+        if self.transform_cache_size <= 0:
+            return
+        cache = transform_cache.get_cache()
+        if cache is None or cache.directory != self.transform_cache_dir:
+            transform_cache.set_cache(TransformCache(self.transform_cache_size, self.transform_cache_dir,
+                                                     logger=self.logger))
+        # Fingerprint is usually computed by the master. Otherwise, resident data sets keep it for all evaluations
+        ds.fingerprint()
+
+    def _prune_transform_cache(self) -> None:
+        cache = transform_cache.get_cache()
+        if cache is None:
+            return
+        try:
+            cache.prune()
+        except OSError as ex:
+            self.logger.warning(f'Failed to prune transform cache: {ex}')
+
     def compute(self,
                 ds: Dataset,
                 cid: CandidateId,
@@ -33,21 +108,30 @@ class SklearnWorker(Worker):
                 cfg_cache: Optional[ConfigCache],
                 cfg_keys: Optional[List[ConfigKey]],
                 pipeline: FlexiblePipeline,
-                process_logger: ProcessLogger) -> List[float]:
+                process_logger: ProcessLogger,
+                fidelity: float = 1.,
+                incumbent: Optional[float] = None) -> Union[List[float], Tuple[List[float], StatusType]]:
+        # noinspection PyTypeChecker
+        cloned_pipeline: FlexiblePipeline = clone(pipeline)
         if config is None:
-            # Derive configuration on complete data set. Test performance via CV
-            # noinspection PyTypeChecker
-            cloned_pipeline: FlexiblePipeline = clone(pipeline)
+            # Configuration is sampled on the fly while fitting the pipeline for scoring. The configuration is
+            # restored from the process logger afterwards
             cloned_pipeline.cid = cid
             cloned_pipeline.cfg_cache = cfg_cache
             cloned_pipeline.cfg_keys = cfg_keys
-            cloned_pipeline.fit(ds.X, ds.y, logger=process_logger)
-            config = process_logger.get_config(cloned_pipeline)
+            logger = process_logger
+        else:
+            cloned_pipeline.set_hyperparameters(config.get_dictionary())
+            logger = None
 
-        # noinspection PyTypeChecker
-        cloned_pipeline: FlexiblePipeline = clone(pipeline)
-        cloned_pipeline.set_hyperparameters(config.get_dictionary())
-        score, _, _, models = self._score(ds, cloned_pipeline)
+        if self.racing and incumbent is not None:
+            score, models, capped = self._race(ds, cloned_pipeline, incumbent, fidelity=fidelity, logger=logger)
+            self._store_models(cid, models)
+            return (score, StatusType.CAPPED) if capped else score
+
+        # Racing compares against losses of a cross-validation. Without incumbent, all folds are processed
+        score, _, _, models = self._score(ds, cloned_pipeline, use_cv=self.use_cv or self.racing, fidelity=fidelity,
+                                          logger=logger, warm_start_cid=cid if self.warm_start else None)
         self._store_models(cid, models)
         return score
 
@@ -63,71 +147,301 @@ class SklearnWorker(Worker):
 
             X = np.hstack((ds.X, y_prob, np.reshape(y_pred, (-1, 1))))
         else:
-            models = [component.fit(ds.X, ds.y)]
-            X = models[0].transform(ds.X)
+            cache = transform_cache.get_cache()
+            key = cache.key(ds.fingerprint(), component) if cache is not None else None
+            entry = cache.get(key) if cache is not None else None
+            if entry is not None:
+                fitted, X = entry
+            else:
+                fitted = component.fit(ds.X, ds.y)
+                X = fitted.transform(ds.X)
+                if cache is not None:
+                    cache.put(key, fitted, X)
+            models = [fitted]
             score = [None, None]
         self._store_models(cid, models)
         return X, score
 
-    def _score(self, ds: Dataset, estimator: Union[EstimatorComponent, FlexiblePipeline], use_cv: bool = False) \
+    def _score(self, ds: Dataset, estimator: Union[EstimatorComponent, FlexiblePipeline], use_cv: bool = False,
+               fidelity: float = 1., logger: Optional[ProcessLogger] = None,
+               warm_start_cid: Optional[CandidateId] = None) \
             -> Tuple[List[float], np.ndarray, np.ndarray, List[FlexiblePipeline]]:
         # TODO improve handling of holdout or cross-val prediction
         if use_cv:
-            y, y_pred, y_prob, models = self._cross_val_predict(estimator, ds.X, ds.y, cv=4)
+            y, y_pred, y_prob, models = self._cross_val_predict(estimator, ds, fidelity=fidelity, logger=logger)
+        elif warm_start_cid is not None:
+            y, y_pred, y_prob, models = self._warm_start_predict(estimator, ds, warm_start_cid, fidelity=fidelity,
+                                                                 logger=logger)
         else:
-            y, y_pred, y_prob, models = self._holdout_predict(estimator, ds.X, ds.y)
+            y, y_pred, y_prob, models = self._holdout_predict(estimator, ds, fidelity=fidelity, logger=logger)
 
         # Meta-learning only considers f1. Calculate f1 score for structure search
         score = [util.score(y, y_prob, y_pred, ds.metric), util.score(y, y_prob, y_pred, 'f1')]
         return score, y_pred, y_prob, models
 
     @staticmethod
-    def _holdout_predict(pipeline, X, y=None, test_size=0.2) \
+    def _holdout_predict(pipeline, ds: Dataset, fidelity: float = 1., logger: Optional[ProcessLogger] = None) \
             -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[FlexiblePipeline]]:
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=42)
-        cloned_pipeline: FlexiblePipeline = clone(pipeline)
-        cloned_pipeline.fit(X_train, y_train)
+        X_train, X_test, y_train, y_test = ds.holdout()
+        if fidelity < 1:
+            # Test set is identical for all fidelities. Only the training set is reduced
+            indices = SklearnWorker._subsample_indices(y_train, fidelity)
+            X_train, y_train = X_train[indices], y_train[indices]
+        fingerprint = SklearnWorker._split_fingerprint(ds, 'holdout', fidelity)
+        cloned_pipeline = SklearnWorker._fit_pipeline(pipeline, X_train, y_train, logger, fingerprint=fingerprint)
         y_pred = cloned_pipeline.predict(X_test)
         y_prob = cloned_pipeline.predict_proba(X_test)
         return y_test, y_pred, y_prob, [cloned_pipeline]
 
-    @staticmethod
-    def _cross_val_predict(pipeline, X, y=None, cv=None) \
+    def _warm_start_predict(self, pipeline: FlexiblePipeline, ds: Dataset, cid: CandidateId, fidelity: float = 1.,
+                            logger: Optional[ProcessLogger] = None) \
             -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[FlexiblePipeline]]:
-        X, y, groups = indexable(X, y, None)
-        cv = check_cv(cv, y, classifier=is_classifier(pipeline))
-        cv.random_state = 42
+        """
+        Holdout prediction reusing the model of a previous evaluation of the same configuration on a lower fidelity.
+        Fitted preprocessing steps are kept. The final estimator continues training on the additional samples via
+        partial_fit or, if it supports warm_start, by adding estimators proportional to the additional samples.
+        :param cid: models are shared between evaluations of the same structure and configuration
+        :param logger: process logger if the configuration is sampled on the fly. The fitted model is stored under the
+            sampled configuration
+        """
+        X_train, X_test, y_train, y_test = ds.holdout()
+        indices = self._subsample_indices(y_train, fidelity) if fidelity < 1 else np.arange(len(y_train))
+
+        model = None
+        if logger is None:
+            model = self._load_warm_start(self._warm_start_file(cid, pipeline.configuration), X_train, y_train,
+                                          indices, fidelity)
+        if model is None:
+            model = self._fit_pipeline(pipeline, X_train[indices], y_train[indices], logger,
+                                       fingerprint=self._split_fingerprint(ds, 'holdout', fidelity))
+
+        # Configuration is available after fitting, even if it was sampled on the fly
+        file = self._warm_start_file(cid, model.configuration)
+        if fidelity < 1:
+            # Only models trained on a fraction of the data may be continued later on
+            os.makedirs(os.path.dirname(file), exist_ok=True)
+            tmp_file = f'{file}.{os.getpid()}.tmp'
+            with open(tmp_file, 'wb') as f:
+                joblib.dump((fidelity, indices, model), f)
+            os.replace(tmp_file, file)
+        else:
+            try:
+                os.remove(file)
+            except FileNotFoundError:
+                pass
+
+        y_pred = model.predict(X_test)
+        y_prob = model.predict_proba(X_test)
+        return y_test, y_pred, y_prob, [model]
+
+    def _warm_start_file(self, cid: CandidateId, config: Dict) -> str:
+        # Configurations sampled on the fly are restored from JSON. Hash the JSON representation to ignore numpy types
+        key = joblib.hash(json.dumps(config, sort_keys=True, default=lambda value: value.item()))
+        return os.path.join(self.warm_start_dir, warm_start_dir(cid), f'{key}.pkl')
+
+    def _load_warm_start(self, file: str, X_train: np.ndarray, y_train: np.ndarray, indices: np.ndarray,
+                         fidelity: float) -> Optional[FlexiblePipeline]:
+        """
+        Loads the model stored in file and continues its training on the samples of the given fidelity
+        :return: model trained on all given indices or None if no model can be continued
+        """
+        try:
+            with open(file, 'rb') as f:
+                prev_fidelity, prev_indices, prev_model = joblib.load(f)
+            if prev_fidelity == fidelity:
+                return prev_model
+            elif prev_fidelity < fidelity:
+                # Subsamples are nested. Only the additional samples are new
+                new = np.setdiff1d(indices, prev_indices, assume_unique=True)
+                model = self._continue_training(prev_model, X_train, y_train, indices, new,
+                                                1 - prev_fidelity / fidelity)
+                if model is not None:
+                    self.logger.debug(f'Continued training of {file} from fidelity {prev_fidelity} to {fidelity}')
+                return model
+        except FileNotFoundError:
+            pass
+        except Exception as ex:
+            self.logger.debug(f'Failed to continue training of {file}: {ex}. Fitting from scratch')
+        return None
+
+    @staticmethod
+    def _continue_training(model: FlexiblePipeline, X: np.ndarray, y: np.ndarray, indices: np.ndarray,
+                           new: np.ndarray, increment: float) -> Optional[FlexiblePipeline]:
+        """
+        :param model: pipeline fitted on a subset of indices
+        :param indices: all samples of the current fidelity
+        :param new: samples not used for fitting model yet
+        :param increment: fraction of the samples of the current fidelity not used for fitting model yet
+        :return: model with continued training or None if the final estimator does not support continued training
+        """
+        estimator = getattr(model._final_estimator, 'estimator_', None)
+        if estimator is None:
+            return None
+
+        def transform(X_: np.ndarray) -> np.ndarray:
+            for _, _, transformer in model._iter(with_final=False):
+                X_ = transformer.transform(X_)
+            return X_
+
+        if hasattr(estimator, 'partial_fit'):
+            estimator.partial_fit(transform(X[new]), y[new])
+            return model
 
+        params = estimator.get_params()
+        if 'warm_start' in params and isinstance(params.get('n_estimators'), int):
+            n_estimators = params['n_estimators']
+            estimator.set_params(warm_start=True,
+                                 n_estimators=n_estimators + max(1, int(np.ceil(n_estimators * increment))))
+            estimator.fit(transform(X[indices]), y[indices])
+            return model
+        return None
+
+    def _race(self, ds: Dataset, pipeline: FlexiblePipeline, incumbent: float, fidelity: float = 1.,
+              logger: Optional[ProcessLogger] = None) -> Tuple[List[float], List[FlexiblePipeline], bool]:
+        """
+        Cross-validation processing one fold at a time. After each fold, a lower confidence bound of the loss is
+        computed from the losses of all processed folds. If this bound is worse than the incumbent, the remaining folds
+        are skipped.
+        :param logger: process logger if the configuration is sampled on the fly. The configuration is sampled while
+            fitting the first fold and reused for all other folds
+        :return: score on all processed folds, fitted pipelines and whether the evaluation was aborted
+        """
+        X, y = ds.X, ds.y
+        splits = ds.cv_splits(self.cv)
+        n_folds = len(splits)
+
+        losses = []
+        test_blocks = []
         prediction_blocks = []
         probability_blocks = []
         fitted_pipelines = []
-        for train, test in cv.split(X, y, groups):
-            cloned_pipeline = clone(pipeline)
-            probability_blocks.append(
-                (_fit_and_predict(cloned_pipeline, X, y, train, test, 0, {}, 'predict_proba'), test)
-            )
-            prediction_blocks.append(cloned_pipeline.predict(X))
+        capped = False
+        for i, (train, test) in enumerate(splits):
+            if fidelity < 1:
+                train = train[self._subsample_indices(y[train], fidelity)]
+            fingerprint = self._split_fingerprint(ds, 'cv', n_folds, i, fidelity)
+            cloned_pipeline = self._fit_pipeline(pipeline, X[train], y[train], logger, fingerprint=fingerprint)
+            # Remaining folds use the configuration sampled during the first fold
+            logger = None
+            y_pred = cloned_pipeline.predict(X[test])
+            y_prob = cloned_pipeline.predict_proba(X[test])
+
+            test_blocks.append(test)
+            prediction_blocks.append(y_pred)
+            probability_blocks.append(y_prob)
             fitted_pipelines.append(cloned_pipeline)
+            losses.append(util.score(y[test], y_prob, y_pred, ds.metric))
+
+            k = len(losses)
+            if 1 < k < n_folds:
+                bound = np.mean(losses) - sps.t.ppf(1 - self.racing_alpha, k - 1) * np.std(losses, ddof=1) / np.sqrt(k)
+                if bound > incumbent:
+                    self.logger.debug(f'Aborting evaluation after {k}/{n_folds} folds. Lower bound {bound} is worse '
+                                      f'than incumbent {incumbent}')
+                    capped = True
+                    break
+
+        test = np.concatenate(test_blocks)
+        y_pred = np.concatenate(prediction_blocks)
+        y_prob = np.concatenate(probability_blocks)
+        score = [util.score(y[test], y_prob, y_pred, ds.metric), util.score(y[test], y_prob, y_pred, 'f1')]
+        return score, fitted_pipelines, capped
 
-        # Concatenate the predictions
-        probabilities = [prob_block_i for prob_block_i, _ in probability_blocks]
-        predictions = [pred_block_i for pred_block_i in prediction_blocks]
-        test_indices = np.concatenate([indices_i for _, indices_i in probability_blocks])
+    @staticmethod
+    def _fit_pipeline(pipeline, X: np.ndarray, y: np.ndarray, logger: Optional[ProcessLogger] = None,
+                      fingerprint: Optional[str] = None):
+        """
+        Fits a clone of the given pipeline. If a process logger is given, the configuration of the pipeline is sampled
+        on the fly while fitting the given pipeline itself. Afterwards, the sampled configuration is assigned to the
+        fitted pipeline. Clones of the fitted pipeline use the sampled configuration
+        :param fingerprint: identifies X and y in the transform cache
+        """
+        fit_params = {'fingerprint': fingerprint} if isinstance(pipeline, FlexiblePipeline) else {}
+        if logger is None:
+            cloned_pipeline = clone(pipeline)
+            cloned_pipeline.fit(X, y, **fit_params)
+            return cloned_pipeline
+
+        pipeline.fit(X, y, logger=logger, **fit_params)
+        pipeline.configuration = logger.get_config(pipeline).get_dictionary()
+        pipeline.cfg_cache = None
+        return pipeline
 
+    @staticmethod
+    def _split_fingerprint(ds: Dataset, *split) -> Optional[str]:
+        """
+        Fingerprint of the training data of a split derived from the fingerprint of the complete data set. This avoids
+        hashing the training data of each split. Only computed if the transform cache is enabled
+        :param split: identifies the split and fidelity
+        """
+        if transform_cache.get_cache() is None:
+            return None
+        return joblib.hash((ds.fingerprint(), split))
+
+    @staticmethod
+    def _subsample_indices(y: np.ndarray, fidelity: float, random_state: int = 42) -> np.ndarray:
+        """
+        Stratified subsample containing the given fraction of each class. All samples are drawn in the order of a fixed
+        permutation. Therefore, the subsample of a lower fidelity is contained in the subsample of any higher fidelity.
+        :param y: labels
+        :param fidelity: fraction of samples in (0, 1]
+        :param random_state:
+        :return: sorted indices of the subsample
+        """
+        permutation = np.random.RandomState(random_state).permutation(len(y))
+        _, classes = np.unique(y[permutation], return_inverse=True)
+
+        # Position of each sample within its class following the permutation
+        order = np.argsort(classes, kind='stable')
+        counts = np.bincount(classes)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        rank = np.empty(len(y), dtype=int)
+        rank[order] = np.arange(len(y)) - starts[classes[order]]
+
+        selected = rank < np.ceil(fidelity * counts[classes])
+        return np.sort(permutation[selected])
+
+    def _cross_val_predict(self, pipeline, ds: Dataset, fidelity: float = 1., logger: Optional[ProcessLogger] = None) \
+            -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[FlexiblePipeline]]:
+        """
+        Cross-validation predictions of the given pipeline. Folds are processed in parallel by up to n_jobs threads.
+        :param logger: process logger if the configuration is sampled on the fly. The configuration is sampled while
+            fitting the first fold before all other folds are processed
+        """
+        X, y = ds.X, ds.y
+        splits = ds.cv_splits(self.cv)
+
+        def _fit_and_predict(i: int, logger_: Optional[ProcessLogger] = None):
+            train, test = splits[i]
+            if fidelity < 1:
+                train = train[self._subsample_indices(y[train], fidelity)]
+            fingerprint = self._split_fingerprint(ds, 'cv', len(splits), i, fidelity)
+            cloned_pipeline = self._fit_pipeline(pipeline, X[train], y[train], logger_, fingerprint=fingerprint)
+            X_test = X[test]
+            return cloned_pipeline, cloned_pipeline.predict(X_test), cloned_pipeline.predict_proba(X_test)
+
+        folds = []
+        if logger is not None:
+            folds.append(_fit_and_predict(0, logger_=logger))
+
+        n_jobs = max(1, min(self.n_jobs, len(splits) - len(folds)))
+        if n_jobs == 1:
+            folds += [_fit_and_predict(i) for i in range(len(folds), len(splits))]
+        else:
+            with ThreadPoolExecutor(max_workers=n_jobs, thread_name_prefix='Fold') as executor:
+                folds += list(executor.map(_fit_and_predict, range(len(folds), len(splits))))
+
+        test_indices = np.concatenate([test for _, test in splits])
         if not _check_is_permutation(test_indices, _num_samples(X)):
             raise ValueError('cross_val_predict only works for partitions')
 
         inv_test_indices = np.empty(len(test_indices), dtype=int)
         inv_test_indices[test_indices] = np.arange(len(test_indices))
 
-        probabilities = np.concatenate(probabilities)
-        predictions = np.concatenate(predictions)
-
-        if isinstance(predictions, list):
-            return y, [p[inv_test_indices] for p in predictions], [p[inv_test_indices] for p in
-                                                                   probabilities], fitted_pipelines
-        else:
-            return y, predictions[inv_test_indices], probabilities[inv_test_indices], fitted_pipelines
+        predictions = np.concatenate([y_pred for _, y_pred, _ in folds])
+        probabilities = np.concatenate([y_prob for _, _, y_prob in folds])
+        fitted_pipelines = [model for model, _, _ in folds]
+        return y, predictions[inv_test_indices], probabilities[inv_test_indices], fitted_pipelines
 
     def _store_models(self, cid: CandidateId, models: List[Union[EstimatorComponent, FlexiblePipeline]]):
         name = model_file(cid)
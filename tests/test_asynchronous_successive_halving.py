@@ -0,0 +1,32 @@
+from dswizard.core.model import Result, Runtime, StatusType
+from dswizard.optimizers.iterations import AsynchronousSuccessiveHalving
+
+
+def _complete(iteration: AsynchronousSuccessiveHalving, cs, loss: float) -> None:
+    iteration.register_result(cs, Result(cs.cid.with_config(len(cs.results)), StatusType.SUCCESS, loss=loss,
+                                         runtime=Runtime(1., 0.)))
+
+
+def test_candidates_are_promoted_without_waiting_for_the_rung():
+    iteration = AsynchronousSuccessiveHalving(0, [9, 3, 1], [1, 3, 9])
+
+    first = iteration.get_next_candidate()
+    _complete(iteration, first, 0.5)
+    # A single completed candidate is not in the top third of its rung yet
+    second = iteration.get_next_candidate()
+    assert second.cid != first.cid
+    assert second.budget == 1
+
+    third = iteration.get_next_candidate()
+    _complete(iteration, second, 0.1)
+    _complete(iteration, third, 0.9)
+
+    promoted = iteration.get_next_candidate()
+    assert promoted is second
+    assert promoted.budget == 3
+    assert iteration.rungs[second.cid] == 1
+
+    # Promoted candidates are not promoted twice from the same rung
+    fourth = iteration.get_next_candidate()
+    assert fourth.cid not in (first.cid, second.cid, third.cid)
+    assert fourth.budget == 1
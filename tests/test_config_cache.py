@@ -0,0 +1,44 @@
+import logging
+from functools import partial
+from types import SimpleNamespace
+from unittest import mock
+
+from dswizard.core.config_cache import ConfigCacheReplica
+from dswizard.core.master import Master
+from dswizard.core.model import CandidateId, ConfigKey, EvaluationJob
+
+
+def test_replica_samples_from_local_generator():
+    cache = mock.Mock()
+    replica = ConfigCacheReplica(cache, sync_interval=5)
+    cfg_key = ConfigKey('structure', 0)
+
+    with mock.patch('dswizard.core.config_cache.timeit.default_timer', side_effect=[0., 4., 10.]):
+        replica.sample_configuration(cfg_key=cfg_key, name='dt')
+        replica.sample_configuration(cfg_key=cfg_key, name='dt')
+        assert cache.get_generator.call_count == 1
+        # Local copy is refreshed once it is older than the sync interval
+        replica.sample_configuration(cfg_key=cfg_key, name='dt')
+        assert cache.get_generator.call_count == 2
+
+    assert cache.get_generator.return_value.sample_config.call_count == 3
+    cache.sample_configuration.assert_not_called()
+
+
+def test_results_are_registered_in_batches():
+    master = SimpleNamespace(config_sync_interval=5, _pending_results=[], _loop=mock.Mock(), cfg_cache=mock.Mock(),
+                             _in_background=lambda fn, *args: fn(*args), logger=logging.getLogger('Master'))
+    master._flush_results = partial(Master._flush_results, master)
+
+    jobs = [EvaluationJob(mock.Mock(), CandidateId(0, 0, i), mock.Mock()) for i in range(2)]
+    for job in jobs:
+        Master._register_config_result(master, job)
+    master._loop.call_later.assert_called_once_with(5, master._flush_results)
+    master.cfg_cache.register_results.assert_not_called()
+
+    master._flush_results()
+    [batch] = master.cfg_cache.register_results.call_args.args
+    assert [job.cid for job in batch] == [job.cid for job in jobs]
+    # Data set and structure are not sent to the config cache
+    assert all(job.ds is None and job.cs is None for job in batch)
+    assert master._pending_results == []
@@ -0,0 +1,77 @@
+import pickle
+from multiprocessing import shared_memory
+from unittest import mock
+
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.model_selection import StratifiedKFold
+
+from dswizard.core.model import Dataset
+
+
+def test_stored_dataset_is_memory_mapped(tmp_path):
+    X, y = make_classification(300, 8, random_state=0)
+    ds = Dataset(X, y, metric='accuracy')
+    manifest = ds.store(str(tmp_path))
+
+    with mock.patch('dswizard.core.model.MetaFeatureFactory.calculate') as calculate:
+        loaded = Dataset.load(str(tmp_path))
+    # Meta-features are restored instead of being calculated again
+    calculate.assert_not_called()
+
+    assert isinstance(loaded.X, np.memmap)
+    np.testing.assert_array_equal(loaded.X, ds.X)
+    np.testing.assert_array_equal(loaded.y, ds.y)
+    np.testing.assert_array_equal(loaded.meta_features, ds.meta_features)
+    assert loaded.mf_dict == ds.mf_dict
+    assert loaded.metric == 'accuracy'
+    # Holdout split of the stored data set is preserved
+    for expected, actual in zip(ds.holdout(), loaded.holdout()):
+        np.testing.assert_array_equal(actual, expected)
+
+    assert Dataset.load(manifest).X.shape == X.shape
+
+
+def test_shared_dataset_is_pickled_by_reference():
+    X, y = make_classification(2000, 20, random_state=0)
+    ds = Dataset(X, y, metric='accuracy', mf_dict={}, meta_features=np.zeros((1, 1)))
+    holdout = ds.holdout()
+    assert ds.share()
+
+    payload = pickle.dumps(ds)
+    assert len(payload) < X.nbytes / 10
+
+    copy = pickle.loads(payload)
+    assert copy.is_shared
+    assert not copy.X.flags.writeable
+    np.testing.assert_array_equal(copy.X, X)
+    np.testing.assert_array_equal(copy.y, y)
+    # Holdout split is attached instead of being computed again
+    for expected, actual in zip(holdout, copy.holdout()):
+        np.testing.assert_array_equal(actual, expected)
+
+    name = ds._shared['X'].name
+    ds.unshare()
+    assert not ds.is_shared
+    np.testing.assert_array_equal(ds.X, X)
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+
+
+def test_splits_are_computed_once():
+    X, y = make_classification(300, 8, random_state=0)
+    ds = Dataset(X, y, metric='accuracy', mf_dict={}, meta_features=np.zeros((1, 1)))
+
+    holdout = ds.holdout()
+    assert ds.holdout() is holdout
+    with mock.patch('dswizard.core.model.StratifiedKFold.split', wraps=StratifiedKFold(4).split) as split:
+        assert ds.cv_splits(4) is ds.cv_splits(4)
+    split.assert_called_once()
+
+    # Split indices are pickled with the data set, materialized arrays are created again in each process
+    copy = pickle.loads(pickle.dumps(ds))
+    assert copy._holdout is None
+    np.testing.assert_array_equal(copy.holdout_indices()[0], ds.holdout_indices()[0])
+    for expected, actual in zip(holdout, copy.holdout()):
+        np.testing.assert_array_equal(actual, expected)
@@ -0,0 +1,133 @@
+import os
+import pickle
+import queue
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+from dswizard.core.dispatcher import Dispatcher
+from dswizard.core.model import CandidateId, CandidateStructure, Dataset, EvaluationJob, Result, StatusType, \
+    StructureJob
+from dswizard.core.worker import Worker
+
+
+class _PidWorker(Worker):
+
+    def start_computation(self, job: EvaluationJob) -> Result:
+        return Result(job.cid, StatusType.SUCCESS, loss=os.getpid(), structure_loss=len(job.ds.X))
+
+    def start_transform_dataset(self, job: EvaluationJob) -> Result:
+        return self.start_computation(job)
+
+    def compute(self, *args, **kwargs):
+        raise NotImplementedError()
+
+    def transform_dataset(self, *args, **kwargs):
+        raise NotImplementedError()
+
+
+class _StructureGenerator:
+
+    def __init__(self):
+        self.transformations = []
+
+    def fill_candidate(self, cs: CandidateStructure, ds: Dataset, cutoff: float = None, worker: Worker = None):
+        result = worker.start_transform_dataset(EvaluationJob(ds, CandidateId(0, 0, 0), None))
+        self.transformations.append((os.getpid(), result))
+        return cs
+
+
+def _dataset() -> Dataset:
+    return Dataset(np.zeros((50, 2)), np.zeros(50), metric='accuracy', mf_dict={}, meta_features=np.zeros((1, 1)))
+
+
+def test_pickled_dispatcher_excludes_master_state():
+    dispatcher = Dispatcher([], None)
+    dispatcher.job_pids[CandidateId(0, 0, 0)] = 1
+    dispatcher.claimed_jobs.add(CandidateId(0, 0, 0))
+
+    state = pickle.loads(pickle.dumps(dispatcher)).__dict__
+    assert 'job_pids' not in state
+    assert 'claimed_jobs' not in state
+    assert 'running_jobs' not in state
+
+
+def _job(i: int) -> EvaluationJob:
+    return EvaluationJob(None, CandidateId(0, 0, i), None)
+
+
+def test_idle_workers_are_handed_out_once():
+    workers = [SimpleNamespace(busy=False), SimpleNamespace(busy=False)]
+    dispatcher = Dispatcher(workers, None)
+    released = []
+    dispatcher.on_worker_released = lambda: released.append(True)
+    finished = []
+
+    with mock.patch.object(Dispatcher, '_execute') as execute:
+        assert dispatcher.submit_job(_job(0), finished.append)
+        assert dispatcher.submit_job(_job(1), finished.append)
+        assert [call.args[0] for call in execute.call_args_list] == workers
+        assert all(worker.busy for worker in workers)
+
+        # All workers are busy until a job is completed
+        assert not dispatcher.wait_for_worker(0.1)
+        assert not dispatcher.submit_job(_job(2), finished.append, timeout=0.1)
+
+        job = _job(0)
+        dispatcher._job_callback(job.cid, job)
+        assert finished == [job]
+        assert released == [True]
+        assert not workers[0].busy
+
+        # Late results of completed jobs are ignored
+        dispatcher._job_callback(job.cid, job)
+        assert finished == [job]
+
+        assert dispatcher.submit_job(_job(2), finished.append, timeout=0.1)
+        assert execute.call_args.args[0] is workers[0]
+
+
+def test_pool_processes_keep_dataset_resident():
+    ds = _dataset()
+    dispatcher = Dispatcher([_PidWorker(wid='0'), _PidWorker(wid='1')], None, ds=ds)
+    finished = queue.Queue()
+    try:
+        for i in range(6):
+            job = EvaluationJob(ds, CandidateId(0, 0, i), None)
+            assert dispatcher.submit_job(job, finished.put, timeout=10)
+            # Jobs are sent without the resident data set
+            assert dispatcher._detach_dataset(job).ds is None
+        jobs = [finished.get(timeout=10) for _ in range(6)]
+    finally:
+        dispatcher.finish_work(10)
+        dispatcher.shutdown()
+
+    assert all(job.result.structure_loss == 50 for job in jobs)
+    # Pool processes do not send the data set back
+    assert all(job.ds is None for job in jobs)
+    pids = {job.result.loss for job in jobs}
+    assert len(pids) <= 2
+    assert os.getpid() not in pids
+
+
+def test_structure_search_runs_in_master_process():
+    ds = _dataset()
+    generator = _StructureGenerator()
+    dispatcher = Dispatcher([_PidWorker(wid='0'), _PidWorker(wid='1')], generator, ds=ds)
+    cs = CandidateStructure(None, None, [])
+    cs.cid = CandidateId(0, 0)
+    finished = queue.Queue()
+    try:
+        assert dispatcher.submit_job(StructureJob(ds, cs), finished.put, timeout=10)
+        # Structure is filled in place instead of being sent to another process
+        assert finished.get(timeout=10) is cs
+    finally:
+        dispatcher.finish_work(10)
+        dispatcher.shutdown()
+
+    [(pid, result)] = generator.transformations
+    assert pid == os.getpid()
+    # Only the transformation of the data set is processed by a pool process on the resident data set
+    assert result.loss != os.getpid()
+    assert result.structure_loss == 50
@@ -0,0 +1,33 @@
+import pytest
+
+from dswizard.optimizers.bandit_learners import HyperbandLearner
+
+
+def _schedule(learner: HyperbandLearner, n: int):
+    candidates = learner.next_candidate()
+    return [next(candidates) for _ in range(n)]
+
+
+def test_brackets_are_processed_sequentially_by_default():
+    candidates = _schedule(HyperbandLearner(min_budget=1, max_budget=9), 10)
+
+    assert [cs.cid.iteration for cs in candidates[:9]] == [0] * 9
+    # First bracket waits for its results before the next bracket is started
+    assert candidates[9] is None
+
+
+def test_concurrent_bracket_fills_idle_workers():
+    learner = HyperbandLearner(min_budget=1, max_budget=9, max_concurrent=2)
+    candidates = _schedule(learner, 13)
+
+    assert [(cs.cid.iteration, cs.budget) for cs in candidates[9:12]] == [(1, 3.)] * 3
+    assert candidates[12] is None
+    assert len(learner.iterations) == 2
+
+
+def test_subsample_budgets_are_fractions_of_training_data():
+    candidates = _schedule(HyperbandLearner(min_budget=1 / 9, max_budget=1, subsample=True, n_configs=2), 10)
+
+    assert [(cs.budget, cs.fidelity) for cs in candidates[:9]] == [(2, pytest.approx(1 / 9))] * 9
+    with pytest.raises(ValueError):
+        HyperbandLearner(min_budget=1, max_budget=9, subsample=True)
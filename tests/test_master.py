@@ -0,0 +1,204 @@
+import logging
+import threading
+import time
+from types import SimpleNamespace
+from typing import List
+from unittest import mock
+
+from sklearn.datasets import make_classification
+
+from dswizard.components.classification.decision_tree import DecisionTree
+from dswizard.components.data_preprocessing.standard_scaler import StandardScalerComponent
+from dswizard.core.master import CutoffModel, Master, PrefetchQueue, StructureScheduler
+from dswizard.core.model import CandidateId, CandidateStructure, ConfigKey, Dataset, Result, Runtime, StatusType
+from dswizard.optimizers.bandit_learners import HyperbandLearner
+from dswizard.optimizers.bandit_learners.pseudo import PseudoBandit
+from dswizard.optimizers.structure_generators.fixed import FixedStructure
+from dswizard.workers import SklearnWorker
+
+
+def _master(working_directory: str, **kwargs) -> Master:
+    X, y = make_classification(300, 8, random_state=0)
+    kwargs = {
+        'wallclock_limit': 5,
+        'cutoff': 5,
+        'structure_generator_class': FixedStructure,
+        'structure_generator_kwargs': {'steps': [('scaler', StandardScalerComponent()), ('dt', DecisionTree())]},
+        'bandit_learner_class': PseudoBandit,
+        **kwargs
+    }
+    return Master(ds=Dataset(X, y, metric='accuracy'), working_directory=working_directory, **kwargs)
+
+
+class _BookkeepingWorker(SklearnWorker):
+    master: Master = None
+    # For each evaluation, whether a background task submitted during the evaluation was processed
+    processed = []
+
+    def start_computation(self, job):
+        event = threading.Event()
+        self.master._in_background(event.set)
+        self.processed.append(event.wait(2))
+        return super().start_computation(job)
+
+
+class _SlowWorker(SklearnWorker):
+
+    def compute(self, *args, **kwargs):
+        time.sleep(1)
+        return super().compute(*args, **kwargs)
+
+
+def test_adopt_speculative_uses_fidelity_of_proxy():
+    learner = HyperbandLearner(min_budget=1 / 9, max_budget=1, subsample=True)
+    proxy = next(learner.next_candidate())
+    assert proxy.is_proxy()
+    assert proxy.fidelity < 1
+
+    speculative = CandidateStructure(None, None, None)
+    speculative.cid = CandidateId(-1, 0)
+    master = SimpleNamespace(_speculative=[speculative], structure_generator=mock.Mock(),
+                             logger=logging.getLogger('Master'))
+
+    cs = Master._adopt_speculative(master, proxy)
+    assert cs is speculative
+    assert cs.cid == proxy.cid
+    assert cs.budget == proxy.budget
+    assert cs.fidelity == proxy.fidelity
+    master.structure_generator.rename_candidate.assert_called_once_with(CandidateId(-1, 0), proxy.cid)
+
+
+def test_synchronous_evaluation_does_not_block_bookkeeping(tmp_path):
+    master = _master(str(tmp_path), n_workers=1, worker_class=_BookkeepingWorker)
+    _BookkeepingWorker.master = master
+    master.optimize(ensemble=False, render=False)
+
+    assert len(_BookkeepingWorker.processed) > 0
+    assert all(_BookkeepingWorker.processed)
+
+
+def test_stragglers_are_cancelled_at_wallclock_limit(tmp_path, caplog):
+    master = _master(str(tmp_path), n_workers=2, worker_class=_SlowWorker, cutoff=30)
+    start = time.time()
+    _, rh = master.optimize(fit=False, ensemble=False, render=False)
+
+    # Jobs running at the wallclock limit can not finish within the grace period according to their cutoff
+    assert time.time() - start < master.wallclock_limit + master.grace_period
+    statuses = [result.status for _, result in rh.get_all_runs()]
+    assert StatusType.ABORT in statuses
+    assert StatusType.SUCCESS in statuses
+    assert not any(record.levelno >= logging.ERROR for record in caplog.records)
+
+
+def test_prefetch_queue_reuses_ids_of_discarded_configurations():
+    queue = PrefetchQueue(CandidateId(0, 1), 2)
+    first, second = queue.reserve(), queue.reserve()
+    assert [first, second] == [CandidateId(0, 1, 2), CandidateId(0, 1, 3)]
+
+    queue.entries.extend([(first, None, None), (second, None, None)])
+    queue.invalidate()
+    assert len(queue.entries) == 0
+    assert [queue.reserve() for _ in range(3)] == [first, second, CandidateId(0, 1, 4)]
+
+
+def test_outdated_prefetched_configurations_are_discarded():
+    master = SimpleNamespace(_reschedule=mock.Mock(), logger=logging.getLogger('Master'))
+    queue = PrefetchQueue(CandidateId(0, 1), 0)
+    future = mock.Mock()
+    future.result.return_value = 'config', ConfigKey('structure', 0)
+
+    outdated = queue.reserve()
+    generation = queue.generation
+    queue.invalidate()
+    Master._prefetch_done(master, queue, generation, outdated, future)
+    assert len(queue.entries) == 0
+    master._reschedule.assert_not_called()
+
+    config_id = queue.reserve()
+    assert config_id == outdated
+    queue.pending += 1
+    Master._prefetch_done(master, queue, queue.generation, config_id, future)
+    assert list(queue.entries) == [(config_id, 'config', ConfigKey('structure', 0))]
+    assert queue.pending == 0
+    # Structure with a pre-sampled configuration is preferred by the scheduler
+    master._reschedule.assert_called_once_with(queue.cid)
+
+
+def test_speculative_structures_are_ranked_by_estimate():
+    structures = []
+    for i in range(4):
+        cs = CandidateStructure(None, None, None)
+        cs.cid = CandidateId(-1, i)
+        structures.append(cs)
+    estimates = {structures[0].cid: None, structures[1].cid: -0.5, structures[2].cid: 0., structures[3].cid: -0.8}
+
+    generator = mock.Mock()
+    generator.score.side_effect = lambda cs: estimates[cs.cid]
+    master = SimpleNamespace(_speculative=list(structures), structure_generator=generator,
+                             ds=SimpleNamespace(metric='accuracy'), _in_background=lambda fn, *args: fn(*args),
+                             logger=logging.getLogger('Master'))
+
+    Master._rescore_speculative(master)
+    # Structures without estimate are used last, structures not better than the worst score are discarded
+    assert master._speculative == [structures[3], structures[1], structures[0]]
+    generator.discard.assert_called_once_with(structures[2])
+
+
+def _structure(idx: int, losses: List[float], training_time: float = 1.) -> CandidateStructure:
+    cs = CandidateStructure(None, None, None)
+    cs.cid = CandidateId(0, idx)
+    for i, loss in enumerate(losses):
+        cs.add_result(Result(cs.cid.with_config(i), StatusType.SUCCESS, loss=loss, runtime=Runtime(training_time, 0.)))
+    return cs
+
+
+def test_scheduler_prefers_promising_and_ready_structures():
+    scheduler = StructureScheduler(cutoff=10)
+    good, bad = _structure(0, [-0.9]), _structure(1, [-0.5])
+    scheduler.update(bad, 1)
+    scheduler.update(good, 1)
+    assert scheduler.peek() == good.cid
+
+    # Pre-sampled configurations are dispatched without delay
+    scheduler.update(bad, 1, ready=True)
+    assert scheduler.peek() == bad.cid
+
+    # Outdated heap entries of removed structures are skipped
+    scheduler.remove(bad.cid)
+    assert scheduler.peek() == good.cid
+    assert len(scheduler) == 1
+    scheduler.remove(good.cid)
+    assert scheduler.peek() is None
+
+
+def test_cutoff_model_predicts_from_successful_runs():
+    model = CutoffModel(60, factor=3, min_runs=2, min_cutoff=5)
+    cid = CandidateId(0, 0, 0)
+    assert model.predict(cid, 1000) == (60, False)
+
+    model.observe(cid, Result(cid, StatusType.SUCCESS, loss=-1, runtime=Runtime(4., 0.)))
+    model.observe(cid, Result(cid, StatusType.TIMEOUT, loss=0, runtime=Runtime(60., 0.)))
+    assert model.predict(cid, 1000) == (60, False)
+
+    model.observe(cid.with_config(1), Result(cid, StatusType.SUCCESS, loss=-1, runtime=Runtime(2., 0.)))
+    # Configurations of the same structure share the prediction
+    assert model.predict(CandidateId(0, 0, 2), 1000) == (12, True)
+    assert model.predict(CandidateId(0, 1, 0), 1000) == (60, False)
+    # Remaining wallclock time is binding
+    assert model.predict(cid, 10) == (10, False)
+
+
+def test_resume_continues_from_checkpoint(tmp_path):
+    master = _master(str(tmp_path), checkpoint_interval=0, wallclock_limit=3)
+    _, rh = master.optimize(fit=False, ensemble=False, render=False)
+    first = [cid for cid, _ in rh.get_all_runs()]
+
+    # Wallclock limit includes the runtime of the original optimization
+    resumed = _master(str(tmp_path), checkpoint_interval=0, wallclock_limit=6, resume=True)
+    _, rh = resumed.optimize(fit=False, ensemble=False, render=False)
+    second = [cid for cid, _ in rh.get_all_runs()]
+
+    # Finished evaluations are restored instead of being repeated
+    assert set(first) <= set(second)
+    assert len(second) == len(set(second))
+    assert len(second) > len(first)
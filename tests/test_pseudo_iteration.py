@@ -0,0 +1,41 @@
+from typing import List
+
+from dswizard.core.model import Result, Runtime, StatusType
+from dswizard.optimizers.iterations.pseudo import PseudoIteration
+
+
+def _sample(losses: List[List[float]], budget: int = 2) -> PseudoIteration:
+    iteration = PseudoIteration(0, budget=budget, adaptive=True)
+    # All structures are sampled before the first result is available
+    candidates = [iteration.get_next_candidate() for _ in losses]
+    for cs, structure_losses in zip(candidates, losses):
+        for loss in structure_losses:
+            iteration.register_result(cs, Result(cs.cid, StatusType.SUCCESS, loss=loss, runtime=Runtime(1., 0.)))
+    return iteration
+
+
+def test_adaptive_extends_promising_structure():
+    iteration = _sample([[0.2, 0.4]] + [[0.45, 0.5]] * 4)
+    incumbent = iteration.data[next(iter(iteration.allocated))]
+
+    assert iteration.get_next_candidate() is incumbent
+    assert iteration.allocated[incumbent.cid] == 3
+
+
+def test_adaptive_samples_new_structure():
+    iteration = _sample([[0.3, 0.305], [1., 1.], [0.3, 0.3]])
+    sampled = set(iteration.allocated)
+
+    # The confidence bound of the structure holding the incumbent is below the incumbent. Yet, the best losses of
+    # structures vary a lot more, i.e. a new structure is expected to improve the incumbent more
+    candidate = iteration.get_next_candidate()
+    assert candidate.cid not in sampled
+    assert iteration.allocated[candidate.cid] == 2
+
+
+def test_adaptive_terminates_hopeless_structures():
+    iteration = _sample([[0.3, 0.305], [1., 1.], [0.3, 0.3]])
+    iteration.get_next_candidate()
+
+    assert [iteration.data[cid].status for cid in iteration.finished] == ['TERMINATED'] * 3
+    assert len(iteration.by_status['REVIEW']) == 0
@@ -0,0 +1,81 @@
+import os
+import queue
+import time
+import timeit
+
+from sklearn.datasets import make_classification
+
+from dswizard.components.classification.decision_tree import DecisionTree
+from dswizard.components.data_preprocessing.standard_scaler import StandardScalerComponent
+from dswizard.core.model import CandidateId, CandidateStructure, Dataset, EvaluationJob, StatusType
+from dswizard.core.remote import RemoteDispatcher
+from dswizard.core.worker import Worker
+from dswizard.pipeline.pipeline import FlexiblePipeline
+
+
+class _SleepWorker(Worker):
+    """
+    Evaluations on a reduced fidelity take a few seconds. Each finished evaluation leaves a marker file
+    """
+
+    def __init__(self, marker_dir: str, **kwargs):
+        super().__init__(**kwargs)
+        self.marker_dir = marker_dir
+
+    def compute(self, ds, cid, config, cfg_cache, cfg_keys, pipeline, process_logger, fidelity=1., incumbent=None):
+        if fidelity < 1:
+            time.sleep(3)
+        with open(os.path.join(self.marker_dir, cid.external_name), 'w'):
+            pass
+        return [fidelity, fidelity]
+
+    def transform_dataset(self, ds, cid, component, config):
+        raise NotImplementedError()
+
+
+def _job(ds: Dataset, cid: CandidateId, fidelity: float = 1.) -> EvaluationJob:
+    pipeline = FlexiblePipeline([('scaler', StandardScalerComponent()), ('dt', DecisionTree())])
+    cs = CandidateStructure(pipeline.configuration_space, pipeline, [])
+    cs.cid = cid.without_config()
+    return EvaluationJob(ds, cid, cs, cutoff=10, config=pipeline.configuration_space.get_default_configuration(),
+                         fidelity=fidelity)
+
+
+def test_remote_worker_processes_and_cancels_jobs(tmp_path):
+    X, y = make_classification(300, 8, random_state=0)
+    ds = Dataset(X, y, metric='accuracy')
+    dispatcher = RemoteDispatcher([], None, ds=ds, address=('127.0.0.1', 0), workdir=str(tmp_path / 'models'),
+                                  local_workers=1, local_worker_class=_SleepWorker,
+                                  worker_kwargs={'marker_dir': str(tmp_path)})
+    try:
+        dispatcher.start(timeit.default_timer())
+        assert dispatcher.wait_for_worker(30)
+        results = queue.Queue()
+
+        cid = CandidateId(0, 0, 0)
+        assert dispatcher.submit_job(_job(ds, cid), results.put)
+        job = results.get(timeout=30)
+        assert job.result.status == StatusType.SUCCESS
+        assert job.result.loss == 1.
+        assert os.path.exists(tmp_path / cid.external_name)
+
+        cid = CandidateId(0, 0, 1)
+        process = dispatcher.local_daemon.processes[0]
+        assert dispatcher.submit_job(_job(ds, cid, fidelity=0.5), results.put)
+        time.sleep(1)
+        dispatcher.cancel_job(cid)
+        assert results.get(timeout=5).result.status == StatusType.ABORT
+
+        # Remote process is terminated together with its evaluation and replaced by a new worker
+        process.join(5)
+        assert not process.is_alive()
+        assert dispatcher.wait_for_worker(30)
+        time.sleep(3)
+        assert not os.path.exists(tmp_path / cid.external_name)
+
+        cid = CandidateId(0, 0, 2)
+        assert dispatcher.submit_job(_job(ds, cid), results.put)
+        assert results.get(timeout=30).result.status == StatusType.SUCCESS
+    finally:
+        dispatcher.shutdown()
+    assert not any(process.is_alive() for process in dispatcher.local_daemon.processes)
@@ -0,0 +1,130 @@
+import os
+from unittest import mock
+
+import joblib
+import numpy as np
+from sklearn import clone
+from sklearn.datasets import make_classification
+from sklearn.model_selection import cross_val_predict
+
+from dswizard.components.classification.decision_tree import DecisionTree
+from dswizard.components.classification.random_forest import RandomForest
+from dswizard.components.data_preprocessing.standard_scaler import StandardScalerComponent
+from dswizard.core.logger import ProcessLogger
+from dswizard.core.model import CandidateId, ConfigKey, Dataset, StatusType
+from dswizard.pipeline.pipeline import FlexiblePipeline
+from dswizard.util.util import model_file
+from dswizard.workers.sklearn_worker import SklearnWorker
+
+
+def _dataset() -> Dataset:
+    X, y = make_classification(1000, 8, random_state=0)
+    return Dataset(X, y, metric='accuracy', mf_dict={}, meta_features=np.zeros(1))
+
+
+def _pipeline() -> FlexiblePipeline:
+    return FlexiblePipeline([('scaler', StandardScalerComponent()), ('dt', DecisionTree(random_state=0))])
+
+
+def _compute(worker: SklearnWorker, ds: Dataset, incumbent: float = None):
+    pipeline = _pipeline()
+    config = pipeline.configuration_space.get_default_configuration()
+    return worker.compute(ds, CandidateId(0, 0, 0), config, None, None, pipeline, None, incumbent=incumbent)
+
+
+def test_racing_scores_incumbent_and_challenger_alike(tmp_path):
+    ds = _dataset()
+    worker = SklearnWorker(racing=True, wid='0', cfg_cache=None, workdir=str(tmp_path))
+
+    # First evaluation without incumbent and a raced evaluation processing all folds use the same splits
+    incumbent = _compute(worker, ds)
+    challenger = _compute(worker, ds, incumbent=1.)
+    assert incumbent == challenger
+
+    cv = SklearnWorker(use_cv=True, wid='1', cfg_cache=None, workdir=str(tmp_path))
+    assert _compute(cv, ds)[0] == incumbent[0]
+
+
+def test_racing_aborts_hopeless_configuration(tmp_path):
+    ds = _dataset()
+    worker = SklearnWorker(racing=True, wid='0', cfg_cache=None, workdir=str(tmp_path))
+
+    score, status = _compute(worker, ds, incumbent=-1.)
+    assert status == StatusType.CAPPED
+    assert score[0] > -1.
+
+
+def test_subsamples_are_nested_and_stratified():
+    y = np.repeat([0, 1, 2], [600, 300, 100])
+    subsamples = [SklearnWorker._subsample_indices(y, fidelity) for fidelity in (1 / 9, 1 / 3, 1.)]
+
+    for smaller, larger in zip(subsamples, subsamples[1:]):
+        assert set(smaller) < set(larger)
+    np.testing.assert_array_equal(subsamples[-1], np.arange(len(y)))
+    np.testing.assert_array_equal(np.bincount(y[subsamples[1]]), [200, 100, 34])
+
+
+def test_configuration_is_sampled_during_scoring_fit(tmp_path):
+    ds = _dataset()
+    pipeline = _pipeline()
+    cid = CandidateId(0, 0, 0)
+
+    def sample_configuration(name, **kwargs):
+        step = pipeline.get_step(name)
+        return step.get_hyperparameter_search_space().get_default_configuration(), kwargs['cfg_key']
+
+    cfg_cache = mock.Mock()
+    cfg_cache.sample_configuration.side_effect = sample_configuration
+    cfg_keys = [ConfigKey('structure', i) for i in range(len(pipeline.steps))]
+    process_logger = ProcessLogger(str(tmp_path), cid)
+
+    worker = SklearnWorker(wid='0', cfg_cache=None, workdir=str(tmp_path))
+    with mock.patch.object(DecisionTree, 'fit', autospec=True, side_effect=DecisionTree.fit) as fit:
+        score = worker.compute(ds, cid, None, cfg_cache, cfg_keys, pipeline, process_logger)
+    # Each step is configured once and the pipeline is trained only for scoring
+    assert cfg_cache.sample_configuration.call_count == len(pipeline.steps)
+    assert fit.call_count == 1
+
+    config, _ = process_logger.restore_config(pipeline)
+    assert config == pipeline.configuration_space.get_default_configuration()
+    assert score == _compute(worker, ds)
+
+
+def test_parallel_folds_match_sequential_cross_validation(tmp_path):
+    ds = _dataset()
+    pipeline = _pipeline()
+    pipeline.set_hyperparameters(pipeline.configuration_space.get_default_configuration().get_dictionary())
+
+    sequential = SklearnWorker(use_cv=True, n_jobs=1, wid='0', cfg_cache=None, workdir=str(tmp_path))
+    parallel = SklearnWorker(use_cv=True, n_jobs=2, wid='1', cfg_cache=None, workdir=str(tmp_path))
+    y, y_pred, y_prob, models = parallel._cross_val_predict(pipeline, ds)
+
+    # Predictions of each fold are assigned to its test indices
+    expected = cross_val_predict(clone(pipeline), ds.X, ds.y, cv=ds.cv_splits(4))
+    np.testing.assert_array_equal(y_pred, expected)
+    assert len(models) == 4
+    assert _compute(parallel, ds) == _compute(sequential, ds)
+
+
+def test_warm_start_continues_model_of_lower_fidelity(tmp_path):
+    ds = _dataset()
+    pipeline = FlexiblePipeline([('scaler', StandardScalerComponent()), ('rf', RandomForest(random_state=0))])
+    config = pipeline.configuration_space.get_default_configuration()
+    config['rf:max_features'] = 0.6
+    cid = CandidateId(0, 0, 0)
+    worker = SklearnWorker(warm_start=True, wid='0', cfg_cache=None, workdir=str(tmp_path))
+
+    def evaluate(fidelity: float) -> FlexiblePipeline:
+        worker.compute(ds, cid, config, None, None, pipeline, None, fidelity=fidelity)
+        with open(os.path.join(str(tmp_path), model_file(cid)), 'rb') as f:
+            [model] = joblib.load(f)
+        return model
+
+    partial = evaluate(0.5)
+    n_estimators = partial._final_estimator.estimator_.n_estimators
+    assert os.listdir(worker.warm_start_dir)
+
+    # Larger fidelity adds trees to the stored forest instead of fitting a new one
+    complete = evaluate(1.)
+    assert complete._final_estimator.estimator_.n_estimators == int(n_estimators * 1.5)
+    assert not os.listdir(os.path.join(worker.warm_start_dir, *os.listdir(worker.warm_start_dir)))
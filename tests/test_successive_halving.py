@@ -0,0 +1,32 @@
+from dswizard.core.model import Result, Runtime, StatusType
+from dswizard.optimizers.iterations import SuccessiveHalving
+
+
+def _assert_index_consistent(iteration: SuccessiveHalving) -> None:
+    statuses = {cs.status for cs in iteration.data.values()} | set(iteration.by_status)
+    for status in statuses:
+        expected = [cid for cid, cs in iteration.data.items() if cs.status == status]
+        assert sorted(iteration.by_status[status], key=str) == sorted(expected, key=str)
+
+
+def test_status_index_follows_candidates_through_stages():
+    iteration = SuccessiveHalving(0, [3, 1], [1, 3])
+
+    candidates = [iteration.get_next_candidate() for _ in range(3)]
+    assert iteration.get_next_candidate() is None
+    _assert_index_consistent(iteration)
+    assert len(iteration.by_status['RUNNING']) == 3
+
+    for cs, loss in zip(candidates, [0.5, 0.1, 0.9]):
+        iteration.register_result(cs, Result(cs.cid.with_config(0), StatusType.SUCCESS, loss=loss,
+                                             runtime=Runtime(1., 0.)))
+        _assert_index_consistent(iteration)
+    assert len(iteration.by_status['REVIEW']) == 3
+
+    promoted = iteration.get_next_candidate()
+    assert promoted.cid == candidates[1].cid
+    assert promoted.budget == 3
+    _assert_index_consistent(iteration)
+    assert list(iteration.by_status['RUNNING']) == [promoted.cid]
+    assert len(iteration.by_status['TERMINATED']) == 2
+    assert len(iteration.by_status['QUEUED']) == 0
@@ -0,0 +1,65 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+from sklearn.datasets import make_classification
+
+from dswizard.components.classification.decision_tree import DecisionTree
+from dswizard.components.data_preprocessing.standard_scaler import StandardScalerComponent
+from dswizard.pipeline import transform_cache
+from dswizard.pipeline.pipeline import FlexiblePipeline
+from dswizard.pipeline.transform_cache import TransformCache
+
+
+def _pipeline(with_mean: bool = True) -> FlexiblePipeline:
+    pipeline = FlexiblePipeline([('scaler', StandardScalerComponent(with_mean=with_mean)),
+                                 ('dt', DecisionTree(random_state=0))])
+    pipeline.set_hyperparameters(pipeline.configuration_space.get_default_configuration().get_dictionary())
+    return pipeline
+
+
+def test_key_is_stable():
+    key = TransformCache.key('data', StandardScalerComponent())
+
+    assert TransformCache.key('data', StandardScalerComponent()) == key
+    assert TransformCache.key('data', StandardScalerComponent(with_mean=False)) != key
+    assert TransformCache.key('other', StandardScalerComponent()) != key
+
+    # Keys are shared with evaluations running in other processes
+    code = 'from dswizard.components.data_preprocessing.standard_scaler import StandardScalerComponent\n' \
+           'from dswizard.pipeline.transform_cache import TransformCache\n' \
+           'print(TransformCache.key("data", StandardScalerComponent()))'
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            env={**os.environ, 'PYTHONHASHSEED': '1'}).stdout
+    assert output.strip() == key
+
+
+def test_pipelines_reuse_fitted_prefix():
+    X, y = make_classification(300, 8, random_state=0)
+    transform_cache.set_cache(TransformCache(16))
+    try:
+        first = _pipeline().fit(X, y, fingerprint='data')
+        second = _pipeline().fit(X, y, fingerprint='data')
+        other = _pipeline(with_mean=False).fit(X, y, fingerprint='data')
+    finally:
+        transform_cache.set_cache(None)
+
+    assert second.steps[0][1] is first.steps[0][1]
+    assert other.steps[0][1] is not first.steps[0][1]
+    np.testing.assert_array_equal(second.predict(X), first.predict(X))
+
+
+def test_spill_respects_disk_budget(tmp_path):
+    cache = TransformCache(16, str(tmp_path), max_disk_size=1)
+    small = np.zeros((10, 10))
+    large = np.zeros((1024, 256))
+
+    cache.put('small', StandardScalerComponent(), small)
+    cache.put('large', StandardScalerComponent(), large)
+    assert sorted(os.listdir(tmp_path)) == ['small.pkl']
+
+    # Entries of other processes are loaded from disk on demand
+    other = TransformCache(16, str(tmp_path), max_disk_size=1)
+    np.testing.assert_array_equal(other.get('small')[1], small)
+    assert other.get('large') is None